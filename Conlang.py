@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: Conlang.py
+# author: glenn abastillas
+# created: 2020-06-25
+# description: conlang project object with a phoneme inventory, phonotactics and lexicon
+from profiling import instrument
+from soundarray import default_encoder
+from storage import save_lexicon
+from tokenizer import default_tokenizer
+import numpy as np
+import sys
+
+
+class Lexicon():
+    '''
+    Columnar store of words with interned strings, token-id encoded forms and
+    hash indexes by form and gloss. Uniqueness checks and n-gram counts are
+    updated incrementally as words are added or removed.
+
+    Attributes
+    ----------
+        forms (list) : IPA form of each entry (None once removed)
+        glosses (list) : Gloss of each entry
+        ids (np.array) : Flat token ids of the live (not removed) entries
+        offsets (np.array) : Live entry k spans ids[offsets[k]:offsets[k + 1]]
+        unigrams (np.array) : Count of each token id
+        bigrams (np.array) : Counts of token id pairs, with ids size and
+            size + 1 as the ^ and $ word boundaries
+    '''
+
+    def __init__(self, tokenizer=None, capacity=1024):
+        self.tokenizer = tokenizer or default_tokenizer()
+        self.size = self.tokenizer.unknown + 1
+
+        self.forms = []
+        self.glosses = []
+
+        self._by_form = {}
+        self._by_gloss = {}
+
+        self._ids = np.zeros(capacity, dtype=np.int32)
+        self._offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self._removed = 0
+
+        self.unigrams = np.zeros(self.size, dtype=np.int64)
+        self.bigrams = np.zeros((self.size + 2, self.size + 2), dtype=np.int64)
+
+    def __repr__(self):
+        return f"Lexicon( words={len(self)} )"
+
+    def __len__(self):
+        return len(self.forms) - self._removed
+
+    def __contains__(self, form):
+        return form in self._by_form
+
+    def __iter__(self):
+        return (__ for __ in self.forms if __ is not None)
+
+    @property
+    def entries(self):
+        ''' Return the indices of the entries that have not been removed '''
+        live = np.fromiter((__ is not None for __ in self.forms), dtype=bool, count=len(self.forms))
+        return np.flatnonzero(live)
+
+    @property
+    def ids(self):
+        ''' Return the flat token ids of every live entry, in entry order '''
+        return self._live()[0]
+
+    @property
+    def offsets(self):
+        ''' Return the offsets into ids of every live entry (see `entries`) '''
+        return self._live()[1]
+
+    @property
+    def sounds(self):
+        ''' Return every live entry's form as a SoundArray '''
+        return default_encoder().encode_ids(*self._live())
+
+    def _live(self):
+        ''' Return the ids and offsets of the live entries, skipping removed slots '''
+        n = len(self.forms)
+        ids, offsets = self._ids[:self._offsets[n]], self._offsets[:n + 1]
+        if not self._removed:
+            return ids, offsets
+
+        entries = self.entries
+        starts, lengths = offsets[entries], np.diff(offsets)[entries]
+        live = np.concatenate(([0], np.cumsum(lengths)))
+        return ids[np.repeat(starts - live[:-1], lengths) + np.arange(live[-1])], live
+
+    def _grow(self, ids):
+        ''' Double the id and offset buffers until they fit one more word '''
+        end = self._offsets[len(self.forms)]
+
+        while end + ids.size > self._ids.size:
+            self._ids = np.concatenate((self._ids, np.zeros_like(self._ids)))
+
+        if len(self.forms) + 2 > self._offsets.size:
+            self._offsets = np.concatenate((self._offsets, np.zeros_like(self._offsets)))
+
+    def _count(self, ids, sign):
+        ''' Add (sign=1) or subtract (sign=-1) a word's n-grams from the counts '''
+        sequence = np.concatenate(([self.size], ids, [self.size + 1]))
+        np.add.at(self.unigrams, ids, sign)
+        np.add.at(self.bigrams, (sequence[:-1], sequence[1:]), sign)
+
+    def index(self, form):
+        ''' Return the entry index of a form, or None '''
+        return self._by_form.get(form)
+
+    def word(self, index):
+        ''' Return the token ids of an entry '''
+        return self._ids[self._offsets[index]:self._offsets[index + 1]]
+
+    def lookup(self, gloss):
+        ''' Return the forms with a gloss '''
+        return [self.forms[__] for __ in self._by_gloss.get(gloss, ())]
+
+    def save(self, path):
+        ''' Save this lexicon in the binary format (see storage.py) '''
+        save_lexicon(path, self)
+
+    @instrument()
+    def add(self, form, gloss=None, ids=None):
+        '''
+        Add a word and return its entry index
+
+        Parameters
+        ----------
+            form (str) : IPA form of the word
+            gloss (str) : Meaning of the word
+            ids (np.array) : Token ids of the form if already tokenized
+        '''
+        if form in self._by_form:
+            raise ValueError(f'Form {form!r} is already in the lexicon.')
+
+        if ids is None:
+            ids = self.tokenizer.tokenize(form, ids=True)
+
+        self._grow(ids)
+
+        index = len(self.forms)
+        start = self._offsets[index]
+        self._ids[start:start + ids.size] = ids
+        self._offsets[index + 1] = start + ids.size
+
+        form = sys.intern(form)
+        gloss = sys.intern(gloss) if gloss else gloss
+
+        self.forms.append(form)
+        self.glosses.append(gloss)
+        self._by_form[form] = index
+        if gloss:
+            self._by_gloss.setdefault(gloss, []).append(index)
+
+        self._count(ids, 1)
+        return index
+
+    def remove(self, form):
+        '''
+        Remove a word. Its slot is kept so entry indices stay stable.
+
+        Parameters
+        ----------
+            form (str) : IPA form of the word
+        '''
+        index = self._by_form.pop(form)
+        gloss = self.glosses[index]
+
+        if gloss:
+            self._by_gloss[gloss].remove(index)
+            if not self._by_gloss[gloss]:
+                del self._by_gloss[gloss]
+
+        self._count(self.word(index), -1)
+        self.forms[index] = None
+        self.glosses[index] = None
+        self._removed += 1
+
+
+class Conlang():
+    '''
+    A constructed language project that owns a phoneme inventory, a
+    phonotactic model and a lexicon.
+
+    Attributes
+    ----------
+        name (str) : Name of the language
+        inventory (list) : IPA symbols allowed in this language's words
+        lexicon (Lexicon) : Words of the language
+        syllables (SyllableStatistics) : Syllable shapes used for generation
+    '''
+
+    def __init__(self, name='', inventory=None, syllables=None, tokenizer=None):
+        '''
+        Parameters
+        ----------
+            name (str) : Name of the language
+            inventory (list) : IPA symbols allowed in words. Defaults to every
+                sounds.yaml character.
+            syllables (SyllableStatistics) : Syllable shapes used for generation
+            tokenizer (Tokenizer) : Tokenizer used to split IPA forms
+        '''
+        self.name = name
+        self.tokenizer = tokenizer or default_tokenizer()
+        self.lexicon = Lexicon(self.tokenizer)
+        self.syllables = syllables
+
+        self.inventory = []
+        self._allowed = np.zeros(self.tokenizer.unknown + 1, dtype=bool)
+        self.set_inventory(inventory or self.tokenizer.symbols)
+
+    def __repr__(self):
+        return f"Conlang( {self.name!r}, inventory={len(self.inventory)}, words={len(self)} )"
+
+    def __len__(self):
+        return len(self.lexicon)
+
+    def __contains__(self, form):
+        return form in self.lexicon
+
+    def set_inventory(self, inventory):
+        '''
+        Set the phoneme inventory of this language
+
+        Parameters
+        ----------
+            inventory (list) : IPA symbols known to the tokenizer
+        '''
+        unknown = [__ for __ in inventory if __ not in self.tokenizer.index]
+        if unknown:
+            raise ValueError(f'Symbols not found in sounds.yaml: {unknown}')
+
+        self.inventory = list(inventory)
+        self._allowed[:] = False
+        self._allowed[[self.tokenizer.index[__] for __ in self.inventory]] = True
+
+    def allowed(self, form):
+        ''' Return True if every sound of a form is in the inventory '''
+        return bool(self._allowed[self.tokenizer.tokenize(form, ids=True)].all())
+
+    def add(self, form, gloss=None):
+        '''
+        Add a word to the lexicon and return its entry index
+
+        Parameters
+        ----------
+            form (str) : IPA form of the word
+            gloss (str) : Meaning of the word
+        '''
+        ids = self.tokenizer.tokenize(form, ids=True)
+
+        if not self._allowed[ids].all():
+            raise ValueError(f'Form {form!r} uses sounds outside the inventory.')
+
+        return self.lexicon.add(form, gloss, ids)
+
+    def add_many(self, words):
+        '''
+        Add many words to the lexicon
+
+        Parameters
+        ----------
+            words (iterable) : Forms or (form, gloss) pairs
+        '''
+        for word in words:
+            if isinstance(word, str):
+                self.add(word)
+            else:
+                self.add(*word)
+
+    def remove(self, form):
+        ''' Remove a word from the lexicon '''
+        self.lexicon.remove(form)
+
+    def lookup(self, gloss):
+        ''' Return the forms with a gloss '''
+        return self.lexicon.lookup(gloss)
+
+    def phonotactics(self, k=0.0):
+        '''
+        Return the bigram transition probabilities of the lexicon
+
+        Parameters
+        ----------
+            k (float) : Pseudocount added to every transition
+
+        Returns
+        -------
+            Matrix of P(next | previous) over token ids with ^ and $ as the
+            last two ids. Rows with no observations are zero unless k > 0.
+        '''
+        counts = self.lexicon.bigrams + k
+        totals = counts.sum(axis=1, keepdims=True)
+        return np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+
+
+if __name__ == '__main__':
+    language = Conlang('Example', inventory=list('ptkmnsaiu'))
+    language.add_many([('pata', 'water'), ('kina', 'fire'), ('suma', 'water')])
+    print(language, language.lookup('water'))
+    print(language.lexicon.sounds)
@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: __main__.py
+# author: glenn abastillas
+# created: 2020-07-07
+# description: entry point of `python -m conlang` (see cli.py)
+import os
+import sys
+
+# Modules import each other by name, so the package directory goes on the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main
+
+main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: benchmark.py
+# author: glenn abastillas
+# created: 2020-06-23
+# description: reproducible benchmarks for the package's hot paths
+'''
+Run with `python benchmark.py` from the repository root. Results are written
+as JSON (default: benchmarks/<timestamp>.json) and can be compared with a
+previous run using `--compare`.
+
+Usage
+-----
+    python benchmark.py [--filter NAME] [--repeat N] [--output PATH]
+                        [--compare PATH]
+'''
+from datetime import datetime
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import timeit
+
+BENCHMARKS = {}
+SEED = 2020
+
+
+def benchmark(name, number=100, setup=None):
+    '''
+    Register a benchmark function
+
+    Parameters
+    ----------
+        name (str) : Unique benchmark name (e.g., sounds.construct.consonant)
+        number (int) : Calls per timing sample
+        setup (callable) : Returns the arguments passed to the benchmark
+    '''
+    def register(function):
+        BENCHMARKS[name] = (function, number, setup)
+        return function
+    return register
+
+
+def corpus(words=2000, seed=SEED):
+    ''' Return a reproducible synthetic IPA corpus '''
+    from sounds import SNDS
+    rng = random.Random(seed)
+    symbols = SNDS.ipa.vowels + [__ for __ in SNDS.ipa.consonants if __]
+    return [''.join(rng.choice(symbols) for _ in range(rng.randint(2, 9)))
+            for _ in range(words)]
+
+
+def _import_time(module):
+    ''' Return the time to import a module in a fresh interpreter '''
+    code = (f'import time; t = time.perf_counter(); import {module}; '
+            f'print(time.perf_counter() - t)')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                            text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(output.stdout.strip())
+
+
+@benchmark('import.sounds', number=1)
+def import_sounds():
+    return _import_time('sounds')
+
+
+@benchmark('import.syllable', number=1)
+def import_syllable():
+    return _import_time('syllable')
+
+
+@benchmark('sounds.construct.sound')
+def construct_sound():
+    from sounds import Sound
+    Sound('voiced', 'alveolar', 'stop')
+
+
+@benchmark('sounds.construct.consonant')
+def construct_consonant():
+    from sounds import Consonant
+    Consonant('voiceless', 'velar', 'fricative')
+
+
+@benchmark('sounds.construct.vowel')
+def construct_vowel():
+    from sounds import Vowel
+    Vowel('front', 'close', 'rounded')
+
+
+def _consonant():
+    from sounds import Consonant
+    return (Consonant('voiced', 'bilabial', 'stop'),)
+
+
+@benchmark('sounds.property.get', number=1000, setup=_consonant)
+def property_get(sound):
+    sound.place, sound.manner, sound.voicing
+
+
+@benchmark('sounds.property.set', number=1000, setup=_consonant)
+def property_set(sound):
+    sound.place = 'velar'
+    sound.manner = 'fricative'
+    sound.voicing = 0
+
+
+@benchmark('sounds.orthography', setup=_consonant)
+def orthography(sound):
+    sound.orthography()
+
+
+@benchmark('sounds.weaken_strengthen', number=1000, setup=_consonant)
+def weaken_strengthen(sound):
+    sound.weaken()
+    sound.strengthen()
+
+
+@benchmark('resource.character', number=1000)
+def resource_character():
+    from sounds import SNDS
+    SNDS.character('ʃ')
+
+
+@benchmark('resource.get_prob', number=100)
+def resource_get_prob():
+    from sounds import SNDS
+    SNDS.c.get_prob('stop', 'voiceless')
+
+
+@benchmark('ipa.count_bigrams', number=1, setup=lambda: (corpus(),))
+def count_bigrams(words):
+    from ipa import count_bigrams
+    model = None
+    for word in words:
+        model = count_bigrams(word, model)
+
+
+def _corpus_bigrams():
+    from probability import bigrams
+    return ([gram for word in corpus() for gram in bigrams(['^', *word, '$'])],)
+
+
+@benchmark('probability.ele.native', number=1, setup=_corpus_bigrams)
+def ele_native(grams):
+    from probability import ConditionalCounts
+    counts = ConditionalCounts()
+    counts.update(grams)
+    model = counts.probabilities('ele')
+    for a, b in grams:
+        model.prob(a, b)
+
+
+@benchmark('probability.ele.nltk', number=1, setup=_corpus_bigrams)
+def ele_nltk(grams):
+    from nltk import ConditionalFreqDist, ConditionalProbDist, ELEProbDist
+    cfd = ConditionalFreqDist(grams)
+    model = ConditionalProbDist(cfd, ELEProbDist)
+    for a, b in grams:
+        model[a].prob(b)
+
+
+@benchmark('syllable.random_representation', number=20)
+def random_representation():
+    from syllable import Syllable
+    random.seed(SEED)
+    Syllable('cvc').random_representation()
+
+
+def run(names=None, repeat=5):
+    '''
+    Run registered benchmarks and return their results
+
+    Parameters
+    ----------
+        names (str) : Only run benchmarks whose name contains this string
+        repeat (int) : Number of timing samples per benchmark
+
+    Returns
+    -------
+        Dictionary of benchmark names to the mean, minimum and standard
+        deviation of seconds per call, or the error that skipped it.
+    '''
+    results = {}
+
+    for name, (function, number, setup) in BENCHMARKS.items():
+        if names and names not in name:
+            continue
+
+        try:
+            args = setup() if setup else ()
+            function(*args)
+
+            if name.startswith('import.'):
+                samples = [function() for _ in range(repeat)]
+            else:
+                timer = timeit.Timer(lambda: function(*args))
+                samples = [__ / number for __ in timer.repeat(repeat, number)]
+
+        except Exception as error:
+            results[name] = {'error': f'{type(error).__name__}: {error}'}
+            continue
+
+        results[name] = {
+            'mean': statistics.mean(samples),
+            'min': min(samples),
+            'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            'repeat': repeat,
+            'number': number,
+        }
+
+    return results
+
+
+def compare(results, previous):
+    '''
+    Return a printable table comparing two sets of results by minimum time
+
+    Parameters
+    ----------
+        results (dict) : Current benchmark results
+        previous (dict) : Results loaded from an earlier JSON file
+    '''
+    lines = [f'{"benchmark":<36}{"previous":>12}{"current":>12}{"ratio":>8}']
+
+    for name, current in results.items():
+        before = previous.get(name, {})
+        if 'min' not in current or 'min' not in before:
+            continue
+        ratio = current['min'] / before['min']
+        lines.append(f'{name:<36}{before["min"]:>12.3e}{current["min"]:>12.3e}{ratio:>8.2f}')
+
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run conlang benchmarks')
+    parser.add_argument('--filter', help='only run benchmarks containing this name')
+    parser.add_argument('--repeat', type=int, default=5, help='timing samples per benchmark')
+    parser.add_argument('--output', help='JSON file for results')
+    parser.add_argument('--compare', help='JSON file from a previous run')
+    args = parser.parse_args(argv)
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    results = run(args.filter, args.repeat)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+    output = args.output or os.path.join(
+        'benchmarks', datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+    with open(output, 'w') as fout:
+        json.dump(report, fout, indent=2)
+
+    for name, result in results.items():
+        if 'error' in result:
+            print(f'{name:<36}skipped ({result["error"]})')
+        else:
+            print(f'{name:<36}{result["min"]:>12.3e} s')
+
+    if args.compare:
+        with open(args.compare) as fin:
+            print(compare(results, json.load(fin)['results']))
+
+    print(f'Results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: bloom.py
+# author: glenn abastillas
+# created: 2020-06-27
+# description: bloom filter and exact-set uniqueness gates for generated words
+from hashlib import blake2b
+from profiling import instrument
+import math
+import numpy as np
+import os
+import struct
+
+MAGIC = b'CLBF'
+HEADER = struct.Struct('<4sQQQ')
+
+
+def _digests(words):
+    ''' Return two 64-bit hashes per word as an (N, 2) uint64 array '''
+    data = b''.join(blake2b(__.encode('utf-8'), digest_size=16).digest() for __ in words)
+    return np.frombuffer(data, dtype=np.uint64).reshape(-1, 2)
+
+
+def _chunks(words, size):
+    ''' Yield lists of stripped words from an iterable '''
+    chunk = []
+    for word in words:
+        chunk.append(word.strip())
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BloomFilter():
+    '''
+    Probabilistic set membership backed by a bytearray. Membership tests have
+    no false negatives and a false positive rate set at construction.
+
+    Attributes
+    ----------
+        bits (bytearray) : Bit array of the filter
+        size (int) : Number of bits
+        hashes (int) : Number of bit positions per word
+        count (int) : Number of words added
+    '''
+
+    def __init__(self, capacity=100000, error_rate=0.01, size=None, hashes=None):
+        '''
+        Parameters
+        ----------
+            capacity (int) : Expected number of words
+            error_rate (float) : Target false positive rate at capacity
+            size (int) : Number of bits, overriding capacity and error_rate
+            hashes (int) : Number of hashes, overriding capacity and error_rate
+        '''
+        capacity = max(int(capacity), 1)
+
+        if size is None:
+            size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        if hashes is None:
+            hashes = max(1, round(size / capacity * math.log(2)))
+
+        self.size = int(size)
+        self.hashes = int(hashes)
+        self.count = 0
+        self.bits = bytearray((self.size + 7) // 8)
+        self._view = np.frombuffer(self.bits, dtype=np.uint8)
+
+    def __repr__(self):
+        return f"BloomFilter( bits={self.size}, hashes={self.hashes}, words={self.count} )"
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, word):
+        return bool(self.contains_many([word])[0])
+
+    def _positions(self, words):
+        ''' Return the byte index and bit mask of each hash of each word '''
+        digests = _digests(words)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        positions = (digests[:, :1] + steps * (digests[:, 1:] | np.uint64(1))) % np.uint64(self.size)
+        return positions >> np.uint64(3), (1 << (positions & np.uint64(7))).astype(np.uint8)
+
+    def add(self, word):
+        ''' Add a word to the filter '''
+        self.add_many([word])
+
+    def add_many(self, words, chunk=65536):
+        '''
+        Add words to the filter in vectorized chunks
+
+        Parameters
+        ----------
+            words (iterable) : Words to add (e.g., an open corpus file)
+            chunk (int) : Number of words hashed per batch
+        '''
+        for batch in _chunks(words, chunk):
+            index, mask = self._positions(batch)
+            np.bitwise_or.at(self._view, index.ravel(), mask.ravel())
+            self.count += len(batch)
+
+    def contains_many(self, words):
+        '''
+        Return a boolean array marking which words may be in the filter
+
+        Parameters
+        ----------
+            words (list) : Words to check
+        '''
+        words = list(words)
+        if not words:
+            return np.zeros(0, dtype=bool)
+        index, mask = self._positions(words)
+        return ((self._view[index] & mask) == mask).all(axis=1)
+
+    def error_rate(self):
+        ''' Return the expected false positive rate at the current count '''
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    @classmethod
+    @instrument()
+    def from_file(cls, path, capacity=None, error_rate=0.01):
+        '''
+        Build a filter from a corpus file with one word per line in a single
+        streaming pass.
+
+        Parameters
+        ----------
+            path (str) : Corpus file (e.g., resources/lang/en_US.txt)
+            capacity (int) : Expected number of words. If None, it is bounded
+                from the file size assuming at least four bytes per line.
+            error_rate (float) : Target false positive rate
+        '''
+        if capacity is None:
+            capacity = os.path.getsize(path) // 4 + 1
+
+        bloom = cls(capacity, error_rate)
+        with open(path) as fin:
+            bloom.add_many(fin)
+        return bloom
+
+    def save(self, path):
+        ''' Write this filter to a file '''
+        with open(path, 'wb') as fout:
+            fout.write(HEADER.pack(MAGIC, self.size, self.hashes, self.count))
+            fout.write(self.bits)
+
+    @classmethod
+    def load(cls, path):
+        ''' Read a filter written with `save` '''
+        with open(path, 'rb') as fin:
+            magic, size, hashes, count = HEADER.unpack(fin.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f'{path} is not a bloom filter file.')
+            bloom = cls(size=size, hashes=hashes)
+            fin.readinto(bloom.bits)
+        bloom.count = count
+        return bloom
+
+
+class ExactSet():
+    '''
+    Exact set membership over words, for lexicons small enough to hold in
+    memory or where false positives are not acceptable.
+
+    Attributes
+    ----------
+        words (set) : Words in the set
+    '''
+
+    def __init__(self, words=()):
+        self.words = {__.strip() for __ in words}
+
+    def __repr__(self):
+        return f"ExactSet( words={len(self)} )"
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.words
+
+    def add(self, word):
+        ''' Add a word to the set '''
+        self.words.add(word)
+
+    def add_many(self, words):
+        ''' Add words to the set '''
+        self.words.update(__.strip() for __ in words)
+
+    def contains_many(self, words):
+        ''' Return a boolean array marking which words are in the set '''
+        return np.array([__ in self.words for __ in words], dtype=bool)
+
+    @classmethod
+    def from_file(cls, path):
+        ''' Build a set from a corpus file with one word per line '''
+        with open(path) as fin:
+            return cls(fin)
+
+    def save(self, path):
+        ''' Write this set with one word per line '''
+        with open(path, 'w') as fout:
+            fout.write('\n'.join(sorted(self.words)))
+
+    @classmethod
+    def load(cls, path):
+        ''' Read a set written with `save` '''
+        return cls.from_file(path)
+
+
+class UniquenessGate():
+    '''
+    Accept generated words that are not in an existing lexicon and not in any
+    forbidden word list (e.g., real words from resources/lang/*.txt).
+
+    Attributes
+    ----------
+        lexicon (object) : Exact membership of existing words (e.g., a Lexicon,
+            ExactSet or set)
+        forbidden (list) : BloomFilter or ExactSet objects of forbidden words
+    '''
+
+    def __init__(self, lexicon=None, forbidden=()):
+        self.lexicon = lexicon if lexicon is not None else ExactSet()
+        self.forbidden = list(forbidden)
+
+    def __repr__(self):
+        return f"UniquenessGate( forbidden={len(self.forbidden)} )"
+
+    def add_forbidden(self, paths, error_rate=0.01, exact=False):
+        '''
+        Add forbidden word lists from corpus files
+
+        Parameters
+        ----------
+            paths (list) : Corpus files with one word per line
+            error_rate (float) : False positive rate of each bloom filter
+            exact (bool) : Use exact sets instead of bloom filters
+        '''
+        for path in paths:
+            if exact:
+                self.forbidden.append(ExactSet.from_file(path))
+            else:
+                self.forbidden.append(BloomFilter.from_file(path, error_rate=error_rate))
+
+    def accept(self, word):
+        ''' Return True if a word is new and not forbidden '''
+        return bool(self.accept_many([word])[0])
+
+    @instrument()
+    def accept_many(self, words):
+        '''
+        Return a boolean array marking which candidate words are accepted
+
+        Parameters
+        ----------
+            words (list) : Candidate words
+        '''
+        words = list(words)
+        accepted = np.array([__ not in self.lexicon for __ in words], dtype=bool)
+
+        for members in self.forbidden:
+            if not accepted.any():
+                break
+            candidates = np.flatnonzero(accepted)
+            found = members.contains_many([words[__] for __ in candidates])
+            accepted[candidates[found]] = False
+
+        return accepted
+
+
+if __name__ == '__main__':
+    bloom = BloomFilter(1000)
+    bloom.add_many(['pata', 'kina'])
+    print(bloom, 'pata' in bloom, 'suma' in bloom)
+    gate = UniquenessGate({'kina'}, [bloom])
+    print(gate.accept_many(['pata', 'kina', 'suma']))
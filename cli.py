@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: cli.py
+# author: glenn abastillas
+# created: 2020-07-07
+# description: command-line batch interface with streaming output
+'''
+Run from the package directory with `python cli.py`, or as `python -m conlang`
+from its parent directory.
+
+    generate    --count 1000 --seed 1 --workers 4      -> one word per line
+    count       corpus.txt --model counts.log          -> updates a delta log
+    score       words.txt                              -> word <tab> log-likelihood
+    syllabify   words.txt                              -> word <tab> syllables <tab> shapes
+    transliterate words.txt --reverse                  -> one spelling per line
+    ingest      ../ipa-dict/data/*.txt -o resources/lang
+
+Inputs are files or standard input (no files, or -), read lazily in batches.
+Results are written to standard output (or -o) and flushed after every batch,
+so they can be piped while a long job runs. Each subcommand imports only the
+modules it needs.
+'''
+from contextlib import contextmanager
+import argparse
+import itertools
+import os
+import sys
+
+HOME = os.path.dirname(os.path.abspath(__file__))
+
+BATCH = 4096
+
+
+def _path(value):
+    ''' Resolve a path argument against the directory the command ran in '''
+    return value if value == '-' else os.path.abspath(value)
+
+
+def _lines(paths):
+    ''' Yield stripped, non-empty lines of files, or of stdin if paths is empty or - '''
+    for path in paths or ['-']:
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            for line in stream:
+                line = line.strip()
+                if line:
+                    yield line
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def _batches(lines, size=BATCH):
+    ''' Yield lists of at most size lines '''
+    lines = iter(lines)
+    while True:
+        batch = list(itertools.islice(lines, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def _open(path):
+    ''' Yield an output stream: stdout if path is None or -, else a file '''
+    if path in (None, '-'):
+        yield sys.stdout
+        return
+    with open(path, 'w', encoding='utf-8') as stream:
+        yield stream
+
+
+def _write(stream, rows):
+    ''' Write rows as lines and flush so downstream readers see them at once '''
+    stream.write(''.join(f'{__}\n' for __ in rows))
+    stream.flush()
+
+
+def _scorer(args):
+    ''' Return a PhonotacticScorer from --counts (a delta log) or --model (a pickle) '''
+    from scoring import PhonotacticScorer
+    tokenizer = None
+    if args.tokenize:
+        from tokenizer import default_tokenizer
+        tokenizer = default_tokenizer()
+
+    if args.counts:
+        from counting import CountModel
+        __, bigrams = CountModel.load(args.counts).to_nested()
+        return PhonotacticScorer(bigrams, smoothing=args.smoothing, tokenizer=tokenizer)
+    return PhonotacticScorer.from_pickle(args.model, smoothing=args.smoothing, tokenizer=tokenizer)
+
+
+def _generator(args):
+    ''' Return the word generator selected by the generate options '''
+    if args.shapes:
+        from generation import ShapeGenerator
+        return ShapeGenerator(args.shapes, args.syllables)
+
+    if args.corpus:
+        from generation import SyllableGenerator
+        from syllable import SyllableStatistics
+        return SyllableGenerator(SyllableStatistics.from_corpus(_lines(args.corpus)), args.syllables)
+
+    from constrained import ConstrainedGenerator
+    kwargs = dict(lengths=args.lengths, banned=args.banned, shapes=args.constrain,
+                  lexicon=_lines([args.lexicon]) if args.lexicon else ())
+    if args.counts:
+        from counting import CountModel
+        return ConstrainedGenerator.from_counts(CountModel.load(args.counts), **kwargs)
+
+    import numpy as np
+    scorer = _scorer(args)
+    return ConstrainedGenerator(scorer.symbols, np.exp(scorer.logp), **kwargs)
+
+
+def generate(args):
+    ''' Stream generated words chunk by chunk '''
+    from generation import chunks
+    generator = _generator(args)
+    with _open(args.output) as fout:
+        for words in chunks(generator, args.count, args.seed, args.workers, args.chunk):
+            _write(fout, words)
+
+
+def count(args):
+    ''' Add (or remove) corpus lines to a count model and save it '''
+    from counting import CountModel
+    tokenizer = None
+    if args.tokenize:
+        from tokenizer import default_tokenizer
+        tokenizer = default_tokenizer()
+
+    if args.model and os.path.exists(args.model):
+        model = CountModel.load(args.model, tokenizer)
+    else:
+        model = CountModel(tokenizer)
+
+    for batch in _batches(_lines(args.inputs), args.batch):
+        if args.remove:
+            model.remove(batch)
+        else:
+            model.update(batch)
+
+    if args.model:
+        model.save(args.model, compact=args.compact)
+    if args.export:
+        model.export(args.export)
+    print(f'{model} words={int(model.bigrams[0].sum())}', file=sys.stderr)
+
+
+def score(args):
+    ''' Stream the log-likelihood of each word '''
+    scorer = _scorer(args)
+    with _open(args.output) as fout:
+        for words in _batches(_lines(args.inputs), args.batch):
+            scores = scorer.score(words, normalize=args.normalize)
+            _write(fout, [f'{w}\t{s:.6f}' for w, s in zip(words, scores.tolist())])
+
+
+def syllabify(args):
+    ''' Stream the syllables and syllable shapes of each word '''
+    from syllable import syllabify_tokens
+    from tokenizer import default_tokenizer
+    tokenizer = default_tokenizer()
+
+    with _open(args.output) as fout:
+        for words in _batches(_lines(args.inputs), args.batch):
+            rows = []
+            for word in words:
+                tokens, ids = zip(*tokenizer.scan(word))
+                syllables, shapes = syllabify_tokens(tokens, ids, tokenizer.symbols)
+                rows.append(f"{word}\t{'.'.join(syllables)}\t{'.'.join(shapes)}")
+            _write(fout, rows)
+
+
+def ingest(args):
+    '''
+    Extract IPA transcriptions from ipa-dict files. With --output a directory,
+    each input gets its own file; otherwise all are streamed to stdout.
+    '''
+    from ipa import extract_ipa, remove_stress_marks
+    clean = remove_stress_marks if args.strip_stress else (lambda __: __)
+
+    if args.output and os.path.isdir(args.output):
+        for path in args.inputs:
+            with open(path, encoding='utf-8') as fin, \
+                 _open(os.path.join(args.output, os.path.basename(path))) as fout:
+                for batch in _batches(extract_ipa(fin), args.batch):
+                    _write(fout, map(clean, batch))
+        return
+
+    with _open(args.output) as fout:
+        for batch in _batches(extract_ipa(_lines(args.inputs)), args.batch):
+            _write(fout, map(clean, batch))
+
+
+def transliterate(args):
+    ''' Stream the spelling of each word in an orthography (or back to IPA) '''
+    from transliteration import Transliterator
+    transliterator = Transliterator.from_yaml(args.spec)
+    if args.reverse:
+        transliterator = transliterator.reverse()
+
+    with _open(args.output) as fout:
+        for words in _batches(_lines(args.inputs), args.batch):
+            _write(fout, transliterator.transliterate_many(words))
+
+
+def parser():
+    ''' Return the argument parser of every subcommand '''
+    main = argparse.ArgumentParser(prog='conlang', description='Batch conlang tools.')
+    commands = main.add_subparsers(dest='command', required=True)
+
+    def command(name, function, help, inputs=True, output=True):
+        sub = commands.add_parser(name, help=help, description=help)
+        sub.set_defaults(function=function)
+        if inputs:
+            sub.add_argument('inputs', nargs='*', type=_path, help='Input files (default: stdin)')
+        if output:
+            sub.add_argument('-o', '--output', type=_path, help='Output file (default: stdout)')
+        sub.add_argument('--batch', type=int, default=BATCH, help='Lines per batch')
+        return sub
+
+    def model(sub):
+        sub.add_argument('--model', type=_path, default=os.path.join(HOME, 'resources/pickles/bigrams.pkl'),
+                         help='Pickled nested bigram counts')
+        sub.add_argument('--counts', type=_path, help='Count delta log (overrides --model)')
+        sub.add_argument('--smoothing', default='kneser-ney', choices=['add-k', 'kneser-ney'])
+        sub.add_argument('--tokenize', action='store_true', help='Score IPA tokens instead of characters')
+
+    sub = command('generate', generate, 'Generate words', inputs=False)
+    sub.add_argument('-n', '--count', type=int, default=100)
+    sub.add_argument('--seed', type=int, help='Root seed (same seed, same words on any workers)')
+    sub.add_argument('--workers', type=int, default=1, help='Worker processes (0 for all CPUs)')
+    sub.add_argument('--chunk', type=int, default=1024, help='Words per chunk')
+    sub.add_argument('--lengths', type=int, nargs=2, default=(2, 10), metavar=('MIN', 'MAX'),
+                     help='Symbols per word of the bigram generator')
+    sub.add_argument('--banned', nargs='*', default=(), help='Forbidden clusters (e.g., ŋk ^a)')
+    sub.add_argument('--constrain', nargs='*', help='Allowed syllable shapes (e.g., CV CVC)')
+    sub.add_argument('--lexicon', type=_path, help='File of words that may not be generated')
+    sub.add_argument('--corpus', type=_path, nargs='+', help='Generate syllables from corpus statistics')
+    sub.add_argument('--shapes', nargs='+', help='Generate random sounds in these shapes (e.g., cv cvc)')
+    sub.add_argument('--syllables', type=int, nargs=2, default=(1, 3), metavar=('MIN', 'MAX'))
+    model(sub)
+
+    sub = command('count', count, 'Count unigrams and bigrams of a corpus', output=False)
+    sub.add_argument('--model', type=_path, help='Count delta log to update (created if missing)')
+    sub.add_argument('--export', type=_path, help='Also write the legacy pickles to this directory')
+    sub.add_argument('--remove', action='store_true', help='Subtract the lines instead')
+    sub.add_argument('--compact', action='store_true', help='Rewrite the log as one record')
+    sub.add_argument('--tokenize', action='store_true', help='Count IPA tokens instead of characters')
+
+    sub = command('score', score, 'Score the phonotactic log-likelihood of words')
+    sub.add_argument('--normalize', action='store_true', help='Divide by the number of transitions')
+    model(sub)
+
+    command('syllabify', syllabify, 'Split words into syllables')
+
+    sub = command('transliterate', transliterate, 'Spell IPA words in an orthography')
+    sub.add_argument('--spec', type=_path, default=os.path.join(HOME, 'resources/orthography.yaml'),
+                     help='YAML spec with mapping and rules')
+    sub.add_argument('--reverse', action='store_true', help='Spell the orthography back as IPA')
+
+    sub = command('ingest', ingest, 'Extract IPA from ipa-dict files')
+    sub.add_argument('--strip-stress', action='store_true', help='Remove stress marks')
+
+    return main
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    if getattr(args, 'workers', 1) == 0:
+        args.workers = None
+
+    # Resources are read relative to the package directory
+    os.chdir(HOME)
+    if HOME not in sys.path:
+        sys.path.insert(0, HOME)
+
+    try:
+        args.function(args)
+    except BrokenPipeError:
+        # Downstream closed early (e.g., | head)
+        sys.stderr.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: coalescence.py
+# author: glenn abastillas
+# created: 2020-06-22
+# description: table-driven combination (coalescence) of sounds as feature codes
+from functools import lru_cache
+from soundarray import UNSET, SoundArray, default_encoder, phonology
+from distance import NearestSound
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def _manners():
+    ''' Return the manner codes of stop, fricative and affricate '''
+    phon = phonology()
+    manner = phon.features[phon.labels.index('manner')]
+    return manner.index('stop'), manner.index('fricative'), manner.index('affricate')
+
+
+def _combine(feature, a, b):
+    '''
+    Return the code of a feature when sounds with codes a and b coalesce
+
+    Parameters
+    ----------
+        feature (str) : Feature name
+        a, b (int) : Feature codes of the first and second sound (-1 if unset)
+
+    Notes
+    -----
+        Voiced wins over voiceless, places meet halfway, and a stop with a
+        fricative becomes an affricate. Otherwise the first sound's value is
+        kept. An unset value always yields to a set one.
+    '''
+    if a == UNSET or b == UNSET:
+        return max(a, b)
+
+    if feature == 'voicing':
+        return min(a, b)
+
+    if feature == 'place':
+        return (a + b) // 2
+
+    if feature == 'manner':
+        stop, fricative, affricate = _manners()
+        if {a, b} == {stop, fricative}:
+            return affricate
+
+    return a
+
+
+class Coalescence():
+    '''
+    Precomputed tables for combining pairs of sounds elementwise
+
+    Attributes
+    ----------
+        sizes (np.array) : Number of values of each feature plus one for unset
+        table (np.array) : Flat result codes of every feature value pair
+        symbols (list) : Consonant characters indexed by the pair table
+        index (dict) : Mapping of consonant characters to their index
+        pairs (np.array) : Consonant x consonant table of the closest
+            consonant index to each combination
+    '''
+
+    def __init__(self, encoder=None):
+        from sounds import SNDS
+        encoder = encoder or default_encoder()
+        phon = phonology()
+
+        self.sizes = np.array([len(__) + 1 for __ in phon.features])
+        self._bases = np.concatenate(([0], np.cumsum(self.sizes ** 2)[:-1]))
+
+        tables = []
+        for feature, size in zip(phon.labels, self.sizes):
+            codes = list(range(size - 1)) + [UNSET]
+            table = [[_combine(feature, a, b) for b in codes] for a in codes]
+            tables.append(np.array(table, dtype=np.int8).ravel())
+        self.table = np.concatenate(tables)
+
+        vowels = {__.character for __ in SNDS.vowel}
+        consonants = [i for i, __ in enumerate(encoder.symbols) if __ not in vowels]
+
+        self.symbols = [encoder.symbols[__] for __ in consonants]
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self._codes = encoder.inventory[consonants]
+
+        nearest = NearestSound('c', encoder=encoder)
+        lookup = np.array([self.index[__] for __ in nearest.symbols])
+
+        n = len(self.symbols)
+        left = np.repeat(self._codes, n, axis=0)
+        right = np.tile(self._codes, (n, 1))
+        combined = self.codes(left, right)
+        self.pairs = lookup[nearest.batch(combined)].reshape(n, n)
+
+    def __repr__(self):
+        return f"Coalescence( consonants={len(self.symbols)} )"
+
+    def codes(self, a, b):
+        '''
+        Combine two arrays of feature codes elementwise in one gather
+
+        Parameters
+        ----------
+            a, b (SoundArray, np.array) : Feature codes with shape (N, features)
+
+        Returns
+        -------
+            Array of combined feature codes with shape (N, features)
+        '''
+        a = a.codes if isinstance(a, SoundArray) else np.asarray(a)
+        b = b.codes if isinstance(b, SoundArray) else np.asarray(b)
+
+        # Unset (-1) wraps to the last value of each feature's table
+        a, b = a % self.sizes, b % self.sizes
+        return self.table[self._bases + a * self.sizes + b]
+
+    def combine(self, a, b):
+        ''' Return the SoundArray of two SoundArrays combined elementwise '''
+        return SoundArray(self.codes(a, b), a.offsets if isinstance(a, SoundArray) else None)
+
+    def ids(self, a, b):
+        '''
+        Return the closest consonant of each combined pair of consonant indices
+
+        Parameters
+        ----------
+            a, b (np.array) : Indices into symbols
+        '''
+        return self.pairs[a, b]
+
+    def character(self, a, b):
+        ''' Return the consonant character closest to two combined consonants '''
+        return self.symbols[self.pairs[self.index[a], self.index[b]]]
+
+
+@lru_cache(maxsize=None)
+def default_coalescence():
+    ''' Return the shared coalescence tables '''
+    return Coalescence()
+
+
+def coalesce(a, b):
+    ''' Combine two SoundArrays or code arrays elementwise '''
+    return default_coalescence().codes(a, b)
+
+
+if __name__ == '__main__':
+    c = default_coalescence()
+    print(c.character('t', 's'), c.character('p', 'f'), c.character('d', 'ʒ'))
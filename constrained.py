@@ -0,0 +1,433 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: constrained.py
+# author: glenn abastillas
+# created: 2020-07-04
+# description: word generation from a bigram model compiled with constraints
+'''
+Constraints are compiled with the ^...$ bigram model into one automaton whose
+state is (banned cluster matcher state, syllable shape state, previous
+symbol). For every reachable state q and length t, mass[t, q] holds the total
+probability of the valid words that complete from q after t symbols. Each
+symbol is drawn proportionally to P(s | q) * mass[t + 1, next(q, s)], so only
+valid words are produced and each with probability P(word) / mass[0, start].
+
+Words already in a lexicon are excluded by walking a trie of the lexicon
+alongside the automaton and subtracting the mass of lexicon words below the
+current trie node.
+'''
+from profiling import instrument
+from tokenizer import Tokenizer
+import numpy as np
+
+START, END, UNKNOWN = '^', '$', '<unk>'
+CONSONANT, VOWEL = 0, 1
+
+
+def _aho_corasick(patterns, size):
+    '''
+    Return the transition table and banned flags of an Aho-Corasick automaton
+
+    Parameters
+    ----------
+        patterns (list) : Sequences of symbol ids to match
+        size (int) : Number of symbol ids
+    '''
+    goto, banned = [{}], [False]
+    for pattern in patterns:
+        node = 0
+        for symbol in pattern:
+            if symbol not in goto[node]:
+                goto[node][symbol] = len(goto)
+                goto.append({})
+                banned.append(False)
+            node = goto[node][symbol]
+        banned[node] = True
+
+    table = np.zeros((len(goto), size), dtype=np.int64)
+    fail = [0] * len(goto)
+    queue = [0]
+    for node in queue:
+        if node:
+            table[node] = table[fail[node]]
+        for symbol, child in goto[node].items():
+            fail[child] = table[fail[node], symbol] if node else 0
+            banned[child] = banned[child] or banned[fail[child]]
+            table[node, symbol] = child
+            queue.append(child)
+
+    return table, np.array(banned)
+
+
+def _shape_automaton(shapes):
+    '''
+    Return the transition table over consonant/vowel classes and the accepting
+    flags of a DFA for words made of one or more of the given syllable shapes.
+    State 0 is the start state and the last state is dead.
+
+    Parameters
+    ----------
+        shapes (list) : Syllable shapes (e.g., CV, CVC)
+    '''
+    if not shapes:
+        return np.zeros((2, 2), dtype=np.int64), np.array([True, False])
+
+    trie, terminal = [{}], [False]
+    for shape in shapes:
+        node = 0
+        for kind in shape.upper():
+            kind = VOWEL if kind == 'V' else CONSONANT
+            if kind not in trie[node]:
+                trie[node][kind] = len(trie)
+                trie.append({})
+                terminal.append(False)
+            node = trie[node][kind]
+        terminal[node] = True
+
+    def step(nodes, kind):
+        following = set()
+        for node in nodes:
+            child = trie[node].get(kind)
+            if child is not None:
+                following.add(child)
+                if terminal[child]:
+                    following.add(0)
+        return frozenset(following)
+
+    states = {frozenset([0]): 0}
+    order, transitions = [frozenset([0])], []
+    for nodes in order:
+        row = []
+        for kind in (CONSONANT, VOWEL):
+            following = step(nodes, kind)
+            if following and following not in states:
+                states[following] = len(order)
+                order.append(following)
+            row.append(states.get(following, -1))
+        transitions.append(row)
+
+    dead = len(order)
+    table = np.array(transitions + [[dead, dead]], dtype=np.int64)
+    table[table < 0] = dead
+    accepting = np.array([any(terminal[__] for __ in nodes) for nodes in order] + [False])
+    return table, accepting
+
+
+class ConstrainedGenerator():
+    '''
+    Sample words from a bigram model subject to a length range, banned
+    clusters, required syllable shapes and exclusion of an existing lexicon
+
+    Attributes
+    ----------
+        symbols (list) : Model symbols, including ^ and $
+        outcomes (list) : Symbols that may appear in generated words
+        lengths (tuple) : Minimum and maximum number of symbols per word
+        mass (np.array) : Valid completion mass of shape (lengths[1] + 2, states + 1)
+    '''
+
+    @instrument()
+    def __init__(self, symbols, matrix, lengths=(1, 10), banned=(), shapes=None,
+                 lexicon=(), tokenizer=None):
+        '''
+        Parameters
+        ----------
+            symbols (list) : Symbol of each row and column of matrix, including
+                ^ and $ word boundaries
+            matrix (np.array) : P(next | previous) with previous symbols as rows
+            lengths (tuple) : Minimum and maximum number of symbols per word
+            banned (list) : Clusters that may not appear (e.g., ŋk). A leading
+                ^ or trailing $ anchors a cluster to a word edge.
+            shapes (list) : Syllable shapes words must be composed of (e.g.,
+                CV, CVC). Vowels are the sounds.yaml vowels.
+            lexicon (iterable) : Words that may not be generated
+            tokenizer (Tokenizer) : Tokenizer over symbols used to split
+                clusters and lexicon words
+        '''
+        from syllable import VOWELS
+
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.start, self.end = self.index[START], self.index[END]
+        self.lengths = (max(int(lengths[0]), 1), int(lengths[1]))
+
+        matrix = np.asarray(matrix, dtype=np.float64)
+        size = len(self.symbols)
+
+        self._outcomes = np.array([i for i, s in enumerate(self.symbols)
+                                   if s not in (START, END, UNKNOWN)], dtype=np.int64)
+        self.outcomes = [self.symbols[__] for __ in self._outcomes]
+        self.tokenizer = tokenizer or Tokenizer(self.outcomes, aliases={}, lengthen=False)
+
+        kinds = np.array([VOWEL if s[:1] in VOWELS else CONSONANT for s in self.symbols])
+
+        patterns = [__ for __ in (self._encode(__, edges=True) for __ in banned) if __]
+        self._matcher, self._banned = _aho_corasick(patterns, size)
+        self._shapes, self._accepting = _shape_automaton(shapes)
+
+        self._matrix, self._kinds = matrix, kinds
+        self._compile()
+        self._exclude(lexicon)
+
+    def __repr__(self):
+        return f"ConstrainedGenerator( states={self.states}, lengths={self.lengths} )"
+
+    def _encode(self, word, edges=False):
+        ''' Return the symbol ids of a word, or None if it has unknown symbols '''
+        head, tail = [], []
+        if edges and word.startswith(START):
+            head, word = [self.start], word[1:]
+        if edges and word.endswith(END):
+            tail, word = [self.end], word[:-1]
+
+        ids = []
+        for token in self.tokenizer.tokenize(word, ids=True).tolist():
+            symbol = self.tokenizer.symbols[token] if token < self.tokenizer.unknown else None
+            if symbol not in self.index:
+                return None
+            ids.append(self.index[symbol])
+        return head + ids + tail
+
+    def _decode(self, codes):
+        ''' Split product state codes into matcher, shape and symbol states '''
+        shapes, size = self._shapes.shape[0], len(self.symbols)
+        rest, symbol = np.divmod(codes, size)
+        matcher, shape = np.divmod(rest, shapes)
+        return matcher, shape, symbol
+
+    def _code(self, matcher, shape, symbol):
+        return (matcher * self._shapes.shape[0] + shape) * len(self.symbols) + symbol
+
+    def _expand(self, codes):
+        '''
+        Return the weight and next state code of every outcome, and the end
+        weight, for product states
+
+        Parameters
+        ----------
+            codes (np.array) : Product state codes
+        '''
+        matcher, shape, symbol = self._decode(codes)
+        outcomes = self._outcomes
+
+        matched = self._matcher[matcher][:, outcomes]
+        shaped = self._shapes[shape][:, self._kinds[outcomes]]
+        dead = self._shapes.shape[0] - 1
+
+        weights = self._matrix[symbol][:, outcomes] * ~self._banned[matched] * (shaped != dead)
+        following = self._code(matched, shaped, outcomes[None])
+
+        closing = self._matcher[matcher, self.end]
+        ends = self._matrix[symbol, self.end] * ~self._banned[closing] * self._accepting[shape]
+        return weights, following, ends
+
+    def _compile(self):
+        ''' Enumerate reachable product states and compute the mass tables '''
+        start = self._code(self._matcher[0, self.start], 0, self.start)
+
+        reachable, frontier = {start}, np.array([start])
+        for _ in range(self.lengths[1]):
+            weights, following, __ = self._expand(frontier)
+            candidates = np.unique(following[weights > 0])
+            frontier = np.array([__ for __ in candidates.tolist() if __ not in reachable])
+            if not frontier.size:
+                break
+            reachable.update(frontier.tolist())
+
+        codes = np.array(sorted(reachable))
+        weights, following, ends = self._expand(codes)
+
+        # Transitions to unreachable states carry no weight and point to the
+        # dead state, whose mass is always zero
+        position = np.searchsorted(codes, following).clip(max=codes.size - 1)
+        found = codes[position] == following
+        self.states = codes.size
+        self._weights = np.where(found, weights, 0.0)
+        self._next = np.where(found, position, self.states)
+        self._ends = ends
+        self._start = int(np.searchsorted(codes, start))
+
+        low, high = self.lengths
+        self.mass = np.zeros((high + 2, self.states + 1))
+        for t in range(high, -1, -1):
+            ending = ends if low <= t else 0.0
+            continuing = (self._weights * self.mass[t + 1][self._next]).sum(axis=1)
+            self.mass[t, :self.states] = continuing + ending
+
+        if not self.mass[0, self._start] > 0:
+            raise ValueError('No word satisfies the constraints.')
+
+    def _exclude(self, lexicon):
+        ''' Build the lexicon trie and the mass of lexicon words below each node '''
+        self._children, self._terminal = [{}], [False]
+        states, depths = [self._start], [0]
+
+        for word in lexicon:
+            ids = self._encode(word.strip())
+            if not ids or len(ids) > self.lengths[1]:
+                continue
+
+            node, valid = 0, True
+            for symbol in ids:
+                column = int(np.searchsorted(self._outcomes, symbol))
+                state = states[node]
+                if self._weights[state, column] <= 0:
+                    valid = False
+                    break
+                if column not in self._children[node]:
+                    self._children[node][column] = len(self._children)
+                    self._children.append({})
+                    self._terminal.append(False)
+                    states.append(int(self._next[state, column]))
+                    depths.append(depths[node] + 1)
+                node = self._children[node][column]
+
+            if valid:
+                self._terminal[node] = True
+
+        low = self.lengths[0]
+        self._excluded = np.zeros(len(self._children))
+        for node in range(len(self._children) - 1, -1, -1):
+            state, depth = states[node], depths[node]
+            total = self._ends[state] if self._terminal[node] and depth >= low else 0.0
+            for column, child in self._children[node].items():
+                total += self._weights[state, column] * self._excluded[child]
+            self._excluded[node] = total
+
+        # Trie edges as sorted node * outcomes + column keys for vectorized lookups
+        width = self._outcomes.size
+        edges = sorted((node * width + column, child) for node, children in enumerate(self._children)
+                       for column, child in children.items())
+        self._edges = np.array([__ for __, _ in edges], dtype=np.int64)
+        self._targets = np.array([__ for _, __ in edges], dtype=np.int64)
+        self._final = np.array(self._terminal, dtype=bool)
+
+        if not self.mass[0, self._start] - self._excluded[0] > 0:
+            raise ValueError('No word outside the lexicon satisfies the constraints.')
+
+    def _follow(self, nodes, columns):
+        ''' Return the trie child of each node along a column, or -1 '''
+        keys = nodes * self._outcomes.size + columns
+        position = np.searchsorted(self._edges, keys).clip(max=max(self._edges.size - 1, 0))
+        found = (nodes >= 0) & (self._edges[position] == keys) if self._edges.size else nodes < -1
+        return np.where(found, self._targets[position] if self._edges.size else -1, -1)
+
+    def total(self):
+        ''' Return the model probability of the words that satisfy the constraints '''
+        return float(self.mass[0, self._start] - self._excluded[0])
+
+    def probability(self, word):
+        '''
+        Return the probability that generate draws a word
+
+        Parameters
+        ----------
+            word (str) : IPA word
+        '''
+        ids = self._encode(word)
+        if not ids or not self.lengths[0] <= len(ids) <= self.lengths[1]:
+            return 0.0
+
+        state, node, weight = self._start, 0, 1.0
+        for symbol in ids:
+            column = int(np.searchsorted(self._outcomes, symbol))
+            if column >= self._outcomes.size or self._outcomes[column] != symbol:
+                return 0.0
+            weight *= self._weights[state, column]
+            state = int(self._next[state, column])
+            node = self._children[node].get(column, -1) if node >= 0 else -1
+            if state == self.states:
+                return 0.0
+
+        if node >= 0 and self._terminal[node]:
+            return 0.0
+        return float(weight * self._ends[state] / self.total())
+
+    @instrument()
+    def generate(self, count, rng):
+        '''
+        Return a list of words that satisfy every constraint
+
+        Parameters
+        ----------
+            count (int) : Number of words
+            rng (np.random.Generator) : Random number generator to draw from
+
+        Notes
+        -----
+            All words advance together one symbol per step, so a batch costs
+            O(count * symbols) per position, the same as unconstrained sampling.
+        '''
+        low, high = self.lengths
+        width = self._outcomes.size
+
+        states = np.full(count, self._start, dtype=np.int64)
+        nodes = np.zeros(count, dtype=np.int64)
+        tokens = np.full((count, high + 1), -1, dtype=np.int64)
+        active = np.arange(count)
+
+        for t in range(high + 1):
+            if not active.size:
+                break
+
+            state = states[active]
+            weights = np.empty((active.size, width + 1))
+            weights[:, :width] = self._weights[state] * self.mass[t + 1][self._next[state]]
+            weights[:, width] = self._ends[state] if t >= low else 0.0
+
+            # Words still spelling out a lexicon prefix lose the mass of the
+            # lexicon words below their trie node
+            rows = np.flatnonzero(nodes[active] >= 0)
+            if rows.size:
+                node = nodes[active[rows]]
+                first = np.searchsorted(self._edges, node * width)
+                counts = np.searchsorted(self._edges, (node + 1) * width) - first
+                edges = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+                rows_, q = np.repeat(rows, counts), np.repeat(state[rows], counts)
+                columns = self._edges[edges] % width
+                remaining = self.mass[t + 1, self._next[q, columns]] - self._excluded[self._targets[edges]]
+                weights[rows_, columns] = self._weights[q, columns] * np.maximum(remaining, 0.0)
+                weights[rows[self._final[node]], width] = 0.0
+
+            cumulative = np.cumsum(weights, axis=1)
+            draws = rng.random(active.size) * cumulative[:, -1]
+            choices = (cumulative <= draws[:, None]).sum(axis=1).clip(max=width)
+
+            going = choices < width
+            moving, columns = active[going], choices[going]
+            tokens[moving, t] = columns
+            states[moving] = self._next[states[moving], columns]
+            nodes[moving] = self._follow(nodes[moving], columns)
+            active = moving
+
+        outcomes = self.outcomes
+        return [''.join(outcomes[__] for __ in row if __ >= 0) for row in tokens.tolist()]
+
+    @classmethod
+    def from_counts(cls, model, **kwargs):
+        '''
+        Build a generator from a counting.CountModel
+
+        Parameters
+        ----------
+            model (CountModel) : Bigram counts with ^ and $ boundaries
+            kwargs : Constraints (see __init__)
+        '''
+        return cls(model.symbols, model.probabilities(), **kwargs)
+
+    @classmethod
+    def from_probabilities(cls, model, **kwargs):
+        '''
+        Build a generator from a probability.ProbabilityModel whose conditions
+        and outcomes share one symbol table (e.g., from mixing.LanguageMixer)
+        '''
+        return cls(model.conditions, model.matrix, **kwargs)
+
+
+if __name__ == '__main__':
+    from counting import CountModel
+    counts = CountModel()
+    counts.update(['pata', 'kapa', 'tapak', 'anka', 'pakta'])
+    generator = ConstrainedGenerator.from_counts(counts, lengths=(3, 5), banned=['kt', '^a'],
+                                                 shapes=['CV', 'CVC'], lexicon=['pata'])
+    print(generator, generator.generate(8, np.random.default_rng(2020)))
@@ -0,0 +1,401 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: counting.py
+# author: glenn abastillas
+# created: 2020-07-01
+# description: incremental unigram and bigram count models with delta persistence
+'''
+Delta log layout (little-endian). A file is a sequence of records, each
+adding signed count deltas to the state built by the records before it.
+
+    header      magic b'CLDL', symbol bytes, bigram entries, unigram entries
+    symbols     UTF-8 new symbols joined by newlines, in id order
+    bigrams     int32[entries] rows, int32[entries] columns, int64[entries] deltas
+    unigrams    int32[entries] ids, int64[entries] deltas
+'''
+from collections import defaultdict
+from profiling import instrument
+import numpy as np
+import os
+import pickle
+import struct
+
+MAGIC = b'CLDL'
+RECORD = struct.Struct('<4sQQQ')
+START, END = '^', '$'
+
+
+class CountModel():
+    '''
+    Unigram and bigram counts (with ^ and $ word boundaries) that are updated
+    in place as corpus lines are added or removed. Normalized probabilities
+    are recomputed lazily, and only for rows whose counts changed.
+
+    Attributes
+    ----------
+        symbols (list) : Symbols in id order. Ids 0 and 1 are ^ and $.
+        unigrams (np.array) : Count of each symbol
+        bigrams (np.array) : Counts with previous symbols as rows
+    '''
+
+    def __init__(self, tokenizer=None, capacity=256):
+        '''
+        Parameters
+        ----------
+            tokenizer (Tokenizer) : Split lines into IPA tokens instead of characters
+            capacity (int) : Initial number of symbols the arrays can hold
+        '''
+        self.tokenizer = tokenizer
+        self.symbols = []
+        self.index = {}
+
+        self._unigrams = np.zeros(capacity, dtype=np.int64)
+        self._bigrams = np.zeros((capacity, capacity), dtype=np.int64)
+        self._probabilities = np.zeros((capacity, capacity))
+        self._dirty = np.zeros(capacity, dtype=bool)
+
+        self._pending = []
+        self._log = None
+
+        self._ids([START, END])
+
+    def __repr__(self):
+        return f"CountModel( symbols={len(self.symbols)}, bigrams={self.N()} )"
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @property
+    def unigrams(self):
+        return self._unigrams[:len(self.symbols)]
+
+    @property
+    def bigrams(self):
+        return self._bigrams[:len(self.symbols), :len(self.symbols)]
+
+    def N(self):
+        ''' Return the total number of bigrams counted '''
+        return int(self.bigrams.sum())
+
+    def _grow(self, size):
+        ''' Double the arrays until they hold size symbols '''
+        capacity = self._unigrams.size
+        if size <= capacity:
+            return
+
+        while capacity < size:
+            capacity *= 2
+
+        old = self._unigrams.size
+        self._unigrams = np.concatenate((self._unigrams, np.zeros(capacity - old, dtype=np.int64)))
+        self._dirty = np.concatenate((self._dirty, np.zeros(capacity - old, dtype=bool)))
+
+        bigrams = np.zeros((capacity, capacity), dtype=np.int64)
+        bigrams[:old, :old] = self._bigrams
+        self._bigrams = bigrams
+
+        probabilities = np.zeros((capacity, capacity))
+        probabilities[:old, :old] = self._probabilities
+        self._probabilities = probabilities
+
+    def _ids(self, symbols):
+        ''' Return ids for symbols, adding new symbols to the table '''
+        ids = []
+        for symbol in symbols:
+            if symbol not in self.index:
+                self.index[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+            ids.append(self.index[symbol])
+        self._grow(len(self.symbols))
+        return np.array(ids, dtype=np.int64)
+
+    def _sequences(self, lines):
+        ''' Return the unigram ids and bigram (row, column) ids of lines '''
+        tokens = []
+        for line in lines:
+            line = line.strip()
+            if line:
+                tokens.append(self.tokenizer.tokenize(line) if self.tokenizer else line)
+
+        words = self._ids(__ for word in tokens for __ in [START, *word, END])
+        lengths = np.array([len(__) + 2 for __ in tokens], dtype=np.int64)
+
+        # Pairs that cross from one word's $ into the next word's ^ are dropped
+        within = np.ones(max(words.size - 1, 0), dtype=bool)
+        within[np.cumsum(lengths)[:-1] - 1] = False
+        rows, columns = words[:-1][within], words[1:][within]
+
+        inside = (words != self.index[START]) & (words != self.index[END])
+        return words[inside], rows, columns
+
+    def _apply(self, unigrams, rows, columns, sign):
+        ''' Add signed counts and mark the changed rows as dirty '''
+        np.add.at(self._unigrams, unigrams, sign)
+        np.add.at(self._bigrams, (rows, columns), sign)
+        self._dirty[rows] = True
+
+    @instrument()
+    def update(self, lines):
+        '''
+        Count the unigrams and bigrams of new corpus lines
+
+        Parameters
+        ----------
+            lines (iterable) : IPA words, one per line
+        '''
+        unigrams, rows, columns = self._sequences(lines)
+        self._apply(unigrams, rows, columns, 1)
+        self._pending.append((unigrams, rows, columns, 1))
+
+    @instrument()
+    def remove(self, lines):
+        '''
+        Subtract the unigrams and bigrams of corpus lines counted before
+
+        Parameters
+        ----------
+            lines (iterable) : IPA words, one per line
+        '''
+        unigrams, rows, columns = self._sequences(lines)
+
+        size = len(self.symbols)
+        bigrams = np.bincount(rows * size + columns, minlength=size * size).reshape(size, size)
+        if (np.bincount(unigrams, minlength=size) > self.unigrams).any() or (bigrams > self.bigrams).any():
+            raise ValueError('Cannot remove lines that were not counted.')
+
+        self._apply(unigrams, rows, columns, -1)
+        self._pending.append((unigrams, rows, columns, -1))
+
+    def probabilities(self):
+        '''
+        Return P(next | previous) as a matrix over symbol ids
+
+        Notes
+        -----
+            Only rows changed since the last call are renormalized, so the cost
+            after an update is proportional to the symbols it touched.
+        '''
+        size = len(self.symbols)
+        dirty = np.flatnonzero(self._dirty[:size])
+
+        if dirty.size:
+            counts = self._bigrams[dirty, :size]
+            totals = counts.sum(axis=1, keepdims=True)
+            self._probabilities[dirty, :size] = np.divide(counts, totals, out=np.zeros(counts.shape),
+                                                          where=totals > 0)
+            self._dirty[dirty] = False
+
+        return self._probabilities[:size, :size]
+
+    def unigram_probabilities(self):
+        ''' Return the relative frequency of each symbol '''
+        total = self.unigrams.sum()
+        return self.unigrams / total if total else np.zeros(len(self.symbols))
+
+    def prob(self, previous, following):
+        ''' Return P(following | previous), or 0 for unknown symbols '''
+        if previous not in self.index or following not in self.index:
+            return 0.0
+        return float(self.probabilities()[self.index[previous], self.index[following]])
+
+    def _nested(self, matrix):
+        ''' Return nonzero matrix entries as nested dicts keyed by symbol '''
+        model = defaultdict(dict)
+        for a, b in zip(*np.nonzero(matrix)):
+            model[self.symbols[a]][self.symbols[b]] = matrix[a, b].item()
+        return model
+
+    def to_nested(self):
+        '''
+        Return the counts in the pickle formats of ipa.count_unigrams and
+        ipa.count_bigrams
+
+        Returns
+        -------
+            Tuple of unigram counts and nested bigram counts
+        '''
+        unigrams = defaultdict(int, {self.symbols[__]: int(self.unigrams[__])
+                                     for __ in np.flatnonzero(self.unigrams)})
+        return unigrams, self._nested(self.bigrams)
+
+    def export(self, directory='resources/pickles'):
+        '''
+        Write bigrams.pkl, bigrams_p.pkl, unigrams.pkl and unigrams_p.pkl
+
+        Parameters
+        ----------
+            directory (str) : Output directory
+        '''
+        unigrams, bigrams = self.to_nested()
+        frequencies = self.unigram_probabilities()
+        outputs = {
+            'unigrams': unigrams,
+            'unigrams_p': defaultdict(float, {s: float(frequencies[self.index[s]]) for s in unigrams}),
+            'bigrams': bigrams,
+            'bigrams_p': self._nested(self.probabilities()),
+        }
+        for name, model in outputs.items():
+            with open(os.path.join(directory, f'{name}.pkl'), 'wb') as fout:
+                pickle.dump(model, fout, protocol=3)
+
+    def _record(self, symbols, unigrams, rows, columns, bigrams):
+        ''' Return one delta log record '''
+        heap = '\n'.join(symbols).encode('utf-8')
+        ids = np.flatnonzero(unigrams)
+        return b''.join((RECORD.pack(MAGIC, len(heap), rows.size, ids.size), heap,
+                         rows.astype('<i4').tobytes(), columns.astype('<i4').tobytes(),
+                         bigrams.astype('<i8').tobytes(), ids.astype('<i4').tobytes(),
+                         unigrams[ids].astype('<i8').tobytes()))
+
+    @staticmethod
+    def _stamp(path):
+        ''' Return what identifies the current contents of a log file '''
+        status = os.stat(path)
+        return os.path.abspath(path), status.st_size, status.st_mtime_ns
+
+    @staticmethod
+    def _log_symbols(path):
+        ''' Return the symbol table of a delta log in id order, seeking past the count data '''
+        symbols = []
+        with open(path, 'rb') as fin:
+            while True:
+                header = fin.read(RECORD.size)
+                if not header:
+                    return symbols
+
+                magic, heap, entries, unigrams = RECORD.unpack(header)
+                if magic != MAGIC:
+                    raise ValueError(f'{path} is not a count delta log.')
+                text = fin.read(heap).decode('utf-8')
+                symbols.extend(text.split('\n') if text else [])
+                fin.seek(entries * 16 + unigrams * 12, 1)
+
+    def _log_index(self, path):
+        '''
+        Return the symbol table of a delta log as a dict of ids. The table of
+        the log this model last loaded or saved is cached, and only read again
+        if the file changed since.
+        '''
+        if self._log is None or self._log[0] != self._stamp(path):
+            self._log = (self._stamp(path), self._log_symbols(path))
+        return {s: i for i, s in enumerate(self._log[1])}
+
+    @instrument()
+    def save(self, path, compact=False):
+        '''
+        Append the changes since the last save to a delta log
+
+        Parameters
+        ----------
+            path (str) : Delta log file
+            compact (bool) : Rewrite the log as a single record of the current counts
+
+        Notes
+        -----
+            Ids are remapped onto the symbol table already in the log, so a
+            model may append to a log it was not loaded from.
+        '''
+        if compact or not os.path.exists(path):
+            rows, columns = np.nonzero(self.bigrams)
+            record = self._record(self.symbols, self.unigrams, rows, columns,
+                                  self.bigrams[rows, columns])
+            with open(path, 'wb') as fout:
+                fout.write(record)
+            symbols = list(self.symbols)
+        else:
+            index = self._log_index(path)
+            new = [__ for __ in self.symbols if __ not in index]
+            for symbol in new:
+                index[symbol] = len(index)
+            remap = np.array([index[__] for __ in self.symbols], dtype=np.int64)
+            width = len(index)
+
+            unigrams = np.zeros(width, dtype=np.int64)
+            bigrams = np.zeros(width * width, dtype=np.int64)
+            for ids, rows, columns, sign in self._pending:
+                np.add.at(unigrams, remap[ids], sign)
+                np.add.at(bigrams, remap[rows] * width + remap[columns], sign)
+
+            changed = np.flatnonzero(bigrams)
+            record = self._record(new, unigrams, changed // width, changed % width, bigrams[changed])
+            with open(path, 'ab') as fout:
+                fout.write(record)
+            symbols = self._log[1] + new
+
+        self._log = (self._stamp(path), symbols)
+        self._pending = []
+
+    @classmethod
+    @instrument()
+    def load(cls, path, tokenizer=None):
+        '''
+        Replay a delta log written with `save`
+
+        Parameters
+        ----------
+            path (str) : Delta log file
+            tokenizer (Tokenizer) : Tokenizer for later updates
+        '''
+        model = cls(tokenizer)
+        model.symbols, model.index = [], {}
+
+        with open(path, 'rb') as fin:
+            data = fin.read()
+
+        position = 0
+        while position < len(data):
+            magic, heap, entries, unigrams = RECORD.unpack_from(data, position)
+            if magic != MAGIC:
+                raise ValueError(f'{path} is not a count delta log.')
+            position += RECORD.size
+
+            symbols = data[position:position + heap].decode('utf-8')
+            position += heap
+            model._ids(symbols.split('\n') if symbols else [])
+
+            arrays = []
+            for dtype, count in (('<i4', entries), ('<i4', entries), ('<i8', entries),
+                                 ('<i4', unigrams), ('<i8', unigrams)):
+                arrays.append(np.frombuffer(data, dtype=dtype, count=count, offset=position))
+                position += count * np.dtype(dtype).itemsize
+
+            rows, columns, deltas, ids, counts = arrays
+            np.add.at(model._bigrams, (rows, columns), deltas)
+            np.add.at(model._unigrams, ids, counts)
+            model._dirty[rows] = True
+
+        model._log = (model._stamp(path), list(model.symbols))
+        return model
+
+    @classmethod
+    def from_pickle(cls, bigrams='resources/pickles/bigrams.pkl',
+                    unigrams='resources/pickles/unigrams.pkl', tokenizer=None):
+        ''' Build a model from nested count pickles '''
+        model = cls(tokenizer)
+
+        with open(bigrams, 'rb') as fin:
+            nested = pickle.load(fin)
+        for a, row in nested.items():
+            rows, columns = model._ids([a] * len(row)), model._ids(row)
+            model._bigrams[rows, columns] += list(row.values())
+            model._dirty[rows] = True
+
+        with open(unigrams, 'rb') as fin:
+            nested = pickle.load(fin)
+        ids = model._ids(nested)
+        model._unigrams[ids] += list(nested.values())
+
+        return model
+
+
+if __name__ == '__main__':
+    if os.path.exists('/tmp/counts.cldl'):
+        os.remove('/tmp/counts.cldl')
+    model = CountModel()
+    model.update(['pata', 'kapa'])
+    model.save('/tmp/counts.cldl')
+    model.update(['tapa'])
+    model.remove(['kapa'])
+    model.save('/tmp/counts.cldl')
+    loaded = CountModel.load('/tmp/counts.cldl')
+    print(loaded, loaded.prob('^', 'p'), (loaded.bigrams == model.bigrams).all())
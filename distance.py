@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: distance.py
+# author: glenn abastillas
+# created: 2020-06-21
+# description: feature-weighted phonetic distances between sounds and words
+from functools import lru_cache
+from profiling import instrument
+from soundarray import UNSET, SoundArray, default_encoder, phonology, sound_codes
+from tokenizer import default_tokenizer
+import numpy as np
+
+# Relative importance of each feature when comparing two sounds
+WEIGHTS = {
+    'cavity': 1.0,
+    'airway': 0.5,
+    'voicing': 1.0,
+    'place': 2.0,
+    'manner': 2.0,
+    'tone': 0.5,
+    'mode': 0.5,
+    'speed': 0.5,
+    'frontness': 2.0,
+    'openness': 2.0,
+    'roundness': 1.0,
+    'sonority': 1.0,
+}
+
+
+def feature_distance(a, b, weights=None):
+    '''
+    Return the feature-weighted distance between feature codes
+
+    Parameters
+    ----------
+        a, b (np.array) : Feature codes with features on the last axis. Arrays
+            broadcast, so (n, 1, F) and (1, n, F) give an (n, n) result.
+        weights (dict) : Weight of each feature name. Defaults to WEIGHTS.
+
+    Notes
+    -----
+        Features are ordinal, so a feature contributes the difference of its
+        codes scaled by the number of values (e.g., bilabial is closer to
+        labiodental than to velar). A feature set on one side only counts as
+        a full mismatch. Distances are normalized to the range [0, 1].
+    '''
+    phon = phonology()
+    weights = WEIGHTS if weights is None else weights
+    w = np.array([weights.get(__, 0.0) for __ in phon.labels])
+    scale = np.array([max(len(__) - 1, 1) for __ in phon.features])
+
+    a, b = np.asarray(a, dtype=np.int16), np.asarray(b, dtype=np.int16)
+    set_a, set_b = a != UNSET, b != UNSET
+
+    difference = np.abs(a - b) / scale
+    difference = np.where(set_a & set_b, difference, (set_a != set_b).astype(float))
+
+    return (difference * w).sum(axis=-1) / w.sum()
+
+
+class PhoneticDistance():
+    '''
+    Phonetic similarity between sounds and words using a precomputed
+    inventory x inventory distance matrix and a feature-weighted edit distance.
+
+    Attributes
+    ----------
+        symbols (list) : Inventory symbols in tokenizer id order
+        matrix (np.array) : Distance between every pair of inventory ids. The
+            last row and column are for unknown sounds.
+        indel (float) : Cost of inserting or deleting a sound
+    '''
+
+    @instrument()
+    def __init__(self, weights=None, indel=1.0, tokenizer=None, encoder=None):
+        '''
+        Parameters
+        ----------
+            weights (dict) : Weight of each feature name. Defaults to WEIGHTS.
+            indel (float) : Cost of inserting or deleting a sound
+            tokenizer (Tokenizer) : Tokenizer used to split IPA words
+            encoder (Encoder) : Encoder providing inventory feature codes
+        '''
+        self.tokenizer = tokenizer or default_tokenizer()
+        encoder = encoder or default_encoder()
+
+        self.symbols = encoder.symbols
+        self.indel = float(indel)
+
+        inventory = encoder.inventory
+        matrix = feature_distance(inventory[:, None], inventory[None], weights)
+
+        unknown = len(inventory) - 1
+        matrix[unknown, :] = matrix[:, unknown] = 1.0
+        matrix[unknown, unknown] = 0.0
+
+        self.matrix = matrix.astype(np.float32)
+
+    def __repr__(self):
+        return f"PhoneticDistance( symbols={len(self.symbols)}, indel={self.indel} )"
+
+    def _ids(self, word):
+        ''' Return token ids for an IPA string or pass ids through '''
+        if isinstance(word, str):
+            return self.tokenizer.tokenize(word, ids=True)
+        return np.asarray(word)
+
+    def sound(self, a, b):
+        ''' Return the distance between two IPA characters '''
+        index = self.tokenizer.index
+        unknown = self.tokenizer.unknown
+        return float(self.matrix[index.get(a, unknown), index.get(b, unknown)])
+
+    def word(self, a, b):
+        '''
+        Return the feature-weighted edit distance between two words
+
+        Parameters
+        ----------
+            a, b (str, np.array) : IPA strings or arrays of token ids
+        '''
+        ids, offsets = self.pad([self._ids(b)])
+        return float(self.lexicon(a, (ids, offsets))[0])
+
+    def pad(self, words):
+        '''
+        Return words as a padded id matrix and their lengths for reuse in
+        repeated lexicon queries.
+
+        Parameters
+        ----------
+            words (list, tuple) : IPA strings, arrays of ids, or a tuple of
+                flat ids and offsets from Tokenizer.tokenize_many
+        '''
+        if isinstance(words, tuple):
+            ids, offsets = words
+        else:
+            words = [self._ids(__) for __ in words]
+            lengths = np.array([len(__) for __ in words], dtype=np.int64)
+            offsets = np.concatenate(([0], np.cumsum(lengths)))
+            ids = np.concatenate(words) if words else np.zeros(0, dtype=np.int32)
+
+        lengths = np.diff(offsets)
+        width = int(lengths.max()) if lengths.size else 0
+
+        padded = np.full((lengths.size, width), self.tokenizer.unknown, dtype=np.int32)
+        rows = np.repeat(np.arange(lengths.size), lengths)
+        columns = np.arange(ids.size) - np.repeat(offsets[:-1], lengths)
+        padded[rows, columns] = ids
+
+        return padded, lengths
+
+    @instrument()
+    def lexicon(self, query, words):
+        '''
+        Return the edit distance between a word and every word of a lexicon
+
+        Parameters
+        ----------
+            query (str, np.array) : IPA string or array of ids
+            words (list, tuple) : Lexicon words, or the output of `pad`
+
+        Notes
+        -----
+            The dynamic program runs one vectorized step per sound of the
+            query across all lexicon words at once. Within a row, insertions
+            are resolved with a cumulative minimum instead of a column loop.
+        '''
+        if not (isinstance(words, tuple) and len(words) == 2 and
+                isinstance(words[0], np.ndarray) and words[0].ndim == 2):
+            words = self.pad(words)
+
+        padded, lengths = words
+        count, width = padded.shape
+        indel = self.indel
+        steps = indel * np.arange(width + 1, dtype=np.float32)
+
+        row = np.broadcast_to(steps, (count, width + 1)).copy()
+
+        for i, q in enumerate(self._ids(query), start=1):
+            substitute = row[:, :-1] + self.matrix[q][padded]
+            delete = row + indel
+
+            best = delete
+            best[:, 1:] = np.minimum(delete[:, 1:], substitute)
+            best[:, 0] = i * indel
+
+            row = np.minimum.accumulate(best - steps, axis=1) + steps
+
+        return row[np.arange(count), lengths]
+
+    def collisions(self, query, words, threshold=0.5):
+        '''
+        Return indices of lexicon words within a distance of a word, e.g., to
+        reject near-homophones when generating vocabulary.
+
+        Parameters
+        ----------
+            query (str, np.array) : IPA string or array of ids
+            words (list, tuple) : Lexicon words, or the output of `pad`
+            threshold (float) : Largest distance counted as a collision
+        '''
+        return np.flatnonzero(self.lexicon(query, words) <= threshold)
+
+
+class NearestSound():
+    '''
+    Nearest-neighbour index over the feature codes of every sounds.yaml entry
+    for approximate matching of sounds to IPA characters.
+
+    Attributes
+    ----------
+        symbols (list) : Candidate IPA characters
+        codes (np.array) : Feature codes of each candidate
+    '''
+
+    def __init__(self, kind=None, weights=None, encoder=None):
+        '''
+        Parameters
+        ----------
+            kind (str) : c or v to only match consonants or vowels on their
+                specific features. If None, match any sound on all features.
+            weights (dict) : Weight of each feature name
+            encoder (Encoder) : Encoder providing inventory feature codes
+        '''
+        encoder = encoder or default_encoder()
+        weights = WEIGHTS if weights is None else weights
+        symbols, codes = encoder.symbols, encoder.inventory[:-1]
+
+        if kind:
+            from sounds import SNDS, VSF, CSF
+            vowels = {__.character for __ in SNDS.vowel}
+            is_vowel = kind.lower().startswith('v')
+            labels = VSF if is_vowel else CSF
+            weights = {k: v for k, v in weights.items() if k in labels}
+            keep = [(__ in vowels) == is_vowel for __ in symbols]
+            symbols = [s for s, k in zip(symbols, keep) if k]
+            codes = codes[np.array(keep)]
+
+        self.symbols = symbols
+        self.codes = codes
+        self.weights = weights
+        self._cache = {}
+
+    def __repr__(self):
+        return f"NearestSound( symbols={len(self.symbols)} )"
+
+    def index(self, codes):
+        ''' Return the candidate index closest to a row of feature codes '''
+        key = codes.tobytes()
+        if key not in self._cache:
+            distances = feature_distance(codes, self.codes, self.weights)
+            self._cache[key] = int(distances.argmin())
+        return self._cache[key]
+
+    def query(self, sound):
+        '''
+        Return the IPA character closest to a sound
+
+        Parameters
+        ----------
+            sound (Sound, np.array) : Sound object or its feature codes
+        '''
+        if not isinstance(sound, np.ndarray):
+            sound = sound_codes(sound)
+        return self.symbols[self.index(np.asarray(sound, dtype=np.int8))]
+
+    @instrument()
+    def batch(self, array):
+        '''
+        Return candidate indices of the closest character for many sounds
+
+        Parameters
+        ----------
+            array (SoundArray, np.array) : Sounds as feature codes
+
+        Notes
+        -----
+            Distances are only computed for the distinct rows of the array.
+        '''
+        codes = array.codes if isinstance(array, SoundArray) else np.asarray(array)
+        if not len(codes):
+            return np.zeros(0, dtype=np.int64)
+
+        unique, inverse = np.unique(codes, axis=0, return_inverse=True)
+        distances = feature_distance(unique[:, None], self.codes[None], self.weights)
+        return distances.argmin(axis=1)[inverse.reshape(-1)]
+
+    def characters(self, array):
+        ''' Return the closest IPA characters for many sounds '''
+        return [self.symbols[__] for __ in self.batch(array)]
+
+
+@lru_cache(maxsize=None)
+def nearest_sound(kind=None):
+    ''' Return the shared nearest-sound index for a kind of sound '''
+    return NearestSound(kind)
+
+
+if __name__ == '__main__':
+    from sounds import Consonant
+    distance = PhoneticDistance()
+    print(distance.sound('p', 'b'), distance.sound('p', 'k'), distance.sound('p', 'a'))
+    print(distance.word('pata', 'bada'), distance.word('pata', 'pat'))
+    print(distance.lexicon('pata', ['pata', 'bata', 'kasa', 'ʃip']))
+    print(nearest_sound('c').query(Consonant('voiced', 'velar', 'trill')))
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: evolution.py
+# author: glenn abastillas
+# created: 2020-07-08
+# description: Monte Carlo sound-change simulation over many generations
+'''
+A lexicon is held as one SoundArray of feature codes and every generation
+applies each stochastic change to all sounds at once. A change fires on a
+sound with its per-generation rate. Lenition and fortition follow the rules of
+Consonant.weaken and Consonant.strengthen.
+
+Generation g of replicate r draws from its own Generator, seeded from
+SeedSequence(seed) by (r, g). A trajectory therefore depends only on the seed,
+so resuming from a checkpoint or changing the number of workers gives the
+same lexicon.
+
+Checkpoints are written every few generations as two .npy files per replicate:
+
+    <checkpoint>/r0003/g000120.codes.npy      int8 (sounds, features)
+    <checkpoint>/r0003/g000120.lengths.npy    int32 (words,)
+'''
+from profiling import instrument
+from soundarray import SoundArray, default_encoder, phonology, vowel_mask
+import numpy as np
+import os
+import parallel
+import re
+
+# Default probability that a change applies to an eligible sound per generation
+RATES = {
+    'lenition': 0.002,
+    'fortition': 0.001,
+    'raising': 0.001,
+    'lowering': 0.001,
+    'fronting': 0.0005,
+    'backing': 0.0005,
+    'loss': 0.0005,
+}
+
+# Vowel changes as the feature moved and the direction of the move
+SHIFTS = {
+    'raising': ('openness', 1),
+    'lowering': ('openness', -1),
+    'fronting': ('frontness', -1),
+    'backing': ('frontness', 1),
+}
+
+SNAPSHOT = re.compile(r'g(\d+)\.codes\.npy$')
+
+
+def decode(array):
+    '''
+    Return the IPA words of a SoundArray, spelling each sound with the closest
+    consonant or vowel in sounds.yaml
+
+    Parameters
+    ----------
+        array (SoundArray) : Feature codes of a lexicon
+    '''
+    from distance import nearest_sound
+    vowel = vowel_mask(array.codes)
+
+    characters = np.empty(len(array), dtype=object)
+    for kind, mask in (('c', ~vowel), ('v', vowel)):
+        index = nearest_sound(kind)
+        characters[mask] = np.array(index.symbols, dtype=object)[index.batch(array.codes[mask])]
+
+    return [''.join(characters[a:b]) for a, b in zip(array.offsets[:-1], array.offsets[1:])]
+
+
+class Simulation():
+    '''
+    Stochastic sound changes applied to a whole lexicon per generation
+
+    Attributes
+    ----------
+        lexicon (SoundArray) : Starting feature codes
+        rates (dict) : Per-generation probability of each change in RATES
+        intervocalic (float) : Lenition rate multiplier between vowels
+    '''
+
+    def __init__(self, lexicon, rates=None, intervocalic=3.0):
+        '''
+        Parameters
+        ----------
+            lexicon (SoundArray, list) : Feature codes or IPA words
+            rates (dict) : Rates overriding RATES (e.g., {'loss': 0})
+            intervocalic (float) : Lenition rate multiplier for consonants
+                between two vowels of the same word
+        '''
+        if not isinstance(lexicon, SoundArray):
+            lexicon = default_encoder().encode(list(lexicon))
+
+        unknown = set(rates or {}) - set(RATES)
+        if unknown:
+            raise ValueError(f'Unknown sound changes: {sorted(unknown)}')
+
+        self.lexicon = lexicon
+        self.rates = {**RATES, **(rates or {})}
+        self.intervocalic = intervocalic
+
+        phon = phonology()
+        self._column = {__: phon.labels.index(__) for __ in phon.labels}
+        self._high = np.array([len(__) - 1 for __ in phon.features], dtype=np.int8)
+
+    def __repr__(self):
+        return f"Simulation( words={self.lexicon.words}, changes={len(self.rates)} )"
+
+    def _neighbours(self, vowel, lengths):
+        ''' Return whether each sound is preceded and followed by a vowel in its word '''
+        first = np.zeros(vowel.size, dtype=bool)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[lengths > 0]
+        first[starts] = True
+        last = np.roll(first, -1)
+        last[-1:] = True
+
+        before = np.roll(vowel, 1) & ~first
+        after = np.roll(vowel, -1) & ~last
+        return before & after
+
+    def _move(self, codes, rows, columns, direction):
+        ''' Move features one step, clipped to the values in phonology.yaml '''
+        values = codes[rows, columns] + direction
+        codes[rows, columns] = np.clip(values, 0, self._high[columns])
+
+    @instrument()
+    def step(self, codes, lengths, rng):
+        '''
+        Return the codes and word lengths after one generation of changes
+
+        Parameters
+        ----------
+            codes (np.array) : Feature codes, (sounds, features)
+            lengths (np.array) : Sounds per word
+            rng (np.random.Generator) : Generator of this generation
+
+        Notes
+        -----
+            One uniform draw is made per change and sound, so the stream
+            consumed never depends on which changes fired.
+        '''
+        codes = codes.copy()
+        voicing, manner, place = (self._column[__] for __ in ('voicing', 'manner', 'place'))
+        vowel = vowel_mask(codes)
+        draws = rng.random((len(RATES), len(codes)), dtype=np.float32)
+        fire = dict(zip(RATES, draws))
+
+        # Lenition: voicing, then stop/tap manner, then place move away from zero
+        rate = self.rates['lenition'] * np.where(self._neighbours(vowel, lengths), self.intervocalic, 1.0)
+        lenited = ~vowel & (fire['lenition'] < rate)
+        rows = np.flatnonzero(lenited)
+        columns = np.where(codes[rows, voicing] == 0, voicing,
+                           np.where(codes[rows, manner] < 2, manner, place))
+        self._move(codes, rows, columns, 1)
+
+        # Fortition reverses the order of lenition
+        rows = np.flatnonzero(~vowel & ~lenited & (fire['fortition'] < self.rates['fortition']))
+        columns = np.where(codes[rows, voicing] > 0, voicing,
+                           np.where(codes[rows, manner] > 0, manner, place))
+        self._move(codes, rows, columns, -1)
+
+        for change, (feature, direction) in SHIFTS.items():
+            rows = np.flatnonzero(vowel & (fire[change] < self.rates[change]))
+            self._move(codes, rows, np.full(rows.size, self._column[feature]), direction)
+
+        # Loss never empties a word; its first sound survives instead
+        lost = fire['loss'] < self.rates['loss']
+        if not lost.any():
+            return codes, lengths
+
+        owner = np.repeat(np.arange(lengths.size), lengths)
+        remaining = np.bincount(owner[~lost], minlength=lengths.size)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        emptied = (remaining == 0) & (lengths > 0)
+        lost[starts[emptied]] = False
+
+        return codes[~lost], np.bincount(owner[~lost], minlength=lengths.size).astype(lengths.dtype)
+
+    def _rng(self, sequence, generation):
+        ''' Return the Generator of one generation of a replicate '''
+        return np.random.default_rng(np.random.SeedSequence(
+            sequence.entropy, spawn_key=sequence.spawn_key + (generation,)))
+
+    def _resume(self, directory, generations):
+        ''' Return the latest snapshot at or before generations, or the start '''
+        latest = -1
+        if directory and os.path.isdir(directory):
+            for name in os.listdir(directory):
+                match = SNAPSHOT.match(name)
+                if match and int(match.group(1)) <= generations and \
+                   os.path.exists(os.path.join(directory, f'g{match.group(1)}.lengths.npy')):
+                    latest = max(latest, int(match.group(1)))
+
+        if latest < 0:
+            return 0, self.lexicon.codes, np.diff(self.lexicon.offsets).astype(np.int32)
+
+        prefix = os.path.join(directory, f'g{latest:06d}')
+        return latest, np.load(f'{prefix}.codes.npy'), np.load(f'{prefix}.lengths.npy')
+
+    def _snapshot(self, directory, generation, codes, lengths):
+        ''' Write a snapshot, replacing files atomically so a crash never leaves a partial one '''
+        os.makedirs(directory, exist_ok=True)
+        prefix = os.path.join(directory, f'g{generation:06d}')
+        for suffix, array in (('lengths', lengths), ('codes', codes)):
+            with open(f'{prefix}.{suffix}.tmp', 'wb') as fout:
+                np.save(fout, array)
+            os.replace(f'{prefix}.{suffix}.tmp', f'{prefix}.{suffix}.npy')
+
+    def run(self, generations, sequence, checkpoint=None, every=10):
+        '''
+        Return the lexicon after a number of generations
+
+        Parameters
+        ----------
+            generations (int) : Number of generations
+            sequence (SeedSequence, int) : Seed of this trajectory
+            checkpoint (str) : Snapshot directory. An existing run in it is
+                resumed from its latest snapshot.
+            every (int) : Generations between snapshots
+        '''
+        if not isinstance(sequence, np.random.SeedSequence):
+            sequence = np.random.SeedSequence(sequence)
+
+        start, codes, lengths = self._resume(checkpoint, generations)
+        for generation in range(start + 1, generations + 1):
+            codes, lengths = self.step(codes, lengths, self._rng(sequence, generation))
+            if checkpoint and (generation % every == 0 or generation == generations):
+                self._snapshot(checkpoint, generation, codes, lengths)
+
+        return SoundArray(codes, np.concatenate(([0], np.cumsum(lengths))))
+
+
+def _replicate(simulation, task):
+    ''' Run one replicate trajectory '''
+    generations, sequence, checkpoint, every = task
+    return simulation.run(generations, sequence, checkpoint, every)
+
+
+@instrument()
+def simulate(simulation, generations, replicates=1, seed=None, workers=None,
+             checkpoint=None, every=10):
+    '''
+    Return the final lexicon of each independent replicate trajectory
+
+    Parameters
+    ----------
+        simulation (Simulation) : Lexicon and change rates
+        generations (int) : Generations per replicate
+        replicates (int) : Number of independent trajectories
+        seed (int) : Root seed. Required with checkpoint so a resumed run
+            continues the same trajectories.
+        workers (int) : Worker processes. Defaults to the number of CPUs; 1
+            runs in this process.
+        checkpoint (str) : Directory of per-replicate snapshot directories
+        every (int) : Generations between snapshots
+    '''
+    if checkpoint and seed is None:
+        raise ValueError('A seed is required to resume from checkpoints.')
+
+    sequences = np.random.SeedSequence(seed).spawn(replicates)
+    tasks = [(generations, sequence,
+              os.path.join(checkpoint, f'r{r:04d}') if checkpoint else None, every)
+             for r, sequence in enumerate(sequences)]
+    return parallel.map(_replicate, tasks, simulation, workers)
+
+
+if __name__ == '__main__':
+    simulation = Simulation(['pataka', 'kinasu', 'sumatra', 'olobe'], rates={'lenition': 0.05, 'loss': 0.002})
+    for array in simulate(simulation, 100, replicates=3, seed=2020, workers=1):
+        print(decode(array))
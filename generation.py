@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: generation.py
+# author: glenn abastillas
+# created: 2020-07-03
+# description: deterministic parallel word generation with independent RNG streams
+'''
+A request for N words is cut into fixed-size chunks, and chunk k draws from
+its own np.random.Generator seeded by the k-th child of SeedSequence(seed).
+Chunks depend only on the seed, N and the chunk size, never on the number of
+workers, and results are merged in chunk order. The same seed therefore gives
+an identical lexicon on 1 or 64 cores.
+'''
+from profiling import instrument
+import numpy as np
+import parallel
+
+CHUNK = 1024
+
+
+class SyllableGenerator():
+    '''
+    Generate words as sequences of syllables drawn from corpus statistics
+
+    Attributes
+    ----------
+        statistics (SyllableStatistics) : Syllable shapes and slot phonemes
+        syllables (tuple) : Minimum and maximum syllables per word
+    '''
+
+    def __init__(self, statistics, syllables=(1, 3)):
+        from syllable import syllabify
+        self.statistics = statistics
+        self.syllables = tuple(syllables)
+
+        # Slot ids (onset 0, nucleus 1, coda 2) of each shape, flattened
+        slots = [['ONC'.index(__) for __ in syllabify(shape.upper())[1]]
+                 for shape in statistics.shapes]
+        self._sizes = np.array([len(__) for __ in slots], dtype=np.int64)
+        self._starts = np.concatenate(([0], np.cumsum(self._sizes)[:-1])).astype(np.int64)
+        self._slots = np.array([__ for slot in slots for __ in slot], dtype=np.int64)
+
+    def __repr__(self):
+        return f"SyllableGenerator( syllables={self.syllables} )"
+
+    def generate(self, count, rng):
+        '''
+        Return a list of words
+
+        Parameters
+        ----------
+            count (int) : Number of words
+            rng (np.random.Generator) : Random number generator to draw from
+        '''
+        statistics, (low, high) = self.statistics, self.syllables
+        lengths = rng.integers(low, high + 1, size=count)
+        shapes = statistics._draw(statistics._shape_cdf, int(lengths.sum()), rng)
+
+        # Lay out the slots of every drawn syllable, then fill each kind of
+        # slot with one batch of draws from its phoneme distribution
+        sizes = self._sizes[shapes]
+        within = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        slots = self._slots[np.repeat(self._starts[shapes], sizes) + within]
+
+        phonemes = np.empty(slots.size, dtype=np.int64)
+        for slot, cdf in enumerate(statistics._slot_cdf):
+            mask = slots == slot
+            phonemes[mask] = statistics._draw(cdf, int(mask.sum()), rng)
+
+        letters = np.bincount(np.repeat(np.arange(count), lengths), weights=sizes, minlength=count)
+        offsets = np.concatenate(([0], np.cumsum(letters))).astype(np.int64)
+
+        text = ''.join([statistics.symbols[__] for __ in phonemes])
+        return [text[offsets[i]:offsets[i + 1]] for i in range(count)]
+
+
+class ShapeGenerator():
+    '''
+    Generate words from syllable shapes with randomized sounds (see
+    Syllable.random_representation)
+
+    Attributes
+    ----------
+        shapes (list) : Syllable shapes to choose from (e.g., cv, cvc)
+        syllables (tuple) : Minimum and maximum syllables per word
+    '''
+
+    def __init__(self, shapes=('cv', 'cvc'), syllables=(1, 3)):
+        self.shapes = list(shapes)
+        self.syllables = tuple(syllables)
+
+    def __repr__(self):
+        return f"ShapeGenerator( shapes={self.shapes} )"
+
+    def generate(self, count, rng):
+        ''' Return a list of words (see SyllableGenerator.generate) '''
+        from syllable import Syllable
+
+        low, high = self.syllables
+        words = []
+        for length in rng.integers(low, high + 1, size=count):
+            shapes = rng.integers(len(self.shapes), size=length)
+            words.append(''.join(Syllable(self.shapes[__]).random_representation(rng)
+                                 for __ in shapes))
+        return words
+
+
+def _chunk(generator, task):
+    ''' Generate one chunk of words from its seed sequence '''
+    count, seed = task
+    return generator.generate(count, np.random.default_rng(seed))
+
+
+def _tasks(count, seed, chunk):
+    ''' Return the (count, SeedSequence) of every chunk '''
+    sizes = [chunk] * (count // chunk) + ([count % chunk] if count % chunk else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return list(zip(sizes, seeds))
+
+
+def chunks(generator, count, seed=None, workers=None, chunk=CHUNK):
+    '''
+    Yield lists of generated words in a stable order as chunks complete
+
+    Parameters
+    ----------
+        generator (object) : Has a generate(count, rng) method returning words
+        count (int) : Number of words
+        seed (int, SeedSequence) : Root seed. If None, fresh entropy is used.
+        workers (int) : Worker processes. Defaults to the number of CPUs; 1
+            generates in this process.
+        chunk (int) : Words per chunk. Changing it changes the output.
+    '''
+    yield from parallel.imap(_chunk, _tasks(count, seed, chunk), generator, workers)
+
+
+@instrument()
+def generate(generator, count, seed=None, workers=None, chunk=CHUNK):
+    '''
+    Return count generated words, identical for a given seed and chunk size
+    regardless of the number of workers
+
+    Parameters
+    ----------
+        generator (object) : Has a generate(count, rng) method returning words
+        count (int) : Number of words
+        seed (int, SeedSequence) : Root seed
+        workers (int) : Worker processes
+        chunk (int) : Words per chunk
+    '''
+    return [word for words in chunks(generator, count, seed, workers, chunk) for word in words]
+
+
+if __name__ == '__main__':
+    from syllable import SyllableStatistics
+    statistics = SyllableStatistics.from_corpus(['pata', 'kinas', 'sumatra', 'olo'])
+    generator = SyllableGenerator(statistics)
+    print(generate(generator, 10, seed=2020, workers=1))
+    print(generate(generator, 10, seed=2020, workers=2, chunk=3) ==
+          generate(generator, 10, seed=2020, workers=1, chunk=3))
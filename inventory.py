@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: inventory.py
+# author: glenn abastillas
+# created: 2020-07-09
+# description: phoneme inventory design by vectorized dispersion, economy and frequency search
+'''
+An inventory is a row of sounds.yaml symbol ids, and batches of inventories
+are scored as one (inventories, size) array. There are four scores, each in
+[0, 1]:
+
+    dispersion      mean distance from each sound to its nearest neighbour of
+                    the same kind (consonant or vowel) in the inventory, as a
+                    share of the largest distance between two sounds of that kind
+    economy         size / (size + feature values used), higher when few
+                    features are combined into many sounds
+    frequency       share of corpus sound occurrences the inventory can spell
+    cooccurrence    share of corpus sound bigrams the inventory can spell
+
+The search runs many annealing chains at once. Each chain swaps one sound
+for another of the same kind, every proposal of every chain is scored in one
+batch, and independent restarts run in parallel processes.
+
+The scores spread very differently (frequency varies several times more than
+dispersion across random inventories), so `score` standardizes each against
+random inventories with the same numbers of vowels and consonants before
+weighting. A weight is then the importance of one typical deviation.
+'''
+from profiling import instrument
+from soundarray import UNSET, default_encoder, phonology
+import numpy as np
+import parallel
+
+WEIGHTS = {
+    'dispersion': 1.0,
+    'economy': 1.0,
+    'frequency': 1.0,
+    'cooccurrence': 1.0,
+}
+
+# Random inventories drawn per shape to standardize the scores
+REFERENCE = 4096
+
+
+class InventoryScorer():
+    '''
+    Vectorized scores of candidate inventories
+
+    Attributes
+    ----------
+        symbols (list) : Candidate sounds in encoder id order
+        vowel (np.array) : Whether each symbol is a vowel
+        distance (np.array) : Feature distance between every pair of symbols
+        values (np.array) : One-hot feature values of each symbol
+        unigrams (np.array) : Corpus probability of each symbol
+        bigrams (np.array) : Corpus probability of each symbol pair
+        weights (dict) : Weight of each score in WEIGHTS
+    '''
+
+    def __init__(self, unigrams=None, bigrams=None, weights=None, features=None, encoder=None):
+        '''
+        Parameters
+        ----------
+            unigrams (dict) : Symbol counts (see ipa.count_unigrams)
+            bigrams (dict) : Nested symbol pair counts (see ipa.count_bigrams)
+            weights (dict) : Weights overriding WEIGHTS
+            features (dict) : Feature weights of the distance (see distance.WEIGHTS)
+            encoder (Encoder) : Encoder providing inventory feature codes
+        '''
+        from distance import feature_distance
+        from sounds import SNDS
+
+        encoder = encoder or default_encoder()
+        codes = encoder.inventory[:-1]
+
+        self.symbols = list(encoder.symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        vowels = {__.character for __ in SNDS.vowel}
+        self.vowel = np.array([__ in vowels for __ in self.symbols])
+        self.weights = {**WEIGHTS, **(weights or {})}
+
+        self.distance = feature_distance(codes[:, None], codes[None], features).astype(np.float32)
+        same = self.vowel[:, None] == self.vowel[None]
+        self._widest = np.where(self.vowel, self.distance[same & self.vowel[:, None]].max(),
+                                self.distance[same & ~self.vowel[:, None]].max())
+        self._scales = {}
+
+        # One column per (feature, value), so a set bit is a feature value in use
+        sizes = np.array([len(__) for __ in phonology().features])
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        rows, columns = np.nonzero(codes != UNSET)
+        self.values = np.zeros((len(codes), sizes.sum()), dtype=bool)
+        self.values[rows, starts[columns] + codes[rows, columns]] = True
+
+        n = len(self.symbols)
+        self.unigrams = np.zeros(n)
+        for symbol, count in (unigrams or {}).items():
+            if symbol in self.index:
+                self.unigrams[self.index[symbol]] += count
+
+        self.bigrams = np.zeros((n, n))
+        for a, row in (bigrams or {}).items():
+            for b, count in row.items():
+                if a in self.index and b in self.index:
+                    self.bigrams[self.index[a], self.index[b]] += count
+
+        self.unigrams /= self.unigrams.sum() or 1
+        self.bigrams /= self.bigrams.sum() or 1
+
+    def __repr__(self):
+        return f"InventoryScorer( symbols={len(self.symbols)}, weights={self.weights} )"
+
+    @classmethod
+    def from_pickle(cls, unigrams='resources/pickles/unigrams.pkl',
+                    bigrams='resources/pickles/bigrams.pkl', **kwargs):
+        ''' Build a scorer from pickled corpus counts '''
+        import pickle
+        with open(unigrams, 'rb') as fu, open(bigrams, 'rb') as fb:
+            return cls(pickle.load(fu), pickle.load(fb), **kwargs)
+
+    @classmethod
+    def from_counts(cls, model, **kwargs):
+        ''' Build a scorer from a counting.CountModel '''
+        unigrams, bigrams = model.to_nested()
+        return cls(unigrams, bigrams, **kwargs)
+
+    def ids(self, inventories):
+        '''
+        Return inventories as an (inventories, size) array of symbol ids
+
+        Parameters
+        ----------
+            inventories (list, np.array) : Lists of IPA symbols, or ids
+        '''
+        if isinstance(inventories, np.ndarray):
+            return inventories.reshape(-1, inventories.shape[-1])
+
+        unknown = {__ for inventory in inventories for __ in inventory} - set(self.index)
+        if unknown:
+            raise ValueError(f'Symbols not in sounds.yaml: {sorted(unknown)}')
+        return np.array([[self.index[__] for __ in inventory] for inventory in inventories])
+
+    def inventory(self, ids):
+        ''' Return the IPA symbols of an inventory, vowels first '''
+        ids = sorted(ids, key=lambda __: (not self.vowel[__], __))
+        return [self.symbols[__] for __ in ids]
+
+    def components(self, inventories):
+        '''
+        Return each score of many inventories
+
+        Parameters
+        ----------
+            inventories (np.array) : Symbol ids, (inventories, size)
+
+        Returns
+        -------
+            Dict of score name to an array of one value per inventory
+        '''
+        ids = self.ids(inventories)
+        size = ids.shape[1]
+
+        # Nearest neighbour of the same kind; other sounds and itself are excluded
+        vowel = self.vowel[ids]
+        distances = self.distance[ids[:, :, None], ids[:, None, :]] / self._widest[ids][:, :, None]
+        distances[(vowel[:, :, None] != vowel[:, None, :]) | np.eye(size, dtype=bool)] = np.inf
+        nearest = distances.min(axis=2)
+        finite = np.isfinite(nearest)
+        dispersion = np.where(finite, nearest, 0).sum(axis=1) / np.maximum(finite.sum(axis=1), 1)
+
+        used = self.values[ids].any(axis=1).sum(axis=1)
+
+        return {
+            'dispersion': dispersion,
+            'economy': size / (size + used),
+            'frequency': self.unigrams[ids].sum(axis=1),
+            'cooccurrence': self.bigrams[ids[:, :, None], ids[:, None, :]].sum(axis=(1, 2)),
+        }
+
+    def scales(self, vowels, consonants):
+        '''
+        Return the mean and standard deviation of each score over random
+        inventories of a shape, drawn once with a fixed seed
+
+        Parameters
+        ----------
+            vowels (int) : Vowels per inventory
+            consonants (int) : Consonants per inventory
+        '''
+        key = (vowels, consonants)
+        if key not in self._scales:
+            sample = self.components(_random(self, vowels, consonants, REFERENCE,
+                                             np.random.default_rng(2020)))
+            self._scales[key] = {k: (v.mean(), v.std() or 1.0) for k, v in sample.items()}
+        return self._scales[key]
+
+    @instrument()
+    def score(self, inventories, chunk=8192):
+        '''
+        Return the weighted sum of the standardized scores of many inventories
+
+        Parameters
+        ----------
+            inventories (list, np.array) : Inventories (see ids)
+            chunk (int) : Inventories scored per batch, bounding memory use
+        '''
+        ids = self.ids(inventories)
+        vowels = self.vowel[ids].sum(axis=1)
+        scores = np.empty(len(ids))
+        for first in range(0, len(ids), chunk):
+            batch = slice(first, first + chunk)
+            components = self.components(ids[batch])
+            for count in np.unique(vowels[batch]):
+                rows = vowels[batch] == count
+                scales = self.scales(int(count), ids.shape[1] - int(count))
+                scores[batch][rows] = sum(self.weights[k] * (v[rows] - scales[k][0]) / scales[k][1]
+                                          for k, v in components.items())
+        return scores
+
+
+def _random(scorer, vowels, consonants, count, rng):
+    ''' Return count random inventories, vowels in the first columns '''
+    pools = (np.flatnonzero(scorer.vowel), np.flatnonzero(~scorer.vowel))
+    columns = [pool[rng.random((count, pool.size)).argsort(axis=1)[:, :size]]
+               for pool, size in zip(pools, (vowels, consonants))]
+    return np.concatenate(columns, axis=1)
+
+
+def _anneal(scorer, vowels, consonants, chains, proposals, iterations, temperature, rng):
+    '''
+    Return the best inventory and score of each of many annealing chains
+
+    Notes
+    -----
+        A proposal replaces the sound in one random column by a random sound
+        of the same kind. Proposals repeating a sound already in the
+        inventory are discarded, and each chain moves to its best proposal
+        under the Metropolis rule.
+    '''
+    size = vowels + consonants
+    pools = (np.flatnonzero(scorer.vowel), np.flatnonzero(~scorer.vowel))
+    state = _random(scorer, vowels, consonants, chains, rng)
+    current = scorer.score(state)
+    best, scores = state.copy(), current.copy()
+    schedule = np.geomspace(temperature[0], temperature[1], iterations)
+
+    for t in schedule:
+        column = rng.integers(size, size=(chains, proposals))
+        is_vowel = column < vowels
+        choice = np.where(is_vowel,
+                          pools[0][rng.integers(pools[0].size, size=column.shape)],
+                          pools[1][rng.integers(pools[1].size, size=column.shape)])
+
+        candidates = np.repeat(state[:, None], proposals, axis=1)
+        np.put_along_axis(candidates, column[..., None], choice[..., None], axis=2)
+        repeated = (state[:, None] == choice[..., None]).any(axis=2)
+
+        proposed = scorer.score(candidates.reshape(-1, size)).reshape(chains, proposals)
+        proposed[repeated] = -np.inf
+
+        pick = proposed.argmax(axis=1)
+        value = proposed[np.arange(chains), pick]
+        accept = np.log(rng.random(chains)) < (value - current) / t
+        state[accept] = candidates[np.arange(chains), pick][accept]
+        current[accept] = value[accept]
+
+        improved = current > scores
+        best[improved], scores[improved] = state[improved], current[improved]
+
+    return best, scores
+
+
+def _restart(scorer, task):
+    ''' Run one restart of annealing chains from its seed sequence '''
+    sequence, arguments = task
+    return _anneal(scorer, *arguments, rng=np.random.default_rng(sequence))
+
+
+@instrument()
+def design(scorer, vowels=5, consonants=15, restarts=4, chains=64, proposals=32,
+           iterations=300, temperature=(1.0, 0.01), seed=None, workers=None, top=5):
+    '''
+    Return the best inventories found by parallel annealing restarts
+
+    Parameters
+    ----------
+        scorer (InventoryScorer) : Scores of candidate inventories
+        vowels (int) : Vowels per inventory
+        consonants (int) : Consonants per inventory
+        restarts (int) : Independent restarts, one task each
+        chains (int) : Annealing chains per restart, advanced together
+        proposals (int) : Proposals scored per chain and iteration
+        iterations (int) : Iterations per chain
+        temperature (tuple) : Initial and final temperatures
+        seed (int) : Root seed
+        workers (int) : Worker processes. Defaults to the number of CPUs.
+        top (int) : Number of distinct inventories to return
+
+    Returns
+    -------
+        List of (score, symbols) tuples by decreasing score
+
+    Notes
+    -----
+        restarts * chains * proposals * iterations inventories are scored
+        (e.g., 4 * 64 * 32 * 300 = 2.5 million by default).
+    '''
+    sequences = np.random.SeedSequence(seed).spawn(restarts)
+    arguments = (vowels, consonants, chains, proposals, iterations, temperature)
+    tasks = [(__, arguments) for __ in sequences]
+    results = parallel.map(_restart, tasks, scorer, workers)
+
+    inventories = np.concatenate([__ for __, _ in results])
+    scores = np.concatenate([__ for _, __ in results])
+
+    found = {}
+    for i in np.argsort(-scores, kind='stable'):
+        key = tuple(scorer.inventory(inventories[i]))
+        found.setdefault(key, float(scores[i]))
+        if len(found) == top:
+            break
+    return [(score, list(symbols)) for symbols, score in found.items()]
+
+
+if __name__ == '__main__':
+    scorer = InventoryScorer.from_pickle()
+    print(scorer, scorer.components(scorer.ids([list('aeiou') + list('ptkmnsɾ')])))
+    for score, symbols in design(scorer, vowels=5, consonants=12, restarts=2, iterations=100,
+                                 seed=2020, workers=1, top=3):
+        print(f'{score:.4f}', ' '.join(symbols))
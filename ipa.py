@@ -3,30 +3,44 @@
 # Methods to process and develop counts and probabilities from raw language IPA data
 
 from glob import glob
-from nltk import bigrams
+from probability import bigrams
 from sounds import Consonant, Vowel
+from profiling import instrument
 from collections import defaultdict
+import numpy as np
 import re, os
 import pickle
 
-def process_raw_ipa_files():
-    source_path = "../ipa-dict/data/{}.txt"
-    target_path = "../resources/lang/{}.txt"
+LENGTHS = re.compile(r'(.)([:ː])', re.I)
+INSIDES = re.compile(r'/(.+?)/', re.I)
 
-    lengths = re.compile(r'(.)([:ː])', re.I)
-    flatten = lambda term : lengths.sub(r'\1\1', term)
 
-    insides = re.compile(r'/(.+?)/', re.I)
-    extract = lambda text : insides.findall(text)
+def extract_ipa(lines):
+    '''
+    Yield the IPA transcriptions between slashes in ipa-dict lines (e.g.,
+    "cat\t/ˈkæt/"), spelling length marks as a doubled sound
 
-    for lang in glob(source_path.format("*")):
-        with open(lang) as fin:
-            text = flatten(fin.read())
-            text = extract(text)
+    Parameters
+    ----------
+        lines (iterable) : Lines of an ipa-dict data file
+    '''
+    for line in lines:
+        yield from INSIDES.findall(LENGTHS.sub(r'\1\1', line))
 
-            with open(f'./resources/lang/{os.path.basename(lang)}.txt', 'w') as fout:
-                output = '\n'.join(text)
-                fout.write(output)
+
+@instrument()
+def process_raw_ipa_files(source="../ipa-dict/data/*.txt", target="resources/lang"):
+    '''
+    Write the IPA transcriptions of each ipa-dict file to target, one per line
+
+    Parameters
+    ----------
+        source (str) : Glob of ipa-dict data files
+        target (str) : Output directory
+    '''
+    for lang in glob(source):
+        with open(lang) as fin, open(os.path.join(target, os.path.basename(lang)), 'w') as fout:
+            fout.write('\n'.join(extract_ipa(fin)))
 
 
 def remove_stress_marks(text):
@@ -34,32 +48,81 @@ def remove_stress_marks(text):
     return text.replace(primary, "").replace(secondary, "")
 
 
-def count_bigrams(text, model=None):
+@instrument()
+def count_bigrams(text, model=None, tokenizer=None):
+    '''
+    Count adjacent pairs of sounds in a text with ^ and $ as word boundaries
+
+    Parameters
+    ----------
+        text (str) : IPA word to count
+        model (dict) : Existing counts to update
+        tokenizer (Tokenizer) : Split text into IPA tokens instead of characters
+    '''
     if model:
         pass
     else:
         model = defaultdict(dict)
-    
-    for (A, B) in bigrams(f"^{text}$"):
+
+    tokens = tokenizer.tokenize(text) if tokenizer else text
+
+    for (A, B) in bigrams(["^", *tokens, "$"]):
         model[A].setdefault(B, 0)
         model[A][B] += 1
 
     return model
 
 
-def count_unigrams(text, model=None):
-    ''' Count the occurrence of individual characters in a text '''
+@instrument()
+def count_unigrams(text, model=None, tokenizer=None):
+    ''' Count the occurrence of individual characters (or tokens) in a text '''
     if model:
         pass
     else:
         model = defaultdict(int)
-    
-    for A in text:
+
+    for A in (tokenizer.tokenize(text) if tokenizer else text):
         model[A] += 1
     
     return model
 
 
+@instrument()
+def count_bigram_ids(ids, offsets, size):
+    '''
+    Count bigrams over flat token ids (see Tokenizer.tokenize_many) into a
+    dense matrix in a single pass.
+
+    Parameters
+    ----------
+        ids (np.array) : Flat token ids in the range [0, size)
+        offsets (np.array) : Word k spans ids[offsets[k]:offsets[k + 1]]
+        size (int) : Number of distinct ids (e.g., tokenizer.unknown + 1)
+
+    Returns
+    -------
+        Matrix of shape (size + 2, size + 2) where ids size and size + 1 are
+        the ^ and $ word boundaries.
+    '''
+    start, end, width = size, size + 1, size + 2
+    words = offsets.size - 1
+
+    sequence = np.empty(ids.size + 2 * words, dtype=np.int64)
+    shift = 2 * np.arange(words)
+    sequence[offsets[:-1] + shift] = start
+    sequence[offsets[1:] + shift + 1] = end
+
+    inside = np.ones(sequence.size, dtype=bool)
+    inside[offsets[:-1] + shift] = inside[offsets[1:] + shift + 1] = False
+    sequence[inside] = ids
+
+    A, B = sequence[:-1], sequence[1:]
+    within = A != end
+    counts = np.bincount(A[within] * width + B[within], minlength=width * width)
+    return counts.reshape(width, width)
+
+
+@instrument()
 def get_feature_distributions(data, features, feature_values):
     ''' Get distributions of features and their values '''
 
@@ -87,17 +150,6 @@ def get_feature_distributions(data, features, feature_values):
 
 
 if __name__ == "__main__":
-    with open("./resources/lang/all/all.txt") as fin:
-        # print(fin.read()[:100])
-        model = None
-        for line in fin.readlines():
-            line = line.strip()
-            # model = count_unigrams(line, model)
-            model = count_bigrams(line, model)
-        
-        print(model)
-        pickle.dump(model, open("./resources/lang/all/bigrams.pkl", "wb"), protocol=3)
-    
-
-    # pickle.dump(model, open("resources/lang/counts.pkl", "wb"))
-            
\ No newline at end of file
+    # Count bigrams of the combined corpus (see `python cli.py count --help`)
+    from cli import main
+    main(['count', 'resources/lang/all/all.txt', '--export', 'resources/lang/all'])
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: loadtest.py
+# author: glenn abastillas
+# created: 2020-07-06
+# description: concurrent load test of server.py reporting latency percentiles
+'''
+Run against a live server
+
+    python loadtest.py --url http://127.0.0.1:8080 --requests 2000 --concurrency 64
+
+or start one in this process with --local.
+'''
+from urllib.parse import urlparse
+import argparse
+import asyncio
+import json
+import numpy as np
+import time
+
+PAYLOADS = {
+    '/generate': lambda i: {'count': 5, 'seed': i},
+    '/score': lambda i: {'words': ['pata', 'kina', 'sumatra', 'olo']},
+    '/syllabify': lambda i: {'words': ['pataka', 'ostra']},
+    '/tokenize': lambda i: {'words': ['ˈd͡ʒaːm', 'ʃip']},
+}
+
+
+async def _client(host, port, endpoint, jobs, latencies, errors):
+    ''' Send requests over one keep-alive connection until the jobs run out '''
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while jobs:
+            i = jobs.pop()
+            body = json.dumps(PAYLOADS[endpoint](i)).encode('utf-8')
+            started = time.perf_counter()
+            writer.write(f'POST {endpoint} HTTP/1.1\r\nHost: {host}\r\n'
+                         f'Content-Type: application/json\r\n'
+                         f'Content-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body)
+            await writer.drain()
+
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                header = await reader.readline()
+                if header in (b'\r\n', b''):
+                    break
+                name, __, value = header.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(url, endpoint='/score', requests=1000, concurrency=32):
+    '''
+    Return latency statistics of concurrent requests to one endpoint
+
+    Parameters
+    ----------
+        url (str) : Server URL (e.g., http://127.0.0.1:8080)
+        endpoint (str) : Endpoint in PAYLOADS
+        requests (int) : Total number of requests
+        concurrency (int) : Number of simultaneous connections
+    '''
+    address = urlparse(url)
+    jobs, latencies, errors = list(range(requests)), [], []
+
+    started = time.perf_counter()
+    await asyncio.gather(*[_client(address.hostname, address.port, endpoint, jobs, latencies, errors)
+                           for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    milliseconds = np.array(latencies) * 1000
+    return {
+        'endpoint': endpoint,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'concurrency': concurrency,
+        'throughput': len(latencies) / elapsed,
+        'p50': float(np.percentile(milliseconds, 50)),
+        'p99': float(np.percentile(milliseconds, 99)),
+        'max': float(milliseconds.max()),
+    }
+
+
+async def _local(args):
+    ''' Start a server in this process and load test it '''
+    from server import Server
+    server = Server(workers=args.workers)
+    await server.start('127.0.0.1', args.port)
+    try:
+        return [await run(f'http://127.0.0.1:{args.port}', __, args.requests, args.concurrency)
+                for __ in args.endpoints]
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the conlang HTTP service.')
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--endpoints', nargs='+', default=list(PAYLOADS), choices=list(PAYLOADS))
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--local', action='store_true', help='Start a server in this process')
+    parser.add_argument('--port', type=int, default=8765, help='Port of the --local server')
+    parser.add_argument('--workers', type=int, default=2, help='Pool size of the --local server')
+    args = parser.parse_args(argv)
+
+    async def remote():
+        return [await run(args.url, __, args.requests, args.concurrency) for __ in args.endpoints]
+
+    results = asyncio.run(_local(args) if args.local else remote())
+
+    for result in results:
+        print(f"{result['endpoint']:<12} {result['requests']:>6} requests  "
+              f"{result['errors']:>3} errors  {result['throughput']:>8.1f} req/s  "
+              f"p50 {result['p50']:7.2f} ms  p99 {result['p99']:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
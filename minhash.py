@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: minhash.py
+# author: glenn abastillas
+# created: 2020-07-05
+# description: MinHash/LSH index of phoneme n-gram shingles for near-duplicate words
+from profiling import instrument
+from soundarray import default_encoder, phonology
+from tokenizer import default_tokenizer
+import numpy as np
+
+CLASSES = ('manner', 'place', 'frontness', 'openness')
+
+
+def _shingle_hashes(ids, offsets, n, base):
+    '''
+    Return 64-bit hashes of the n-grams of every word with ^ and $ boundaries,
+    and the word index of each hash
+
+    Parameters
+    ----------
+        ids (np.array) : Flat symbol ids in [0, base - 2)
+        offsets (np.array) : Word k spans ids[offsets[k]:offsets[k + 1]]
+        n (int) : Shingle length
+        base (int) : Number of symbols including the two boundaries
+    '''
+    words = offsets.size - 1
+    lengths = np.diff(offsets)
+    framed = lengths + 2
+
+    # Frame each word as ^ w $ in one flat array
+    starts = np.concatenate(([0], np.cumsum(framed)[:-1])).astype(np.int64)
+    sequence = np.empty(int(framed.sum()), dtype=np.uint64)
+    sequence[starts] = base - 2
+    sequence[starts + framed - 1] = base - 1
+    inside = np.ones(sequence.size, dtype=bool)
+    inside[starts] = inside[starts + framed - 1] = False
+    sequence[inside] = ids
+
+    # Words shorter than n - 2 symbols still get one shingle of their full frame
+    count = np.maximum(framed - n + 1, 1)
+    owner = np.repeat(np.arange(words), count)
+    position = np.repeat(starts, count) + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+
+    hashes = np.zeros(owner.size, dtype=np.uint64)
+    end = np.repeat(starts + framed, count)
+    for k in range(n):
+        valid = position + k < end
+        symbol = np.where(valid, sequence[np.minimum(position + k, sequence.size - 1)], np.uint64(base))
+        hashes = hashes * np.uint64(base + 1) + symbol
+
+    return hashes, owner
+
+
+class MinHashIndex():
+    '''
+    Locality-sensitive index of words by the Jaccard similarity of their
+    phoneme n-gram shingles. Signatures are split into bands and words sharing
+    any band are candidate near-duplicates, so queries touch a handful of
+    buckets instead of every word.
+
+    Attributes
+    ----------
+        words (list) : Indexed words by id
+        signatures (np.array) : MinHash signature of each word, (words, permutations)
+        bands (int) : Number of LSH bands
+        rows (int) : Signature values per band
+        threshold (float) : Estimated Jaccard similarity for a near-duplicate
+    '''
+
+    def __init__(self, permutations=64, bands=16, n=2, threshold=0.5, features=False,
+                 seed=2020, tokenizer=None):
+        '''
+        Parameters
+        ----------
+            permutations (int) : Signature length
+            bands (int) : Number of bands. Words sharing a band become
+                candidates with probability 1 - (1 - s^rows)^bands.
+            n (int) : Shingle length in symbols
+            threshold (float) : Minimum estimated similarity of a near-duplicate
+            features (bool) : Shingle feature classes (see CLASSES) instead of
+                IPA tokens, so words differing only in voicing (e.g., pata,
+                bada) are identical
+            seed (int) : Seed of the hash functions
+            tokenizer (Tokenizer) : Tokenizer used to split words
+        '''
+        if permutations % bands:
+            raise ValueError('The number of permutations must be a multiple of bands.')
+
+        self.permutations, self.bands, self.rows = permutations, bands, permutations // bands
+        self.n, self.threshold, self.features, self.seed = n, threshold, features, seed
+        self.tokenizer = tokenizer or default_tokenizer()
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 63, size=permutations, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=permutations, dtype=np.uint64)
+        self._mix = rng.integers(1, 2 ** 63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+
+        self._classes = None
+        if features:
+            codes = default_encoder().inventory[:, [phonology().labels.index(__) for __ in CLASSES]]
+            __, self._classes = np.unique(codes, axis=0, return_inverse=True)
+            self._classes = self._classes.ravel()
+
+        self.words = []
+        self._signatures = np.zeros((1024, permutations), dtype=np.uint32)
+
+        # Band keys of every word. The first _merged words are also kept in
+        # per-band sorted order for binary search; newer words are scanned.
+        self._band = np.zeros((1024, bands), dtype=np.uint64)
+        self._order = np.zeros((bands, 0), dtype=np.int64)
+        self._sorted = np.zeros((bands, 0), dtype=np.uint64)
+        self._merged = 0
+
+    def __repr__(self):
+        return f"MinHashIndex( words={len(self)}, bands={self.bands}, rows={self.rows} )"
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return bool(self.contains_many([word])[0])
+
+    @property
+    def signatures(self):
+        ''' Return the MinHash signature of every indexed word '''
+        return self._signatures[:len(self.words)]
+
+    @property
+    def _keys(self):
+        return self._band[:len(self.words)]
+
+    def _ids(self, words):
+        ''' Return flat symbol ids, offsets and the id alphabet size of words '''
+        ids, offsets = self.tokenizer.tokenize_many(words, ids=True)
+        if self._classes is not None:
+            return self._classes[ids], offsets, int(self._classes.max()) + 3
+        return ids, offsets, self.tokenizer.unknown + 3
+
+    def signature(self, words, chunk=8192):
+        '''
+        Return MinHash signatures of words as a (words, permutations) array
+
+        Parameters
+        ----------
+            words (list) : IPA words
+            chunk (int) : Words hashed per batch, bounding memory use
+        '''
+        words = list(words)
+        signatures = np.empty((len(words), self.permutations), dtype=np.uint32)
+
+        for first in range(0, len(words), chunk):
+            ids, offsets, base = self._ids(words[first:first + chunk])
+            hashes, owner = _shingle_hashes(ids, offsets, self.n, base)
+
+            # Multiply-shift hashing, one column per permutation
+            permuted = ((hashes[:, None] * self._a + self._b) >> np.uint64(32)).astype(np.uint32)
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(owner)) + 1))
+            signatures[first:first + offsets.size - 1] = np.minimum.reduceat(permuted, starts, axis=0)
+
+        return signatures
+
+    def _band_keys(self, signatures):
+        ''' Return one 64-bit bucket key per band for each signature '''
+        banded = signatures.reshape(-1, self.bands, self.rows).astype(np.uint64)
+        return (banded * self._mix).sum(axis=2)
+
+    def _insert(self, signatures):
+        '''
+        Store the signatures of the words last appended to self.words
+
+        Notes
+        -----
+            New keys are merged into the sorted bands once they outnumber an
+            eighth of the merged words, so insertion is amortized O(log n).
+        '''
+        first, size = len(self.words) - len(signatures), len(self.words)
+
+        capacity = len(self._signatures)
+        while capacity < size:
+            capacity *= 2
+        if capacity > len(self._signatures):
+            self._signatures = np.concatenate((self._signatures, np.zeros(
+                (capacity - len(self._signatures), self.permutations), dtype=np.uint32)))
+            self._band = np.concatenate((self._band, np.zeros(
+                (capacity - len(self._band), self.bands), dtype=np.uint64)))
+
+        self._signatures[first:size] = signatures
+        self._band[first:size] = self._band_keys(signatures)
+
+        if len(self._keys) - self._merged > max(1024, self._merged // 8):
+            self._order = np.argsort(self._keys.T, axis=1, kind='stable')
+            self._sorted = np.take_along_axis(self._keys.T, self._order, axis=1)
+            self._merged = len(self._keys)
+
+    def _candidates(self, keys):
+        '''
+        Return (query, word id) pairs sharing at least one band key
+
+        Parameters
+        ----------
+            keys (np.array) : Band keys of the queries, (queries, bands)
+        '''
+        queries, words = [], []
+        for band in range(self.bands):
+            column = keys[:, band]
+            low = np.searchsorted(self._sorted[band], column, side='left')
+            high = np.searchsorted(self._sorted[band], column, side='right')
+            counts = high - low
+            queries.append(np.repeat(np.arange(len(keys)), counts))
+            words.append(self._order[band][np.repeat(low - np.cumsum(counts) + counts, counts)
+                                           + np.arange(counts.sum())])
+
+            # Words added since the last merge
+            pending = self._keys[self._merged:, band]
+            if pending.size:
+                q, w = np.nonzero(column[:, None] == pending[None])
+                queries.append(q)
+                words.append(w + self._merged)
+
+        pairs = np.unique(np.stack((np.concatenate(queries), np.concatenate(words))), axis=1)
+        return pairs[0], pairs[1]
+
+    @instrument()
+    def add_many(self, words):
+        '''
+        Index words and return their ids
+
+        Parameters
+        ----------
+            words (iterable) : IPA words (e.g., an open corpus file)
+        '''
+        words = [__.strip() for __ in words]
+        first = len(self.words)
+        signatures = self.signature(words)
+        self.words.extend(words)
+        self._insert(signatures)
+        return list(range(first, len(self.words)))
+
+    def add(self, word):
+        ''' Index a word and return its id '''
+        return self.add_many([word])[0]
+
+    def similarity(self, a, b):
+        ''' Return the estimated Jaccard similarity of two signatures '''
+        return float(np.mean(a == b))
+
+    @instrument()
+    def query_many(self, words, threshold=None):
+        '''
+        Return the near-duplicates of each word
+
+        Parameters
+        ----------
+            words (list) : IPA words
+            threshold (float) : Minimum estimated similarity. Defaults to the
+                index threshold.
+
+        Returns
+        -------
+            List of (word, similarity) lists sorted by decreasing similarity
+        '''
+        threshold = self.threshold if threshold is None else threshold
+        words = list(words)
+        signatures = self.signature(words)
+        queries, candidates = self._candidates(self._band_keys(signatures))
+
+        scores = (self.signatures[candidates] == signatures[queries]).mean(axis=1)
+        keep = scores >= threshold
+        queries, candidates, scores = queries[keep], candidates[keep], scores[keep]
+        order = np.lexsort((candidates, -scores, queries))
+
+        results = [[] for _ in words]
+        for q, c, s in zip(queries[order].tolist(), candidates[order].tolist(), scores[order].tolist()):
+            results[q].append((self.words[c], s))
+        return results
+
+    def query(self, word, threshold=None):
+        ''' Return the near-duplicates of a word (see query_many) '''
+        return self.query_many([word], threshold)[0]
+
+    def contains_many(self, words):
+        '''
+        Return a boolean array marking words with an indexed near-duplicate, so
+        an index can serve as a forbidden list of bloom.UniquenessGate
+        '''
+        return np.array([bool(__) for __ in self.query_many(words)], dtype=bool)
+
+    def save(self, path):
+        '''
+        Save the index as a compressed NumPy archive. Buckets are rebuilt from
+        the signatures on load.
+
+        Parameters
+        ----------
+            path (str) : Output .npz file
+        '''
+        np.savez_compressed(path,
+                            words=np.array(self.words, dtype=str),
+                            signatures=self.signatures,
+                            parameters=np.array([self.permutations, self.bands, self.n,
+                                                 int(self.features), self.seed]),
+                            threshold=self.threshold)
+
+    @classmethod
+    def load(cls, path, tokenizer=None):
+        ''' Load an index saved with `save` '''
+        with np.load(path) as data:
+            permutations, bands, n, features, seed = data['parameters'].tolist()
+            index = cls(permutations, bands, n, float(data['threshold']), bool(features),
+                        seed, tokenizer)
+            index.words = data['words'].tolist()
+            index._insert(data['signatures'])
+        return index
+
+
+if __name__ == '__main__':
+    index = MinHashIndex(threshold=0.4)
+    index.add_many(['pataka', 'kinasu', 'sumatra'])
+    print(index, index.query('patakas'), index.query('lomo'))
+    voicing = MinHashIndex(features=True)
+    voicing.add_many(['pataka'])
+    print(voicing.query('badaga'))
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: mixing.py
+# author: glenn abastillas
+# created: 2020-06-30
+# description: per-language bigram count models blended by weighted interpolation
+from ipa import count_bigram_ids
+from probability import ESTIMATORS, ProbabilityModel
+from profiling import instrument
+from tokenizer import default_tokenizer
+import numpy as np
+import os
+
+START, END, UNKNOWN = '^', '$', '<unk>'
+
+
+class LanguageMixer():
+    '''
+    Bigram counts of several source languages over one shared symbol table.
+    Each language's conditional probabilities are normalized once, so a blend
+    of languages (e.g., 60% Japanese, 40% Finnish) is a single weighted sum
+    over the stacked matrices.
+
+    Attributes
+    ----------
+        names (list) : Language names in stack order
+        symbols (list) : Symbols indexed by row and column of every matrix
+        counts (np.array) : Counts of shape (languages, symbols, symbols)
+    '''
+
+    def __init__(self, symbols=()):
+        self.names = []
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.counts = np.zeros((0, len(self.symbols), len(self.symbols)), dtype=np.int64)
+        self._probabilities = None
+        self._estimator = None
+
+    def __repr__(self):
+        return f"LanguageMixer( languages={len(self.names)}, symbols={len(self.symbols)} )"
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def _align(self, symbols):
+        ''' Add new symbols to the table and return the ids of symbols '''
+        new = [__ for __ in dict.fromkeys(symbols) if __ not in self.index]
+        if new:
+            for symbol in new:
+                self.index[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+            size = len(self.symbols)
+            counts = np.zeros((len(self.names), size, size), dtype=self.counts.dtype)
+            counts[:, :self.counts.shape[1], :self.counts.shape[2]] = self.counts
+            self.counts = counts
+        return np.array([self.index[__] for __ in symbols], dtype=np.int64)
+
+    def add(self, name, counts, symbols):
+        '''
+        Add a language from a dense count matrix
+
+        Parameters
+        ----------
+            name (str) : Language name (e.g., ja, fi)
+            counts (np.array) : Bigram counts with previous symbols as rows
+            symbols (list) : Symbol of each row and column of counts
+        '''
+        if name in self.names:
+            raise ValueError(f'Language {name!r} is already in the mixer.')
+
+        ids = self._align(symbols)
+        layer = np.zeros(self.counts.shape[1:], dtype=self.counts.dtype)
+        layer[np.ix_(ids, ids)] = counts
+
+        self.names.append(name)
+        self.counts = np.concatenate((self.counts, layer[None]))
+        self._probabilities = None
+
+    def add_nested(self, name, model):
+        '''
+        Add a language from nested counts (see ipa.count_bigrams)
+
+        Parameters
+        ----------
+            name (str) : Language name
+            model (dict) : Mapping of previous symbols to next symbol counts
+        '''
+        symbols = list(dict.fromkeys([*model, *(b for row in model.values() for b in row)]))
+        index = {s: i for i, s in enumerate(symbols)}
+        counts = np.zeros((len(symbols), len(symbols)), dtype=np.int64)
+        for a, row in model.items():
+            for b, count in row.items():
+                counts[index[a], index[b]] += count
+        self.add(name, counts, symbols)
+
+    @instrument()
+    def add_corpus(self, name, lines, tokenizer=None):
+        '''
+        Count a language's bigrams from IPA words, one per line
+
+        Parameters
+        ----------
+            name (str) : Language name
+            lines (iterable) : IPA words (e.g., an open resources/lang file)
+            tokenizer (Tokenizer) : Tokenizer used to split words
+        '''
+        tokenizer = tokenizer or default_tokenizer()
+        ids, offsets = tokenizer.tokenize_many((__.strip() for __ in lines), ids=True)
+        size = tokenizer.unknown + 1
+        counts = count_bigram_ids(ids, offsets, size)
+        self.add(name, counts, [*tokenizer.symbols, UNKNOWN, START, END])
+
+    @classmethod
+    def from_files(cls, paths, tokenizer=None):
+        '''
+        Build a mixer from corpus files named after their language
+
+        Parameters
+        ----------
+            paths (list) : Corpus files (e.g., resources/lang/ja.txt)
+            tokenizer (Tokenizer) : Tokenizer used to split words
+        '''
+        mixer = cls()
+        for path in paths:
+            with open(path) as fin:
+                mixer.add_corpus(os.path.splitext(os.path.basename(path))[0], fin, tokenizer)
+        return mixer
+
+    def probabilities(self, estimator='mle', **kwargs):
+        '''
+        Return every language's conditional probabilities as one stacked array.
+        They are cached until the estimator or the languages change.
+
+        Parameters
+        ----------
+            estimator (str) : Name in probability.ESTIMATORS
+            kwargs : Estimator parameters
+        '''
+        key = (estimator, tuple(sorted(kwargs.items())))
+        if self._probabilities is None or self._estimator != key:
+            function = ESTIMATORS[estimator]
+            self._probabilities = np.stack([function(__.astype(np.float64), **kwargs)
+                                            for __ in self.counts])
+            self._estimator = key
+        return self._probabilities
+
+    def weights(self, weights):
+        '''
+        Return a normalized weight vector in stack order
+
+        Parameters
+        ----------
+            weights (dict, list) : Weight by language name, or one weight per
+                language in stack order. Missing languages weigh 0.
+        '''
+        if isinstance(weights, dict):
+            unknown = set(weights) - set(self.names)
+            if unknown:
+                raise KeyError(f'Languages not in the mixer: {sorted(unknown)}')
+            weights = [weights.get(__, 0.0) for __ in self.names]
+
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (len(self.names),) or (weights < 0).any() or not weights.sum():
+            raise ValueError('Weights must be non-negative, not all zero, one per language.')
+        return weights / weights.sum()
+
+    @instrument()
+    def mix(self, weights, estimator='mle', **kwargs):
+        '''
+        Return the interpolated model P(b | a) = sum_l w_l P_l(b | a)
+
+        Parameters
+        ----------
+            weights (dict, list) : Weight of each language (see `weights`)
+            estimator (str) : Estimator for each language's probabilities
+            kwargs : Estimator parameters
+
+        Notes
+        -----
+            A language may have no distribution for a previous symbol it never
+            saw (e.g., an all-zero MLE row), so each mixed row is divided by
+            its own sum. Rows that are already distributions are unchanged.
+        '''
+        weights = self.weights(weights)
+        probabilities = self.probabilities(estimator, **kwargs)
+
+        matrix = np.tensordot(weights, probabilities, axes=1)
+        total = matrix.sum(axis=1, keepdims=True)
+        matrix = np.divide(matrix, total, out=np.zeros(matrix.shape), where=total > 0)
+
+        return ProbabilityModel(self.symbols, self.symbols, matrix)
+
+    def mix_counts(self, weights):
+        '''
+        Return nested pseudo-counts of a blend, scaled so each language
+        contributes by weight regardless of corpus size. The result can be
+        passed to scoring.PhonotacticScorer.
+
+        Parameters
+        ----------
+            weights (dict, list) : Weight of each language (see `weights`)
+        '''
+        weights = self.weights(weights)
+        totals = self.counts.sum(axis=(1, 2)).astype(np.float64)
+        scale = np.divide(weights, totals, out=np.zeros(weights.shape), where=totals > 0)
+        blend = np.tensordot(scale * totals.sum(), self.counts, axes=1)
+
+        rows, columns = np.nonzero(blend)
+        model = {}
+        for a, b in zip(rows, columns):
+            model.setdefault(self.symbols[a], {})[self.symbols[b]] = float(blend[a, b])
+        return model
+
+    def save(self, path):
+        '''
+        Write the counts as compressed sparse triples
+
+        Parameters
+        ----------
+            path (str) : Output .npz file
+        '''
+        language, rows, columns = np.nonzero(self.counts)
+        np.savez_compressed(path,
+                            names=np.array(self.names, dtype=str),
+                            symbols=np.array(self.symbols, dtype=str),
+                            language=language.astype(np.uint16),
+                            rows=rows.astype(np.uint16),
+                            columns=columns.astype(np.uint16),
+                            values=self.counts[language, rows, columns])
+
+    @classmethod
+    def load(cls, path):
+        ''' Read counts written with `save` '''
+        with np.load(path) as data:
+            mixer = cls(data['symbols'].tolist())
+            mixer.names = data['names'].tolist()
+            size = len(mixer.symbols)
+            mixer.counts = np.zeros((len(mixer.names), size, size), dtype=np.int64)
+            mixer.counts[data['language'], data['rows'], data['columns']] = data['values']
+        return mixer
+
+
+if __name__ == '__main__':
+    mixer = LanguageMixer()
+    mixer.add_corpus('a', ['pata', 'kapa', 'tapa'])
+    mixer.add_corpus('b', ['sini', 'nisi', 'iksi'])
+    model = mixer.mix({'a': 0.6, 'b': 0.4})
+    print(mixer, model.prob('^', 'p'), model.prob('^', 's'), model.prob('s', 'i'))
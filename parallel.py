@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: parallel.py
+# author: glenn abastillas
+# created: 2020-07-11
+# description: process pools whose workers each receive shared state once
+'''
+Batch jobs (generation chunks, evolution replicates, annealing restarts) and
+the server's pool all hand a large object to every worker and then send it
+small tasks. The object is pickled once per worker by the pool initializer
+and each task is called as function(state, task).
+
+    results = parallel.map(_replicate, tasks, simulation, workers=4)
+
+With one worker the tasks run in this process on the state directly.
+'''
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+STATE = None
+
+
+def _initialize(state):
+    ''' Keep the state in a worker process so it is sent only once '''
+    global STATE
+    STATE = state
+
+
+def call(function, task):
+    ''' Return function(state, task) with the state of this worker '''
+    return function(STATE, task)
+
+
+def executor(state, workers):
+    ''' Return a process pool of workers that each hold state '''
+    return ProcessPoolExecutor(workers, initializer=_initialize, initargs=(state,))
+
+
+def imap(function, tasks, state, workers=None):
+    '''
+    Yield function(state, task) for every task in order as results complete
+
+    Parameters
+    ----------
+        function (callable) : Module-level function taking (state, task)
+        tasks (list) : Picklable tasks
+        state (object) : Picklable object sent once to each worker
+        workers (int) : Worker processes. Defaults to the number of CPUs and
+            never exceeds the number of tasks; 1 runs in this process.
+    '''
+    tasks = list(tasks)
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+
+    if workers == 1:
+        for task in tasks:
+            yield function(state, task)
+        return
+
+    with executor(state, workers) as pool:
+        yield from pool.map(call, [function] * len(tasks), tasks)
+
+
+def map(function, tasks, state, workers=None):
+    ''' Return the list of function(state, task) for every task (see imap) '''
+    return list(imap(function, tasks, state, workers))
+
+
+if __name__ == '__main__':
+    def scale(factor, task):
+        return factor * task
+
+    print(map(scale, range(5), 10, workers=1))
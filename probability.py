@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: probability.py
+# author: glenn abastillas
+# created: 2020-06-29
+# description: conditional count and probability models over dense arrays
+from profiling import instrument
+import numpy as np
+import pickle
+
+
+def _bins(counts, bins):
+    ''' Return the number of bins per row for a smoothing estimator '''
+    if bins is None:
+        return (counts > 0).sum(axis=1, keepdims=True)
+    if bins == 'all':
+        return counts.shape[1]
+    return bins
+
+
+def mle(counts):
+    '''
+    Return maximum likelihood conditional probabilities of a count matrix
+
+    Parameters
+    ----------
+        counts (np.array) : Counts with conditions as rows and outcomes as columns
+    '''
+    totals = counts.sum(axis=1, keepdims=True)
+    return np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+
+
+def lidstone(counts, gamma=0.5, bins=None):
+    '''
+    Return Lidstone smoothed conditional probabilities of a count matrix
+
+    Parameters
+    ----------
+        counts (np.array) : Counts with conditions as rows and outcomes as columns
+        gamma (float) : Pseudocount added to every outcome
+        bins (int, str) : Number of possible outcomes per condition. If None,
+            the number of outcomes observed with each condition (as in nltk).
+            If 'all', the number of columns.
+
+    Notes
+    -----
+        With bins=None an unobserved outcome gets gamma / (N + B * gamma), so
+        rows sum to more than one, exactly as nltk's LidstoneProbDist.
+    '''
+    totals = counts.sum(axis=1, keepdims=True)
+    denominator = totals + _bins(counts, bins) * gamma
+    return np.divide(counts + gamma, denominator, out=np.zeros(counts.shape),
+                     where=denominator > 0)
+
+
+def ele(counts, bins=None):
+    ''' Return expected likelihood estimates (Lidstone with gamma = 0.5) '''
+    return lidstone(counts, 0.5, bins)
+
+
+def laplace(counts, bins=None):
+    ''' Return Laplace estimates (Lidstone with gamma = 1) '''
+    return lidstone(counts, 1.0, bins)
+
+
+def add_k(counts, k=1.0):
+    '''
+    Return add-k smoothed conditional probabilities over every column
+
+    Parameters
+    ----------
+        counts (np.array) : Counts with conditions as rows and outcomes as columns
+        k (float) : Pseudocount added to every outcome
+    '''
+    return lidstone(counts, k, 'all')
+
+
+def kneser_ney(counts, discount=0.75):
+    '''
+    Return interpolated Kneser-Ney conditional probabilities of a count matrix
+
+    Parameters
+    ----------
+        counts (np.array) : Bigram counts with previous symbols as rows
+        discount (float) : Absolute discount subtracted from each seen bigram
+
+    Notes
+    -----
+        Rows without observations fall back to the continuation probability,
+        which is proportional to the number of distinct contexts of a symbol.
+    '''
+    seen = counts > 0
+    continuation = seen.sum(axis=0) + 1.0
+    continuation = continuation / continuation.sum()
+
+    totals = counts.sum(axis=1, keepdims=True)
+    safe = np.where(totals > 0, totals, 1)
+
+    discounted = np.maximum(counts - discount, 0) / safe
+    backoff = discount * seen.sum(axis=1, keepdims=True) / safe
+    backoff = np.where(totals > 0, backoff, 1.0)
+
+    return discounted + backoff * continuation
+
+
+ESTIMATORS = {
+    'mle': mle,
+    'lidstone': lidstone,
+    'ele': ele,
+    'laplace': laplace,
+    'add-k': add_k,
+    'kneser-ney': kneser_ney,
+}
+
+
+class ConditionalCounts():
+    '''
+    Dense counts of outcomes given conditions (e.g., the next sound given the
+    previous one) with symbol tables that grow as new symbols are seen.
+
+    Attributes
+    ----------
+        conditions (list) : Condition symbols indexed by row
+        outcomes (list) : Outcome symbols indexed by column
+        counts (np.array) : Count matrix of shape (conditions, outcomes)
+    '''
+
+    def __init__(self, conditions=(), outcomes=()):
+        self.conditions = list(conditions)
+        self.outcomes = list(outcomes)
+        self._conditions = {s: i for i, s in enumerate(self.conditions)}
+        self._outcomes = {s: i for i, s in enumerate(self.outcomes)}
+        self.counts = np.zeros((len(self.conditions), len(self.outcomes)), dtype=np.int64)
+
+    def __repr__(self):
+        return f"ConditionalCounts( conditions={len(self.conditions)}, outcomes={len(self.outcomes)} )"
+
+    def __getitem__(self, condition):
+        ''' Return the outcome counts of a condition as a dict '''
+        row = self.counts[self._conditions[condition]]
+        return {self.outcomes[i]: int(row[i]) for i in np.flatnonzero(row)}
+
+    def N(self):
+        ''' Return the total number of observations '''
+        return int(self.counts.sum())
+
+    def _ids(self, symbols, table, names):
+        ''' Return ids for symbols, adding new symbols to a table '''
+        ids = []
+        for symbol in symbols:
+            if symbol not in table:
+                table[symbol] = len(names)
+                names.append(symbol)
+            ids.append(table[symbol])
+        return np.array(ids, dtype=np.int64)
+
+    def _resize(self):
+        ''' Grow the count matrix to fit the symbol tables '''
+        rows, columns = len(self.conditions), len(self.outcomes)
+        if self.counts.shape != (rows, columns):
+            counts = np.zeros((rows, columns), dtype=self.counts.dtype)
+            counts[:self.counts.shape[0], :self.counts.shape[1]] = self.counts
+            self.counts = counts
+
+    @instrument()
+    def update(self, pairs, count=1):
+        '''
+        Count (condition, outcome) pairs
+
+        Parameters
+        ----------
+            pairs (iterable) : (condition, outcome) tuples
+            count (int) : Amount to add for each pair
+        '''
+        pairs = list(pairs)
+        if not pairs:
+            return
+
+        conditions, outcomes = zip(*pairs)
+        rows = self._ids(conditions, self._conditions, self.conditions)
+        columns = self._ids(outcomes, self._outcomes, self.outcomes)
+
+        self._resize()
+        np.add.at(self.counts, (rows, columns), count)
+
+    def add(self, condition, outcome, count=1):
+        ''' Count one (condition, outcome) pair '''
+        self.update([(condition, outcome)], count)
+
+    @classmethod
+    def from_nested(cls, model):
+        '''
+        Build counts from nested dicts like those of ipa.count_bigrams
+
+        Parameters
+        ----------
+            model (dict) : Mapping of conditions to outcome count dicts
+        '''
+        conditions = sorted(model)
+        outcomes = sorted({o for row in model.values() for o in row})
+        counts = cls(conditions, outcomes)
+
+        for condition, row in model.items():
+            i = counts._conditions[condition]
+            for outcome, count in row.items():
+                counts.counts[i, counts._outcomes[outcome]] += count
+
+        return counts
+
+    @classmethod
+    def from_pickle(cls, path='resources/pickles/bigrams.pkl'):
+        ''' Build counts from pickled nested bigram counts '''
+        with open(path, 'rb') as fin:
+            return cls.from_nested(pickle.load(fin))
+
+    def to_nested(self):
+        ''' Return counts as nested dicts of nonzero entries '''
+        return {c: self[c] for c in self.conditions if self.counts[self._conditions[c]].any()}
+
+    def probabilities(self, estimator='ele', **kwargs):
+        '''
+        Return a probability model estimated from these counts
+
+        Parameters
+        ----------
+            estimator (str, callable) : Name in ESTIMATORS or a function of a
+                count matrix returning a probability matrix
+            kwargs : Estimator parameters (e.g., gamma, bins, k, discount)
+        '''
+        function = ESTIMATORS[estimator] if isinstance(estimator, str) else estimator
+        counts = self.counts.astype(np.float64)
+        matrix = function(counts, **kwargs)
+
+        # An extra empty column gives the estimate for outcomes never counted
+        padded = np.hstack((counts, np.zeros((counts.shape[0], 1))))
+        unseen = function(padded, **kwargs)[:, -1]
+
+        return ProbabilityModel(self.conditions, self.outcomes, matrix, self.counts > 0, unseen)
+
+
+class Distribution():
+    ''' Probabilities of outcomes for one condition of a ProbabilityModel '''
+
+    def __init__(self, model, row):
+        self._model, self._row = model, row
+
+    def __repr__(self):
+        return f"Distribution( {self._model.conditions[self._row]!r} )"
+
+    def prob(self, outcome):
+        ''' Return the probability of an outcome '''
+        return self._model.prob(self._model.conditions[self._row], outcome)
+
+    def logprob(self, outcome):
+        ''' Return the base 2 log probability of an outcome '''
+        return float(np.log2(self.prob(outcome)))
+
+    def samples(self):
+        ''' Return outcomes observed with this condition '''
+        return [o for o, c in zip(self._model.outcomes, self._model.observed[self._row]) if c]
+
+    def max(self):
+        ''' Return the most probable outcome '''
+        return self._model.outcomes[int(self._model.matrix[self._row].argmax())]
+
+
+class ProbabilityModel():
+    '''
+    Conditional probabilities P(outcome | condition) as a dense matrix
+
+    Attributes
+    ----------
+        conditions (list) : Condition symbols indexed by row
+        outcomes (list) : Outcome symbols indexed by column
+        matrix (np.array) : Probability matrix of shape (conditions, outcomes)
+        observed (np.array) : Whether each outcome was counted with each condition
+        unseen (np.array) : Probability of an outcome not in outcomes, per row
+    '''
+
+    def __init__(self, conditions, outcomes, matrix, observed=None, unseen=None):
+        self.conditions = list(conditions)
+        self.outcomes = list(outcomes)
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        self._conditions = {s: i for i, s in enumerate(self.conditions)}
+        self._outcomes = {s: i for i, s in enumerate(self.outcomes)}
+
+        self.observed = self.matrix > 0 if observed is None else np.asarray(observed)
+        self.unseen = np.zeros(len(self.conditions)) if unseen is None else np.asarray(unseen)
+
+    def __repr__(self):
+        return f"ProbabilityModel( conditions={len(self.conditions)}, outcomes={len(self.outcomes)} )"
+
+    def __getitem__(self, condition):
+        ''' Return the Distribution of a condition (as nltk's ConditionalProbDist) '''
+        return Distribution(self, self._conditions[condition])
+
+    def __contains__(self, condition):
+        return condition in self._conditions
+
+    def prob(self, condition, outcome):
+        ''' Return P(outcome | condition) '''
+        row = self._conditions[condition]
+        column = self._outcomes.get(outcome)
+        if column is None:
+            return float(self.unseen[row])
+        return float(self.matrix[row, column])
+
+    def log(self):
+        ''' Return the natural log of the probability matrix '''
+        with np.errstate(divide='ignore'):
+            return np.log(self.matrix)
+
+
+def bigrams(sequence):
+    ''' Return adjacent pairs of a sequence '''
+    return zip(sequence, sequence[1:])
+
+
+if __name__ == '__main__':
+    counts = ConditionalCounts()
+    counts.update(bigrams('voiced bilabial stop'.split()))
+    counts.update(bigrams('voiceless bilabial stop'.split()))
+    model = counts.probabilities('ele')
+    print(model, model['bilabial'].prob('stop'), model['voiced'].prob('velar'))
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: profiling.py
+# author: glenn abastillas
+# created: 2020-06-24
+# description: opt-in call counters and timers for the package's entry points
+'''
+Instrumentation is off by default and instrumented functions are left
+untouched, so it costs nothing unless enabled. Enable it with
+
+    CONLANG_PROFILE=1 python script.py           # print a summary at exit
+    CONLANG_PROFILE=trace.json python script.py  # also write a Chrome trace
+
+or around a block of code with
+
+    with profiling.profile() as stats:
+        ...
+    print(stats.summary())
+
+Chrome traces open in chrome://tracing or https://ui.perfetto.dev.
+'''
+from contextlib import contextmanager
+from functools import wraps
+import atexit
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+
+REGISTRY = {}
+
+
+class Statistics():
+    '''
+    Call counts, cumulative time and trace events for instrumented functions
+
+    Attributes
+    ----------
+        calls (dict) : Number of calls by entry point name
+        seconds (dict) : Cumulative seconds by entry point name
+        events (list) : Chrome trace events, if tracing
+        trace (bool) : Whether to record individual trace events
+    '''
+
+    def __init__(self, trace=False):
+        self.calls = {}
+        self.seconds = {}
+        self.events = []
+        self.trace = trace
+        self._origin = time.perf_counter()
+
+    def record(self, name, start, end):
+        ''' Record one call to an entry point '''
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.seconds[name] = self.seconds.get(name, 0.0) + end - start
+
+        if self.trace:
+            self.events.append({
+                'name': name,
+                'cat': name.split('.')[0],
+                'ph': 'X',
+                'ts': (start - self._origin) * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+            })
+
+    def summary(self):
+        ''' Return a table of entry points sorted by cumulative time '''
+        lines = [f'{"entry point":<48}{"calls":>10}{"total (s)":>12}{"mean (us)":>12}']
+        for name in sorted(self.seconds, key=self.seconds.get, reverse=True):
+            calls, seconds = self.calls[name], self.seconds[name]
+            lines.append(f'{name:<48}{calls:>10}{seconds:>12.4f}{1e6 * seconds / calls:>12.2f}')
+        return '\n'.join(lines)
+
+    def dump(self, path):
+        ''' Write recorded events as a Chrome trace JSON file '''
+        with open(path, 'w') as fout:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, fout)
+
+
+STATS = Statistics()
+ENABLED = False
+
+
+def _wrap(name, function):
+    ''' Return a function that records its calls in STATS '''
+    clock = time.perf_counter
+
+    # A coroutine function returns at once, so time the awaited call instead
+    if inspect.iscoroutinefunction(function):
+        @wraps(function)
+        async def instrumented(*args, **kwargs):
+            start = clock()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                STATS.record(name, start, clock())
+
+    else:
+        @wraps(function)
+        def instrumented(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                STATS.record(name, start, clock())
+
+    instrumented.__instrumented__ = function
+    return instrumented
+
+
+def _owner(module, qualname):
+    ''' Return the object that holds a function and the attribute name '''
+    owner = sys.modules[module]
+    *path, attribute = qualname.split('.')
+
+    for part in path:
+        if part.startswith('__') and not part.endswith('__'):
+            part = f'_{owner.__name__.lstrip("_")}{part}'
+        owner = getattr(owner, part)
+
+    if attribute.startswith('__') and not attribute.endswith('__'):
+        attribute = f'_{owner.__name__.lstrip("_")}{attribute}'
+
+    return owner, attribute
+
+
+def instrument(name=None):
+    '''
+    Register a function or method as an instrumented entry point
+
+    Parameters
+    ----------
+        name (str) : Name reported in summaries. Defaults to module.qualname.
+
+    Notes
+    -----
+        The function itself is returned unchanged unless profiling is already
+        enabled, in which case it is wrapped immediately.
+    '''
+    def register(function):
+        label = name or f'{function.__module__}.{function.__qualname__}'
+        REGISTRY[label] = (function.__module__, function.__qualname__, function)
+
+        if ENABLED:
+            return _wrap(label, function)
+        return function
+
+    return register
+
+
+def _patch(label, module, qualname, function, instrumented):
+    ''' Set an entry point on its owner, keeping classmethod and staticmethod '''
+    owner, attribute = _owner(module, qualname)
+    current = owner.__dict__.get(attribute) if isinstance(owner, type) else getattr(owner, attribute)
+
+    kind = type(current) if isinstance(current, (classmethod, staticmethod)) else None
+    current = current.__func__ if kind else current
+
+    if instrumented == hasattr(current, '__instrumented__'):
+        return
+
+    replacement = _wrap(label, function) if instrumented else function
+    setattr(owner, attribute, kind(replacement) if kind else replacement)
+
+
+def enable(trace=False):
+    '''
+    Start recording calls to every registered entry point
+
+    Parameters
+    ----------
+        trace (bool) : Also record individual calls as Chrome trace events
+    '''
+    global ENABLED
+    STATS.trace = STATS.trace or trace
+    ENABLED = True
+
+    for label, (module, qualname, function) in REGISTRY.items():
+        if module in sys.modules:
+            _patch(label, module, qualname, function, True)
+
+
+def disable():
+    ''' Stop recording and restore the original entry points '''
+    global ENABLED
+    ENABLED = False
+
+    for label, (module, qualname, function) in REGISTRY.items():
+        if module in sys.modules:
+            _patch(label, module, qualname, function, False)
+
+
+def reset(trace=False):
+    ''' Discard recorded statistics '''
+    global STATS
+    STATS = Statistics(trace)
+    return STATS
+
+
+@contextmanager
+def profile(trace=False, path=None):
+    '''
+    Record entry point calls inside a with block
+
+    Parameters
+    ----------
+        trace (bool) : Also record individual calls as Chrome trace events
+        path (str) : Write a Chrome trace to this file when the block exits
+
+    Notes
+    -----
+        Modules imported inside the block are instrumented from the moment
+        they are imported.
+    '''
+    stats = reset(trace or bool(path))
+    enable(stats.trace)
+    try:
+        yield stats
+    finally:
+        disable()
+        if path:
+            stats.dump(path)
+
+
+def _report(path):
+    ''' Print the summary (and write a trace) when the interpreter exits '''
+    print(STATS.summary(), file=sys.stderr)
+    if path:
+        STATS.dump(path)
+
+
+_setting = os.environ.get('CONLANG_PROFILE', '')
+
+if _setting and _setting != '0':
+    _path = _setting if _setting.endswith('.json') else None
+    enable(trace=bool(_path))
+    atexit.register(_report, _path)
@@ -8,11 +8,13 @@ Load and create a resources object that allows for dot-notation access.
 
 """
 from collections import namedtuple, defaultdict
+from profiling import instrument
 import yaml
 
 
 class Resource():
 
+    @instrument()
     def __init__(self, resource='phonology'):
         self.__initialize(f'resources/{resource}.yaml')
 
@@ -92,6 +94,7 @@ class SoundsResource(Resource):
                     return [resource]
             return []
         
+        @instrument()
         def get_prob(self, feature, condition=None):
             '''
             Return the probability of a feature in the sounds resource
@@ -185,6 +188,7 @@ class SoundsResource(Resource):
             return total
 
 
+        @instrument()
         def get_freq(self):
             container = {}
             for resource in self.resource:
@@ -233,18 +237,26 @@ class SoundsResource(Resource):
     def find(self, value):
         return self.c.like(value) + self.v.like(value)
     
+    @instrument()
     def character(self, value):
         return self.c.character(value) + self.v.character(value)
     
+    @instrument()
     def like(self, sound):
         ''' 
-        Return sound that matches the input Consonant or Vowel 
+        Return the IPA character closest to the input Consonant or Vowel 
         
         Properties
         ----------
-            sound (Sound, Consonant, Vowel): User input to match to resource
+            sound (Sound, Consonant, Vowel, SoundArray): User input to match to
+                resource. A SoundArray returns a list of characters.
         '''
-        raise NotImplementedError()
+        from distance import nearest_sound
+        index = nearest_sound()
+
+        if hasattr(sound, 'codes'):
+            return index.characters(sound)
+        return index.query(sound)
 
 
 
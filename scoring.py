@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: scoring.py
+# author: glenn abastillas
+# created: 2020-06-28
+# description: batched phonotactic log-likelihood scoring under a bigram model
+from probability import add_k, kneser_ney
+from profiling import instrument
+import numpy as np
+import pickle
+
+START, END = '^', '$'
+
+
+SMOOTHING = {'add-k': add_k, 'kneser-ney': kneser_ney}
+
+
+class PhonotacticScorer():
+    '''
+    Score words by their log-likelihood under a bigram model with ^ and $ word
+    boundaries. Words are encoded to id arrays and a whole batch is scored with
+    gathers from a dense log-probability matrix precomputed at build time.
+
+    Attributes
+    ----------
+        symbols (list) : Symbols in id order. The last three ids are unknown
+            symbols, ^ and $.
+        logp (np.array) : Natural log of P(next | previous) over ids
+    '''
+
+    def __init__(self, model, smoothing='add-k', tokenizer=None, **kwargs):
+        '''
+        Parameters
+        ----------
+            model (dict) : Nested bigram counts (see ipa.count_bigrams)
+            smoothing (str) : add-k or kneser-ney
+            tokenizer (Tokenizer) : Split words into tokens instead of characters
+            kwargs : Smoothing parameters (k for add-k, discount for kneser-ney)
+        '''
+        symbols = sorted({a for a in model} | {b for row in model.values() for b in row}
+                         - {START, END})
+
+        self.symbols = symbols + ['<unk>', START, END]
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.unknown, self.start, self.end = len(symbols), len(symbols) + 1, len(symbols) + 2
+        self.tokenizer = tokenizer
+
+        counts = np.zeros((len(self.symbols), len(self.symbols)))
+        for a, row in model.items():
+            for b, count in row.items():
+                counts[self.index[a], self.index[b]] += count
+
+        # Models counted without boundaries (e.g., bigrams.pkl) start words like
+        # the unigram distribution and only reach $ through smoothing
+        if not counts[self.start].any():
+            counts[self.start, :self.unknown] = counts[:self.unknown, :self.unknown].sum(axis=0)
+
+        counts[self.end] = 0
+        self.counts = counts
+
+        # ^ never follows another symbol, so it is left out of the smoothing
+        following = np.arange(len(self.symbols)) != self.start
+        probabilities = np.zeros(counts.shape)
+        probabilities[:, following] = SMOOTHING[smoothing](counts[:, following], **kwargs)
+
+        with np.errstate(divide='ignore'):
+            self.logp = np.log(probabilities)
+
+        self._table = None
+        if tokenizer is None:
+            single = [s for s in symbols if len(s) == 1]
+            top = max([ord(__) for __ in single], default=0) + 2
+            self._table = np.full(top, self.unknown, dtype=np.int32)
+            self._table[[ord(__) for __ in single]] = [self.index[__] for __ in single]
+
+    def __repr__(self):
+        return f"PhonotacticScorer( symbols={len(self.symbols)} )"
+
+    @classmethod
+    def from_pickle(cls, path='resources/pickles/bigrams.pkl', **kwargs):
+        ''' Build a scorer from pickled bigram counts '''
+        with open(path, 'rb') as fin:
+            return cls(pickle.load(fin), **kwargs)
+
+    def encode(self, words):
+        '''
+        Return words as a padded id matrix framed by ^ and $, and their lengths
+
+        Parameters
+        ----------
+            words (list) : IPA words
+
+        Returns
+        -------
+            Tuple of an (N, longest + 2) id matrix and an array of word lengths.
+            Positions after $ are padded with $.
+        '''
+        if self._table is None:
+            tokens = [[self.index.get(t, self.unknown) for t in self.tokenizer.tokenize(__)]
+                      for __ in words]
+            lengths = np.array([len(__) for __ in tokens], dtype=np.int64)
+            flat = np.array([t for __ in tokens for t in __], dtype=np.int32)
+        else:
+            text = ''.join(words)
+            codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+            flat = self._table[np.minimum(codes, self._table.size - 1)]
+            lengths = np.fromiter((len(__) for __ in words), dtype=np.int64, count=len(words))
+
+        width = int(lengths.max()) + 2 if lengths.size else 2
+        padded = np.full((lengths.size, width), self.end, dtype=np.int32)
+        padded[:, 0] = self.start
+
+        rows = np.repeat(np.arange(lengths.size), lengths)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        columns = np.arange(flat.size) - np.repeat(starts, lengths) + 1
+        padded[rows, columns] = flat
+
+        return padded, lengths
+
+    def transitions(self, words):
+        '''
+        Return the log-probability of every transition in a batch
+
+        Returns
+        -------
+            Tuple of an (N, longest + 1) matrix of log-probabilities, with
+            padding positions set to zero, and the word lengths.
+        '''
+        padded, lengths = self.encode(words)
+        logp = self.logp[padded[:, :-1], padded[:, 1:]]
+        mask = np.arange(logp.shape[1]) <= lengths[:, None]
+        return np.where(mask, logp, 0.0), lengths
+
+    @instrument()
+    def score(self, words, normalize=False):
+        '''
+        Return the log-likelihood of each word including the ^ and $ boundaries
+
+        Parameters
+        ----------
+            words (list) : IPA words
+            normalize (bool) : Divide by the number of transitions so words of
+                different lengths are comparable
+        '''
+        logp, lengths = self.transitions(words)
+        scores = logp.sum(axis=1)
+        if normalize:
+            scores = scores / (lengths + 1)
+        return scores
+
+    def surprisal(self, words):
+        '''
+        Return the surprisal in bits of each symbol and the final $ of each word
+
+        Parameters
+        ----------
+            words (list) : IPA words
+
+        Returns
+        -------
+            List of arrays, one per word, of length len(word) + 1
+        '''
+        logp, lengths = self.transitions(words)
+        bits = -logp / np.log(2)
+        return [bits[i, :n + 1] for i, n in enumerate(lengths)]
+
+
+if __name__ == '__main__':
+    scorer = PhonotacticScorer.from_pickle(smoothing='kneser-ney')
+    print(scorer, scorer.score(['pata', 'ktkt', 'aaaa'], normalize=True))
+    print(scorer.surprisal(['pata']))
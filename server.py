@@ -0,0 +1,376 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: server.py
+# author: glenn abastillas
+# created: 2020-07-06
+# description: long-lived asyncio HTTP/JSON service for generation and scoring
+'''
+Run with `python server.py --port 8080` from the package directory. Every
+endpoint takes a JSON POST body and returns JSON.
+
+    /generate   {"count": 10, "seed": 1}          -> {"words": [...]}
+    /score      {"words": [...], "normalize": 0}  -> {"scores": [...]}
+    /syllabify  {"words": [...]}                  -> {"syllables": [[...], ...]}
+    /tokenize   {"words": [...]}                  -> {"tokens": [[...], ...]}
+    /health     (GET)                             -> {"status": "ok"}
+
+Resources and models are loaded once when the server starts. Requests that
+arrive within a few milliseconds of each other are merged into one vectorized
+call, and batches above a size threshold run in a process pool whose workers
+load the same models once at startup.
+'''
+from profiling import instrument
+import argparse
+import asyncio
+import json
+import numpy as np
+import parallel
+
+# Largest /generate count accepted in one request
+LIMIT = 10000
+
+STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+          500: 'Internal Server Error'}
+
+
+class Models():
+    '''
+    Warm resources shared by the server and its pool workers
+
+    Attributes
+    ----------
+        tokenizer (Tokenizer) : Tokenizer over sounds.yaml symbols
+        scorer (PhonotacticScorer) : Bigram scorer for /score
+        generator (object) : Has generate(count, rng) for /generate
+    '''
+
+    def __init__(self, scorer=None, generator=None, tokenizer=None):
+        from scoring import PhonotacticScorer
+        from tokenizer import default_tokenizer
+
+        self.tokenizer = tokenizer or default_tokenizer()
+        self.scorer = scorer or PhonotacticScorer.from_pickle(smoothing='kneser-ney')
+        self.generator = generator
+
+        if self.generator is None:
+            from constrained import ConstrainedGenerator
+            self.generator = ConstrainedGenerator(self.scorer.symbols, np.exp(self.scorer.logp),
+                                                  lengths=(2, 10))
+
+    def __repr__(self):
+        return f"Models( scorer={self.scorer}, generator={self.generator} )"
+
+    def generate(self, requests):
+        '''
+        Return the words of each (count, seed) request
+
+        Notes
+        -----
+            Seeded requests each draw from their own Generator so a seed gives
+            the same words however requests are batched. Unseeded requests are
+            drawn together in one call and split afterwards.
+        '''
+        results = [None] * len(requests)
+        unseeded = [i for i, (__, seed) in enumerate(requests) if seed is None]
+        if unseeded:
+            words = self.generator.generate(sum(requests[i][0] for i in unseeded),
+                                            np.random.default_rng())
+            position = 0
+            for i in unseeded:
+                results[i] = words[position:position + requests[i][0]]
+                position += requests[i][0]
+
+        for i, (count, seed) in enumerate(requests):
+            if seed is not None:
+                results[i] = self.generator.generate(count, np.random.default_rng(seed))
+        return results
+
+    def score(self, words, normalize):
+        ''' Return the log-likelihood of each word '''
+        return self.scorer.score(words, normalize=normalize).tolist()
+
+    def syllabify(self, words):
+        ''' Return the syllable shapes of each word '''
+        from syllable import syllabify_tokens
+        shapes = []
+        for word in words:
+            tokens, ids = zip(*self.tokenizer.scan(word)) if word else ((), ())
+            shapes.append(syllabify_tokens(tokens, ids, self.tokenizer.symbols)[1])
+        return shapes
+
+    def tokenize(self, words):
+        ''' Return the IPA tokens of each word '''
+        return self.tokenizer.tokenize_many(words)
+
+
+def _run(models, task):
+    ''' Call a Models method in a pool worker '''
+    method, args = task
+    return getattr(models, method)(*args)
+
+
+class Batcher():
+    '''
+    Merge concurrent requests to one endpoint into a single call
+
+    Attributes
+    ----------
+        function (callable) : Coroutine function taking a list of request
+            payloads and returning a list of results in the same order
+        delay (float) : Seconds to wait for more requests after the first
+        limit (int) : Maximum number of requests per batch
+    '''
+
+    def __init__(self, function, delay=0.002, limit=256):
+        self.function, self.delay, self.limit = function, delay, limit
+        self._queue = None
+        self._task = None
+
+    async def submit(self, payload):
+        ''' Queue a payload and wait for its result '''
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((payload, future))
+        return await future
+
+    async def _loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.delay
+            while len(batch) < self.limit:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            payloads, futures = zip(*batch)
+            try:
+                results = [(__, None) for __ in await self.function(list(payloads))]
+            except Exception as error:
+                # Retry one by one so a failing payload only fails its own request
+                results = [(None, error)] if len(batch) == 1 else \
+                          [await self._single(__) for __ in payloads]
+
+            for future, (result, error) in zip(futures, results):
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    async def _single(self, payload):
+        ''' Return the (result, error) of one payload run on its own '''
+        try:
+            return (await self.function([payload]))[0], None
+        except Exception as error:
+            return None, error
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+
+
+class Server():
+    '''
+    Asyncio HTTP/JSON server over warm Models
+
+    Attributes
+    ----------
+        models (Models) : Resources used in this process
+        workers (int) : Pool worker processes (0 runs everything in this process)
+        threshold (int) : Batches with more words than this run in the pool
+    '''
+
+    def __init__(self, models=None, workers=2, threshold=2048, delay=0.002):
+        self.models = models or Models()
+        self.workers, self.threshold = workers, threshold
+        self.pool = None
+        if workers:
+            self.pool = parallel.executor(self.models, workers)
+
+        self.batchers = {
+            '/generate': Batcher(self._generate, delay),
+            '/score': Batcher(self._score, delay),
+            '/syllabify': Batcher(self._words('syllabify', 'syllables'), delay),
+            '/tokenize': Batcher(self._words('tokenize', 'tokens'), delay),
+        }
+        self._server = None
+
+    def __repr__(self):
+        return f"Server( workers={self.workers}, threshold={self.threshold} )"
+
+    async def _call(self, size, method, *args):
+        ''' Run a Models method here, or in the pool if the batch is large '''
+        if self.pool is not None and size > self.threshold:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, parallel.call, _run, (method, args))
+        return getattr(self.models, method)(*args)
+
+    async def _generate(self, payloads):
+        requests = [(__.get('count', 1), __.get('seed')) for __ in payloads]
+        words = await self._call(sum(__ for __, _ in requests), 'generate', requests)
+        return [{'words': __} for __ in words]
+
+    async def _score(self, payloads):
+        # Requests are grouped by normalize so each group is one scorer call
+        results = [None] * len(payloads)
+        for normalize in (False, True):
+            group = [i for i, __ in enumerate(payloads) if bool(__.get('normalize')) == normalize]
+            if not group:
+                continue
+            words = [w for i in group for w in payloads[i]['words']]
+            scores = await self._call(len(words), 'score', words, normalize)
+            position = 0
+            for i in group:
+                count = len(payloads[i]['words'])
+                results[i] = {'scores': scores[position:position + count]}
+                position += count
+        return results
+
+    def _words(self, method, key):
+        ''' Return a batch function that flattens words and splits results '''
+        async def function(payloads):
+            words = [w for __ in payloads for w in __['words']]
+            values = await self._call(len(words), method, words)
+            results, position = [], 0
+            for payload in payloads:
+                count = len(payload['words'])
+                results.append({key: values[position:position + count]})
+                position += count
+            return results
+        return function
+
+    def validate(self, path, payload):
+        '''
+        Return a payload after checking it, so that one bad request cannot
+        fail the batch it would be merged into
+
+        Raises
+        ------
+            ValueError : If the payload does not match its endpoint
+        '''
+        if not isinstance(payload, dict):
+            raise ValueError('The body must be a JSON object')
+
+        if path == '/generate':
+            count, seed = payload.get('count', 1), payload.get('seed')
+            if isinstance(count, bool) or not isinstance(count, int) or not 0 < count <= LIMIT:
+                raise ValueError(f'"count" must be an integer from 1 to {LIMIT}')
+            if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int) or seed < 0):
+                raise ValueError('"seed" must be a non-negative integer')
+            return payload
+
+        words = payload.get('words')
+        if not isinstance(words, list) or not all(isinstance(__, str) for __ in words):
+            raise ValueError('"words" must be a list of IPA words')
+        return payload
+
+    @instrument()
+    async def dispatch(self, method, path, body):
+        '''
+        Return the status and JSON result of a request
+
+        Parameters
+        ----------
+            method (str) : HTTP method
+            path (str) : Endpoint path
+            body (bytes) : Request body
+        '''
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path not in self.batchers:
+            return 404, {'error': f'Unknown endpoint {path}'}
+        if method != 'POST':
+            return 405, {'error': 'Use POST with a JSON body'}
+
+        try:
+            payload = self.validate(path, json.loads(body or b'{}'))
+        except ValueError as error:
+            return 400, {'error': str(error)}
+
+        try:
+            return 200, await self.batchers[path].submit(payload)
+        except Exception as error:
+            return 500, {'error': f'{type(error).__name__}: {error}'}
+
+    async def _handle(self, reader, writer):
+        ''' Serve HTTP/1.1 requests on one connection until it closes '''
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, path, *__ = line.decode('latin-1').split()
+
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, __, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, result = await self.dispatch(method, path.split('?')[0], body)
+
+                data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+                writer.write(f'HTTP/1.1 {status} {STATUS[status]}\r\n'
+                             f'Content-Type: application/json; charset=utf-8\r\n'
+                             f'Content-Length: {len(data)}\r\n\r\n'.encode('latin-1') + data)
+                await writer.drain()
+
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8080):
+        ''' Start listening and return the asyncio server '''
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        ''' Listen until cancelled '''
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        ''' Stop the batchers, the listener and the pool '''
+        for batcher in self.batchers.values():
+            batcher.close()
+        if self._server is not None:
+            self._server.close()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve conlang generation over HTTP/JSON.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=2, help='Process pool size (0 to disable)')
+    parser.add_argument('--threshold', type=int, default=2048,
+                        help='Batches with more words than this run in the pool')
+    args = parser.parse_args(argv)
+
+    server = Server(workers=args.workers, threshold=args.threshold)
+    print(f'Serving {server} on http://{args.host}:{args.port}')
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
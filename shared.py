@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: shared.py
+# author: glenn abastillas
+# created: 2020-07-02
+# description: phonology and n-gram tables published once and shared by worker processes
+'''
+A parent process publishes compiled tables (encoder inventory, distance and
+coalescence tables, n-gram probability matrices) into one file. Workers map
+the file read-only, so every array is a zero-copy view on pages shared by all
+processes. Under /dev/shm (the default on Linux) the file lives in shared
+memory and never touches disk.
+
+    path = shared.publish(arrays={'bigrams': model.probabilities()})
+    with Pool(32, initializer=shared.initialize, initargs=(path,)) as pool:
+        ...  # in a worker: shared.attached().encoder(), shared.attached()['bigrams']
+    shared.unlink(path)
+
+Layout (little-endian)
+
+    header      magic b'CLSM', manifest size
+    manifest    UTF-8 JSON with the dtype, shape and offset of each array and
+                the metadata (symbols, feature names)
+    arrays      each aligned to 64 bytes
+
+The encoder, distance and coalescence objects are rebuilt from the published
+arrays and metadata alone, so an attached worker never imports sounds or
+parses the YAML resources.
+'''
+from profiling import instrument
+import json
+import mmap
+import numpy as np
+import os
+import struct
+import tempfile
+
+MAGIC = b'CLSM'
+HEADER = struct.Struct('<4sQ')
+ALIGNMENT = 64
+
+TABLES = None
+
+
+def _directory():
+    ''' Return /dev/shm if it exists, else the temporary directory '''
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def phonology_tables():
+    '''
+    Return the compiled phonology tables and their metadata
+
+    Returns
+    -------
+        Tuple of a dict of named arrays and a dict of metadata
+    '''
+    from coalescence import default_coalescence
+    from distance import PhoneticDistance
+    from soundarray import default_encoder, phonology
+
+    encoder, phon = default_encoder(), phonology()
+    coalescence = default_coalescence()
+
+    arrays = {
+        'encoder.inventory': encoder.inventory,
+        'encoder.table': encoder.table,
+        'encoder.known': encoder.known,
+        'distance.matrix': PhoneticDistance(encoder=encoder).matrix,
+        'coalescence.sizes': coalescence.sizes,
+        'coalescence.table': coalescence.table,
+        'coalescence.codes': coalescence._codes,
+        'coalescence.pairs': coalescence.pairs,
+    }
+    metadata = {
+        'symbols': encoder.symbols,
+        'consonants': coalescence.symbols,
+        'labels': phon.labels,
+        'features': phon.features,
+    }
+    return arrays, metadata
+
+
+@instrument()
+def publish(path=None, arrays=None, metadata=None, phonology=True):
+    '''
+    Write tables to a file that workers can attach to
+
+    Parameters
+    ----------
+        path (str) : Output file. Defaults to a new file under /dev/shm.
+        arrays (dict) : Extra named arrays (e.g., n-gram probability matrices)
+        metadata (dict) : Extra JSON-serializable metadata
+        phonology (bool) : Include the tables from `phonology_tables`
+
+    Returns
+    -------
+        Path of the published file
+    '''
+    tables, information = phonology_tables() if phonology else ({}, {})
+    tables.update(arrays or {})
+    information.update(metadata or {})
+
+    manifest, position = {}, 0
+    for name, array in tables.items():
+        array = tables[name] = np.ascontiguousarray(array)
+        position += -position % ALIGNMENT
+        manifest[name] = [array.dtype.str, list(array.shape), position]
+        position += array.nbytes
+
+    encoded = json.dumps({'arrays': manifest, 'metadata': information}).encode('utf-8')
+    start = HEADER.size + len(encoded)
+    start += -start % ALIGNMENT
+
+    if path is None:
+        descriptor, path = tempfile.mkstemp(prefix='conlang-', suffix='.tables', dir=_directory())
+        os.close(descriptor)
+
+    with open(path, 'wb') as fout:
+        fout.write(HEADER.pack(MAGIC, len(encoded)))
+        fout.write(encoded)
+        fout.write(b'\0' * (start - HEADER.size - len(encoded)))
+        for name, array in tables.items():
+            fout.seek(start + manifest[name][2])
+            fout.write(array.tobytes())
+
+    return path
+
+
+class SharedTables():
+    '''
+    Read-only, memory-mapped view of published tables. Arrays are not copied
+    and cannot be written to.
+
+    Attributes
+    ----------
+        path (str) : Published file
+        metadata (dict) : Published metadata
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a shared tables file.')
+
+        manifest = json.loads(self._map[HEADER.size:HEADER.size + size].decode('utf-8'))
+        start = HEADER.size + size
+        start += -start % ALIGNMENT
+
+        self.metadata = manifest['metadata']
+        self._tokenizer = None
+        self._arrays = {}
+        for name, (dtype, shape, offset) in manifest['arrays'].items():
+            count = int(np.prod(shape))
+            array = np.frombuffer(self._map, dtype=dtype, count=count, offset=start + offset)
+            self._arrays[name] = array.reshape(shape)
+
+    def __repr__(self):
+        return f"SharedTables( {self.path!r}, arrays={len(self._arrays)} )"
+
+    def __contains__(self, name):
+        return name in self._arrays
+
+    def __getitem__(self, name):
+        return self._arrays[name]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def names(self):
+        ''' Return the names of the published arrays '''
+        return list(self._arrays)
+
+    def encoder(self):
+        ''' Return an Encoder backed by the shared tables '''
+        from soundarray import Encoder
+        encoder = Encoder.__new__(Encoder)
+        encoder.symbols = self.metadata['symbols']
+        encoder.inventory = self['encoder.inventory']
+        encoder.table = self['encoder.table']
+        encoder.known = self['encoder.known']
+        return encoder
+
+    def distance(self, indel=1.0, tokenizer=None):
+        '''
+        Return a PhoneticDistance backed by the shared distance matrix
+
+        Parameters
+        ----------
+            indel (float) : Cost of inserting or deleting a sound
+            tokenizer (Tokenizer) : Tokenizer used to split IPA words. Defaults
+                to one over the published symbols.
+        '''
+        from distance import PhoneticDistance
+        from tokenizer import Tokenizer
+        if tokenizer is None:
+            if self._tokenizer is None:
+                self._tokenizer = Tokenizer(self.metadata['symbols'])
+            tokenizer = self._tokenizer
+
+        distance = PhoneticDistance.__new__(PhoneticDistance)
+        distance.tokenizer = tokenizer
+        distance.symbols = self.metadata['symbols']
+        distance.indel = float(indel)
+        distance.matrix = self['distance.matrix']
+        return distance
+
+    def coalescence(self):
+        ''' Return a Coalescence backed by the shared tables '''
+        from coalescence import Coalescence
+        coalescence = Coalescence.__new__(Coalescence)
+        coalescence.sizes = self['coalescence.sizes']
+        coalescence._bases = np.concatenate(([0], np.cumsum(coalescence.sizes ** 2)[:-1]))
+        coalescence.table = self['coalescence.table']
+        coalescence.symbols = self.metadata['consonants']
+        coalescence.index = {s: i for i, s in enumerate(coalescence.symbols)}
+        coalescence._codes = self['coalescence.codes']
+        coalescence.pairs = self['coalescence.pairs']
+        return coalescence
+
+    def close(self):
+        '''
+        Release the memory map and file
+
+        Notes
+        -----
+            If arrays from these tables are still referenced elsewhere, the
+            mapping stays open until they are garbage collected.
+        '''
+        self._arrays = {}
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+
+def attach(path):
+    ''' Map published tables read-only '''
+    return SharedTables(path)
+
+
+def initialize(path):
+    '''
+    Attach a worker process to published tables. Pass as the initializer of a
+    multiprocessing.Pool or ProcessPoolExecutor.
+
+    Parameters
+    ----------
+        path (str) : File returned by `publish`
+    '''
+    global TABLES
+    TABLES = attach(path)
+
+
+def attached():
+    ''' Return the tables this process attached with `initialize` '''
+    if TABLES is None:
+        raise RuntimeError('No shared tables attached; call shared.initialize first.')
+    return TABLES
+
+
+def unlink(path):
+    ''' Remove published tables. Attached workers keep their mapping. '''
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    path = publish(arrays={'example': np.arange(4)})
+    with attach(path) as tables:
+        print(tables, tables.names(), tables.encoder().encode(['pata']).codes.shape)
+    unlink(path)
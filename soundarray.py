@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: soundarray.py
+# author: glenn abastillas
+# created: 2020-06-20
+# description: array representation of many sounds as feature codes
+from functools import lru_cache
+from profiling import instrument
+import numpy as np
+
+# sounds (and its YAML resources) is imported only where it is needed, so
+# arrays and encoders rebuilt from shared tables never load it
+
+UNSET = -1
+
+
+@lru_cache(maxsize=None)
+def phonology():
+    ''' Return the features of phonology.yaml (sounds.PHON), loaded on first use '''
+    from sounds import PHON
+    return PHON
+
+
+def sound_codes(sound):
+    '''
+    Return the feature codes of a Sound as an int8 array ordered by PHON.labels
+
+    Parameters
+    ----------
+        sound (Sound) : Sound, Consonant or Vowel to encode
+
+    Notes
+    -----
+        Each code is the index of the feature value in phonology.yaml, or
+        UNSET (-1) if the sound does not define that feature.
+    '''
+    features = sound._features
+    codes = features.argmax(axis=1).astype(np.int8)
+    codes[features.sum(axis=1) == 0] = UNSET
+    return codes
+
+
+def vowel_mask(codes):
+    '''
+    Return whether each row of feature codes is a vowel
+
+    Notes
+    -----
+        Only vowels set openness. Manner alone cannot tell them apart because
+        nasals such as ŋ leave it unset as well.
+    '''
+    return np.asarray(codes)[..., phonology().labels.index('openness')] != UNSET
+
+
+class SoundArray():
+    '''
+    Feature codes for many sounds stored as an (N, features) int8 matrix, with
+    word boundaries kept as an offsets array.
+
+    Attributes
+    ----------
+        codes (np.array) : Feature codes with one row per sound and one column
+            per feature in PHON.labels. Unset features are -1.
+        offsets (np.array) : Word k spans codes[offsets[k]:offsets[k + 1]]
+    '''
+
+    def __init__(self, codes, offsets=None):
+        codes = np.asarray(codes, dtype=np.int8)
+        if codes.ndim != 2:
+            codes = codes.reshape(-1, len(phonology().labels))
+        self.codes = codes
+
+        if offsets is None:
+            offsets = [0, len(self.codes)]
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    def __repr__(self):
+        return f"SoundArray( sounds={len(self)}, words={self.words} )"
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    def __getitem__(self, index):
+        ''' Return the feature codes of a sound or a slice of sounds '''
+        return self.codes[index]
+
+    def __eq__(self, other):
+        return (np.array_equal(self.codes, other.codes) and
+                np.array_equal(self.offsets, other.offsets))
+
+    @property
+    def words(self):
+        ''' Return the number of words in this array '''
+        return self.offsets.size - 1
+
+    @property
+    def lengths(self):
+        ''' Return the number of sounds in each word '''
+        return np.diff(self.offsets)
+
+    def word(self, index):
+        ''' Return the SoundArray of a single word '''
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return SoundArray(self.codes[start:end])
+
+    def feature(self, feature):
+        '''
+        Return the column of codes for one feature
+
+        Parameters
+        ----------
+            feature (str, int) : Feature name (e.g., place) or index
+        '''
+        if isinstance(feature, str):
+            feature = phonology().labels.index(feature)
+        return self.codes[:, feature]
+
+    @classmethod
+    def from_sounds(cls, sounds, offsets=None):
+        ''' Return a SoundArray encoding a list of Sound objects '''
+        codes = [sound_codes(__) for __ in sounds]
+        return cls(np.array(codes).reshape(-1, len(phonology().labels)), offsets)
+
+    def to_sounds(self):
+        ''' Return this array as a list of Consonant and Vowel objects '''
+        from sounds import Consonant, Vowel
+        sounds = []
+
+        for row, vowel in zip(self.codes, vowel_mask(self.codes)):
+            sound = Vowel() if vowel else Consonant()
+            sound._reset_feature()
+            for i, code in enumerate(row):
+                if code != UNSET:
+                    sound._features[i, code] = 1
+            sounds.append(sound)
+
+        return sounds
+
+
+class Encoder():
+    '''
+    Encode IPA words into SoundArrays through lookup tables derived once from
+    sounds.yaml.
+
+    Attributes
+    ----------
+        symbols (list) : sounds.yaml characters in tokenizer id order
+        inventory (np.array) : Feature codes of each symbol with shape
+            (symbols + 1, features). The last row encodes unknown sounds.
+        table (np.array) : Feature codes indexed directly by codepoint
+        known (np.array) : Whether each codepoint in table is a known sound
+    '''
+
+    @instrument()
+    def __init__(self):
+        from sounds import SNDS, Consonant, Vowel
+        labels = phonology().labels
+        vowels = {__.character for __ in SNDS.vowel}
+        entries = {}
+
+        for entry in SNDS.vowel + SNDS.consonant:
+            entries.setdefault(entry.character, entry)
+
+        self.symbols = list(entries)
+
+        rows = []
+        for character, entry in entries.items():
+            kind = Vowel if character in vowels else Consonant
+            rows.append(sound_codes(kind(*entry.name.split())))
+        rows.append(np.full(len(labels), UNSET, dtype=np.int8))
+
+        self.inventory = np.array(rows, dtype=np.int8)
+
+        codepoints = np.array([ord(__) for __ in self.symbols])
+        unknown = codepoints.max() + 1
+
+        self.known = np.zeros(unknown + 1, dtype=bool)
+        self.known[codepoints] = True
+
+        self.table = np.full((unknown + 1, len(labels)), UNSET, dtype=np.int8)
+        self.table[codepoints] = self.inventory[:-1]
+
+    def __repr__(self):
+        return f"Encoder( symbols={len(self.symbols)} )"
+
+    def codepoints(self, lines):
+        '''
+        Return a corpus as a flat codepoint array with newline separators
+
+        Parameters
+        ----------
+            lines (iterable) : IPA words, one per item
+        '''
+        text = '\n'.join(__.strip() for __ in lines)
+        return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+    @instrument()
+    def encode(self, lines, drop_unknown=True):
+        '''
+        Encode a corpus of IPA words into a SoundArray
+
+        Parameters
+        ----------
+            lines (iterable, str) : IPA words, one per item, or a single word
+            drop_unknown (bool) : Remove characters that are not sounds (e.g.,
+                stress marks, diacritics) instead of encoding them as unset rows
+
+        Notes
+        -----
+            The whole corpus is converted to one codepoint array and mapped to
+            feature codes with a single np.take through a codepoint table.
+        '''
+        if isinstance(lines, str):
+            lines = [lines]
+
+        codepoints = self.codepoints(lines)
+        codepoints = np.minimum(codepoints, self.known.size - 1)
+
+        newline = codepoints == ord('\n')
+        keep = ~newline
+        if drop_unknown:
+            keep &= np.take(self.known, codepoints)
+
+        kept = np.concatenate(([0], np.cumsum(keep)))
+        boundaries = np.flatnonzero(newline)
+        offsets = np.concatenate(([0], kept[boundaries], [kept[-1]]))
+
+        codes = np.take(self.table, codepoints[keep], axis=0)
+        return SoundArray(codes, offsets)
+
+    @instrument()
+    def encode_ids(self, ids, offsets=None):
+        '''
+        Encode tokenizer ids (see Tokenizer.tokenize_many) into a SoundArray
+
+        Parameters
+        ----------
+            ids (np.array) : Token ids from the default tokenizer
+            offsets (np.array) : Word boundaries of ids
+        '''
+        ids = np.minimum(np.asarray(ids), len(self.inventory) - 1)
+        return SoundArray(np.take(self.inventory, ids, axis=0), offsets)
+
+
+@lru_cache(maxsize=None)
+def default_encoder():
+    ''' Return the shared encoder built from sounds.yaml '''
+    return Encoder()
+
+
+def encode(lines, drop_unknown=True):
+    ''' Encode IPA words into a SoundArray with the default encoder '''
+    return default_encoder().encode(lines, drop_unknown)
+
+
+if __name__ == '__main__':
+    array = encode(['ʃip', 'ˈbaʤ'])
+    print(array, array.offsets)
+    print(array.to_sounds())
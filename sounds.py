@@ -6,7 +6,9 @@
 # description: classes and functions to represent and manipulate phonemes
 import numpy as np
 from resource import SoundsResource, PhonologyResource
-import math, random
+from profiling import instrument
+import random
+import struct
 
 PHON = PhonologyResource()
 SNDS = SoundsResource()
@@ -18,14 +20,136 @@ KEYR = [enumerate(__) for __ in PHON.features]
 ATTRIBUTES = {a: dict(b) for a, b in zip(PHON.labels, KEYS)}
 ATTRIBUTER = {a: dict(b) for a, b in zip(PHON.labels, KEYR)}
 
-def analyze_sound_probabilities():
-    from nltk import ConditionalFreqDist, ConditionalProbDist, ELEProbDist
-    from nltk import bigrams
-    cfd = ConditionalFreqDist()
-    data = [gram for __ in SNDS.consonant for gram in bigrams(__.name.split())]
-    for gram in data:
-        cfd[gram[0]][gram[1]] += 1
-    return ConditionalProbDist(cfd, ELEProbDist)
+# Compact serialization: each feature code + 1 (0 = unset) in one nibble
+MAGIC = b'CLSN'
+HEADER = struct.Struct('<4sQ')
+PACKED = (len(PHON.labels) + 1) // 2
+KINDS = ('Sound', 'Consonant', 'Vowel')
+STATE = ('rows', 'columns', '_features', '_ipa', '_character')
+HAS_IPA, HAS_CHARACTER = 4, 8
+
+
+def _pack(codes):
+    ''' Return (N, features) codes as (N, PACKED) bytes of nibbles '''
+    nibbles = np.zeros((codes.shape[0], PACKED * 2), dtype=np.uint8)
+    nibbles[:, :codes.shape[1]] = codes + 1
+    return (nibbles[:, 0::2] << 4) | nibbles[:, 1::2]
+
+
+def _unpack(packed):
+    ''' Return (N, PACKED) bytes of nibbles as (N, features) codes '''
+    nibbles = np.empty((packed.shape[0], PACKED * 2), dtype=np.int8)
+    nibbles[:, 0::2], nibbles[:, 1::2] = packed >> 4, packed & 15
+    return nibbles[:, :len(PHON.labels)] - 1
+
+
+def _features(codes):
+    ''' Return one-hot feature matrices of shape (N, rows, columns) from codes '''
+    rows, columns = len(PHON.features), max([len(__) for __ in PHON.features])
+    features = np.zeros((codes.shape[0], rows, columns))
+    n, feature = np.nonzero(codes >= 0)
+    features[n, feature, codes[n, feature]] = 1
+    return features
+
+
+def _restore(cls):
+    ''' Return an uninitialized sound for unpickling (see Sound.__reduce__) '''
+    return cls.__new__(cls)
+
+
+@instrument()
+def to_bytes(sounds):
+    '''
+    Serialize a list of sounds to a compact byte string
+
+    Parameters
+    ----------
+        sounds (list) : Sound, Consonant and Vowel objects
+
+    Raises
+    ------
+        TypeError : If a sound is of another class (e.g., Syllable), whose
+            extra attributes this format cannot hold. Pickle those instead.
+
+    Notes
+    -----
+        Each sound takes one kind byte and six bytes of feature codes, plus
+        its ipa and character strings when they are set.
+    '''
+    from soundarray import sound_codes
+    sounds = list(sounds)
+    classes = (Sound, Consonant, Vowel)
+    for sound in sounds:
+        if type(sound) not in classes:
+            raise TypeError(f'Cannot serialize {type(sound).__name__} to bytes; pickle it instead.')
+
+    codes = np.array([sound_codes(__) for __ in sounds], dtype=np.int8).reshape(-1, len(PHON.labels))
+
+    kinds = np.zeros(len(sounds), dtype=np.uint8)
+    strings = []
+    for i, sound in enumerate(sounds):
+        kinds[i] = classes.index(type(sound))
+        if sound._ipa is not None:
+            kinds[i] |= HAS_IPA
+            strings.append(sound._ipa)
+        if sound._character is not None:
+            kinds[i] |= HAS_CHARACTER
+            strings.append(sound._character)
+
+    return b''.join((HEADER.pack(MAGIC, len(sounds)), kinds.tobytes(),
+                     _pack(codes).tobytes(), '\0'.join(strings).encode('utf-8')))
+
+
+@instrument()
+def from_bytes(data):
+    '''
+    Restore a list of sounds serialized with `to_bytes` without parsing
+    feature names
+
+    Parameters
+    ----------
+        data (bytes) : Output of to_bytes
+    '''
+    magic, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError('Data is not a serialized list of sounds.')
+
+    position = HEADER.size
+    kinds = np.frombuffer(data, dtype=np.uint8, count=count, offset=position)
+    position += count
+    packed = np.frombuffer(data, dtype=np.uint8, count=count * PACKED, offset=position)
+    position += count * PACKED
+
+    features = _features(_unpack(packed.reshape(count, PACKED)))
+    strings = iter(data[position:].decode('utf-8').split('\0'))
+    classes = {'Sound': Sound, 'Consonant': Consonant, 'Vowel': Vowel}
+
+    sounds = []
+    for kind, matrix in zip(kinds.tolist(), features):
+        sound = _restore(classes[KINDS[kind & 3]])
+        sound.rows, sound.columns = matrix.shape
+        sound._features = matrix
+        sound._ipa = next(strings) if kind & HAS_IPA else None
+        sound._character = next(strings) if kind & HAS_CHARACTER else None
+        sounds.append(sound)
+
+    return sounds
+
+
+@instrument()
+def analyze_sound_probabilities(estimator='ele'):
+    '''
+    Return the probability of each consonant feature name given the previous
+    one (e.g., stop given bilabial) as a ProbabilityModel
+
+    Parameters
+    ----------
+        estimator (str) : Smoothing estimator (see probability.ESTIMATORS)
+    '''
+    from probability import ConditionalCounts, bigrams
+    counts = ConditionalCounts()
+    counts.update(gram for __ in SNDS.consonant for gram in bigrams(__.name.split()))
+    return counts.probabilities(estimator)
 
 
 class Sound(object):
@@ -48,6 +172,7 @@ class Sound(object):
 
     '''
 
+    @instrument()
     def __init__(self, *features, **kwargs):
         """
         Initialize this sound class with positional arguments describing the
@@ -103,35 +228,39 @@ class Sound(object):
 
         return "{}({})".format(label, attributes)
 
+    @instrument()
     def __add__(self, sound):
         ''' Order of addition: voiced > voiceless, stop + fricative == affricate '''
+        from coalescence import coalesce
+        from soundarray import UNSET, sound_codes
 
-        average = lambda x, y : math.floor(0.5 * (x + y))
-
-        is_stop = lambda x, y : x < 3 or y < 3
-        is_fric = lambda x, y : x > 2 or y > 2
-        both_present = lambda x, y : is_stop(x, y) and is_fric(x, y)
-
-        voicing = min(sound.voicing, self.voicing)
-        place = average(sound.place, self.place)
-        manner = 3 if both_present else self.manner
+        codes = coalesce(sound_codes(self), sound_codes(sound))
 
+        combined = Sound()
+        for i, code in enumerate(codes):
+            if code != UNSET:
+                combined._features[i, code] = 1
 
-        # is_stop = sound.manner in stop or self.manner in stop
-        # is_fricative = sound.manner in fricative or self.manner in fricative
+        return combined
 
-        # if is_stop and is_fricative:
-        #     manner = 3
-
-        # [TO BE DEVELOPED] Add code to adopt other sound attrs from current
-        basic = ['voicing', 'place', 'manner']
-        labels = list(filter(lambda x : x not in basic, PHON.labels))
+    def __getstate__(self):
+        '''
+        Return this sound's packed feature codes, orthography and any other
+        attributes (e.g., the onset, nucleus and coda of a Syllable)
+        '''
+        from soundarray import sound_codes
+        extra = {k: v for k, v in self.__dict__.items() if k not in STATE}
+        return _pack(sound_codes(self)[None]).tobytes(), self._ipa, self._character, extra
 
-        other_features = [(__, getattr(self, __)) for __ in labels if __ ]
+    def __setstate__(self, state):
+        packed, self._ipa, self._character, extra = state
+        codes = _unpack(np.frombuffer(packed, dtype=np.uint8)[None])
+        self._features = _features(codes)[0]
+        self.rows, self.columns = self._features.shape
+        self.__dict__.update(extra)
 
-        return Sound(ATTRIBUTER['voicing'][voicing],
-                     ATTRIBUTER['place'][place],
-                     ATTRIBUTER['manner'][manner])
+    def __reduce__(self):
+        return _restore, (type(self),), self.__getstate__()
 
     def __get_rows_and_columns(self):
         return len(PHON.features), max([len(__) for __ in PHON.features])
@@ -354,6 +483,7 @@ class Sound(object):
         '''
         return features
 
+    @instrument()
     def _parse(self, *features, return_=False):
         '''
         Configure this sound's feature matrix with specified input features
@@ -390,6 +520,7 @@ class Sound(object):
         if return_:
             return matrix
 
+    @instrument()
     def _parse_letter(self, character):
         '''
         Set this sounds properties from the phonology file's set of sounds.
@@ -497,6 +628,7 @@ class Sound(object):
             return features[value]
         return PHON.labels[feature]
 
+    @instrument()
     def weaken(self, feature):
         '''
         Weaken the specified feature by moving the feature away from zero.
@@ -509,6 +641,7 @@ class Sound(object):
         argmax, array = self._get_argmax_array(idx, array, 1)
         self._update_feature(idx, argmax, array)
 
+    @instrument()
     def strengthen(self, feature):
         '''
         Strengthen the specified feature by move the feature closer to zero.
@@ -521,7 +654,8 @@ class Sound(object):
         argmax, array = self._get_argmax_array(idx, array, -1)
         self._update_feature(idx, argmax, array)
 
-    def randomize(self, kind='c', data=None):
+    @instrument()
+    def randomize(self, kind='c', data=None, rng=None):
         '''
         Generate a random configuration of settings 
         
@@ -529,6 +663,8 @@ class Sound(object):
         ----------
             kind (str) : c for consonant or v for vowel
             data (str) : path to distribution data for phonemes
+            rng (np.random.Generator) : Random number generator to use instead
+                of the global random module
         
         Notes
         -----
@@ -543,7 +679,11 @@ class Sound(object):
             raise NotImplementedError()
             
 
-        ignore = random.choice([VSF, CSF])
+        choice = random.choice
+        if rng is not None:
+            choice = lambda values : values[rng.integers(len(values))]
+
+        ignore = choice([VSF, CSF])
 
         if isinstance(kind, str):
             if kind.startswith('v'):
@@ -554,11 +694,12 @@ class Sound(object):
 
         for i, feature in enumerate(PHON.labels[:-1]):
             if feature not in ignore:
-                value = random.choice(PHON.features[i])
+                value = choice(PHON.features[i])
                 self._set_feature(feature, value)
         
         self._set_feature('airway', 'egressive')
     
+    @instrument()
     def orthography(self, kind='c'):
         ''' 
         Return an orthographical representation of this sound. 
@@ -568,20 +709,10 @@ class Sound(object):
             kind (str) : c for consonant or v for vowel
         '''
 
-        attr = [self.encode(__) for __ in CSF]
+        from distance import nearest_sound
 
-        if kind.lower().startswith('v'):
-            *__, [attr] = [self.encode(__) for __ in VSF]
-        
-        this = self._features[attr]
-
-        for consonant in SNDS.consonant:
-            features = self._parse(consonant.name, return_=True)[attr]
-
-            if (this == features).all():
-                return consonant.character
-        else:
-            return ' '
+        kind = 'v' if kind.lower().startswith('v') else 'c'
+        return nearest_sound(kind).query(self)
 
 
 class Consonant(Sound):
@@ -619,6 +750,7 @@ class Consonant(Sound):
     def set(self, *features, **kwargs):
         self.__init__(*features, **kwargs)
 
+    @instrument()
     def weaken(self, intensify=False):
         '''
         Weaken this consonant like when a consonant undergoes lenition
@@ -640,6 +772,7 @@ class Consonant(Sound):
 
         self.__default()
 
+    @instrument()
     def strengthen(self, intensify=False):
         '''
         Strengthen this consonant like when a consonant undergoes lenition
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: storage.py
+# author: glenn abastillas
+# created: 2020-06-26
+# description: binary on-disk lexicon format with memory-mapped random access
+'''
+Layout (little-endian, every section aligned to 8 bytes)
+
+    header      magic b'CLEX', version, flags, word count, sound count,
+                feature count and a table of (offset, size) for each section
+    forms       UTF-8 heap of every form
+    form_index  uint64[count + 1] offsets into the form heap
+    sounds      uint64[count + 1] offsets into the codes rows
+    codes       int8[sounds, features] SoundArray feature codes
+    glosses     UTF-8 heap of every gloss (optional)
+    gloss_index uint64[count + 1] offsets into the gloss heap (optional)
+    hashes      uint64[count] sorted 64-bit form hashes
+    order       uint64[count] entry index of each sorted hash
+'''
+from hashlib import blake2b
+from profiling import instrument
+from soundarray import SoundArray, default_encoder
+import mmap
+import numpy as np
+import struct
+
+MAGIC = b'CLEX'
+VERSION = 1
+GLOSSES = 1
+
+SECTIONS = ('forms', 'form_index', 'sounds', 'codes',
+            'glosses', 'gloss_index', 'hashes', 'order')
+
+HEADER = struct.Struct('<4sHHQQH6x')
+TABLE = struct.Struct('<' + 'QQ' * len(SECTIONS))
+
+
+def form_hash(form):
+    ''' Return a stable 64-bit hash of a form '''
+    return int.from_bytes(blake2b(form.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _heap(strings):
+    ''' Return a UTF-8 heap and its offsets for a list of strings '''
+    encoded = [__.encode('utf-8') for __ in strings]
+    lengths = np.fromiter((len(__) for __ in encoded), dtype=np.uint64, count=len(encoded))
+    offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.uint64)
+    return b''.join(encoded), offsets
+
+
+@instrument()
+def write(path, forms, glosses=None, sounds=None):
+    '''
+    Write a lexicon in the binary format
+
+    Parameters
+    ----------
+        path (str) : Output file
+        forms (list) : IPA form of each word
+        glosses (list) : Gloss of each word, if any
+        sounds (SoundArray) : Encoded forms. Defaults to encoding forms.
+
+    Raises
+    ------
+        ValueError : If sounds does not hold one word per form
+    '''
+    forms = list(forms)
+    if sounds is None:
+        encoder = default_encoder()
+        sounds = encoder.encode(forms) if forms else \
+            SoundArray(np.zeros((0, encoder.inventory.shape[1]), dtype=np.int8), [0])
+
+    if sounds.words != len(forms):
+        raise ValueError(f'Expected sounds for {len(forms)} words, got {sounds.words}.')
+
+    heap, form_index = _heap(forms)
+    hashes = np.fromiter((form_hash(__) for __ in forms), dtype=np.uint64, count=len(forms))
+    order = np.argsort(hashes, kind='stable').astype(np.uint64)
+
+    sections = {
+        'forms': heap,
+        'form_index': form_index.tobytes(),
+        'sounds': sounds.offsets.astype(np.uint64).tobytes(),
+        'codes': np.ascontiguousarray(sounds.codes, dtype=np.int8).tobytes(),
+        'glosses': b'',
+        'gloss_index': b'',
+        'hashes': hashes[order].tobytes(),
+        'order': order.tobytes(),
+    }
+
+    flags = 0
+    if glosses is not None:
+        flags |= GLOSSES
+        heap, gloss_index = _heap([__ or '' for __ in glosses])
+        sections['glosses'], sections['gloss_index'] = heap, gloss_index.tobytes()
+
+    position = HEADER.size + TABLE.size
+    table, padded = [], []
+    for name in SECTIONS:
+        data = sections[name]
+        padding = -position % 8
+        position += padding
+        table.extend((position, len(data)))
+        padded.append(b'\0' * padding + data)
+        position += len(data)
+
+    with open(path, 'wb') as fout:
+        fout.write(HEADER.pack(MAGIC, VERSION, flags, len(forms),
+                               len(sounds), sounds.codes.shape[1]))
+        fout.write(TABLE.pack(*table))
+        for data in padded:
+            fout.write(data)
+
+
+def save_lexicon(path, lexicon):
+    '''
+    Write a Lexicon (see Conlang.py) without its removed entries
+
+    Parameters
+    ----------
+        path (str) : Output file
+        lexicon (Lexicon) : Lexicon to save
+    '''
+    entries = lexicon.entries
+    forms = [lexicon.forms[__] for __ in entries]
+    glosses = [lexicon.glosses[__] for __ in entries]
+    write(path, forms, glosses, lexicon.sounds)
+
+
+class LexiconFile():
+    '''
+    Read-only, memory-mapped view of a binary lexicon. Arrays are views on the
+    mapping, so lookups only touch the pages they need and the pages are shared
+    between processes that open the same file.
+
+    Attributes
+    ----------
+        codes (np.array) : Feature codes of every sound
+        sounds (np.array) : Offsets of each word into codes
+        hashes (np.array) : Sorted form hashes
+        order (np.array) : Entry index of each sorted hash
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, flags, count, sounds, features = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a conlang lexicon file.')
+        if version > VERSION:
+            raise ValueError(f'{path} uses unsupported lexicon version {version}.')
+
+        table = TABLE.unpack_from(self._map, HEADER.size)
+        self._sections = {n: (table[2 * i], table[2 * i + 1]) for i, n in enumerate(SECTIONS)}
+
+        self.count, self.features, self.flags = count, features, flags
+
+        self._form_index = self._array('form_index', np.uint64)
+        self.sounds = self._array('sounds', np.uint64)
+        self.codes = self._array('codes', np.int8).reshape(sounds, features)
+        self.hashes = self._array('hashes', np.uint64)
+        self.order = self._array('order', np.uint64)
+        self._gloss_index = self._array('gloss_index', np.uint64) if flags & GLOSSES else None
+
+    def __repr__(self):
+        return f"LexiconFile( {self.path!r}, words={self.count} )"
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, form):
+        return self.index(form) is not None
+
+    def __getitem__(self, index):
+        return self.form(index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _array(self, name, dtype):
+        ''' Return a zero-copy array over a section of the mapping '''
+        offset, size = self._sections[name]
+        return np.frombuffer(self._map, dtype=dtype, count=size // np.dtype(dtype).itemsize,
+                             offset=offset)
+
+    def _string(self, section, index, offsets):
+        ''' Decode one string from a heap '''
+        start = self._sections[section][0]
+        return self._map[start + int(offsets[index]):start + int(offsets[index + 1])].decode('utf-8')
+
+    def form(self, index):
+        ''' Return the form of an entry '''
+        return self._string('forms', index, self._form_index)
+
+    def gloss(self, index):
+        ''' Return the gloss of an entry, or None if the file has no glosses '''
+        if self._gloss_index is None:
+            return None
+        return self._string('glosses', index, self._gloss_index) or None
+
+    def word(self, index):
+        ''' Return the feature codes of an entry '''
+        return self.codes[int(self.sounds[index]):int(self.sounds[index + 1])]
+
+    def index(self, form):
+        '''
+        Return the entry index of a form, or None
+
+        Notes
+        -----
+            A binary search over the sorted hashes touches O(log n) pages and
+            candidates are confirmed against the stored form.
+        '''
+        value = np.uint64(form_hash(form))
+        position = int(np.searchsorted(self.hashes, value))
+
+        while position < self.count and self.hashes[position] == value:
+            entry = int(self.order[position])
+            if self.form(entry) == form:
+                return entry
+            position += 1
+
+        return None
+
+    def forms(self):
+        ''' Yield every form in entry order '''
+        for index in range(self.count):
+            yield self.form(index)
+
+    def sound_array(self):
+        ''' Return every word's feature codes as a SoundArray view '''
+        array = SoundArray.__new__(SoundArray)
+        array.codes, array.offsets = self.codes, self.sounds.astype(np.int64)
+        return array
+
+    def close(self):
+        '''
+        Release the memory map and file
+
+        Notes
+        -----
+            If arrays returned by this file are still referenced elsewhere, the
+            mapping stays open until they are garbage collected.
+        '''
+        for name in ('_form_index', 'sounds', 'codes', 'hashes', 'order', '_gloss_index'):
+            setattr(self, name, None)
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+
+def load(path):
+    ''' Open a binary lexicon for memory-mapped reading '''
+    return LexiconFile(path)
+
+
+if __name__ == '__main__':
+    write('/tmp/example.lex', ['pata', 'kina'], ['water', 'fire'])
+    with load('/tmp/example.lex') as lexicon:
+        print(lexicon, lexicon.index('kina'), lexicon.gloss(1), lexicon.word(0))
@@ -1,7 +1,14 @@
 from resource import SoundsResource
 from sounds import Sound, Consonant, Vowel
+from profiling import instrument
+from tokenizer import STRESS
+from collections import Counter
+import numpy as np
+import re
+import unicodedata
 
 SNDS = SoundsResource()
+VOWELS = set(SNDS.ipa.vowels)
 
 
 class Mora():
@@ -71,16 +78,324 @@ class Syllable(Sound, Mora):
         self.rhyme = self.nucleus + self.coda
         self.syllable = self.body + self.coda
 
-    def random_representation(self):
+    @instrument()
+    def random_representation(self, rng=None):
         ''' IN DEVELOPMENT USE WITH SOUNDS.YAML '''
 
         if self.syllable:
             representation = []
             for syllable in self.syllable:
-                syllable.randomize()
+                syllable.randomize(rng=rng)
                 representation.append(syllable.orthography())
             return ''.join(representation)
 
+    @classmethod
+    def sample(cls, statistics, rng=None):
+        '''
+        Return a syllable whose shape is drawn from corpus statistics
+
+        Parameters
+        ----------
+            statistics (SyllableStatistics) : Shape frequencies to draw from
+            rng (np.random.Generator) : Random number generator to use
+        '''
+        return cls(statistics.sample(rng=rng))
+
+
+@instrument()
+def syllabify(pattern):
+    '''
+    Split a consonant/vowel pattern into syllable shapes using the maximal
+    onset principle: a single intervocalic consonant opens the next syllable
+    and longer clusters leave their first consonant in the preceding coda.
+
+    Parameters
+    ----------
+        pattern (str) : Word pattern of C and V characters (e.g., CVCCVC)
+
+    Returns
+    -------
+        Tuple of syllable shapes (e.g., ['CVC', 'CVC']) and a string of slot
+        labels (O for onset, N for nucleus, C for coda) aligned to pattern.
+        Patterns without a vowel return ([], '').
+    '''
+    nuclei = [__.span() for __ in re.finditer('V+', pattern)]
+
+    if not nuclei:
+        return [], ''
+
+    bounds = [0]
+    for (_, end), (start, _) in zip(nuclei, nuclei[1:]):
+        cluster = start - end
+        bounds.append(end + (cluster > 1))
+    bounds.append(len(pattern))
+
+    shapes, slots = [], []
+    for (left, right), (start, end) in zip(zip(bounds, bounds[1:]), nuclei):
+        shapes.append(pattern[left:right])
+        slots.append('O' * (start - left) + 'N' * (end - start) + 'C' * (right - end))
+
+    return shapes, ''.join(slots)
+
+
+def syllabify_tokens(tokens, ids, symbols):
+    '''
+    Split a tokenized word into syllables. Tokens are classed by the canonical
+    symbol of their id, so long and marked vowels (e.g., aː, ã) are nuclei.
+    A stress mark starts a new syllable and the stretches between marks are
+    split with syllabify. A stretch without a vowel joins the syllable before
+    it, or the next one at the start of a word.
+
+    Parameters
+    ----------
+        tokens (list) : Token strings of a word (e.g., from Tokenizer.tokenize)
+        ids (iterable) : Token ids aligned to tokens
+        symbols (list) : Canonical symbols indexed by id (e.g., Tokenizer.symbols)
+
+    Returns
+    -------
+        Tuple of syllable strings, stress marks included (e.g., ['bi', 'ˈlo']),
+        and their shapes (e.g., ['CV', 'CV']). Words without a vowel return
+        ([], []).
+    '''
+    pattern = ['.' if __[:1] in STRESS else
+               'V' if i < len(symbols) and symbols[i] in VOWELS else 'C'
+               for __, i in zip(tokens, ids)]
+
+    # Stretches of token positions, each starting at a stress mark after the first
+    marks = [i for i, __ in enumerate(pattern) if __ == '.' and i > 0]
+    stretches = []
+    for start, end in zip([0] + marks, marks + [len(pattern)]):
+        if stretches and ('V' not in pattern[start:end] or
+                          'V' not in pattern[stretches[-1][0]:stretches[-1][1]]):
+            stretches[-1][1] = end
+        else:
+            stretches.append([start, end])
+
+    syllables, shapes = [], []
+    for start, end in stretches:
+        sounds = [i for i in range(start, end) if pattern[i] != '.']
+        parts = syllabify(''.join(pattern[i] for i in sounds))[0]
+        if not parts:
+            continue
+        bounds = np.cumsum([len(__) for __ in parts[:-1]], dtype=int)
+        lefts = [start] + [sounds[__] for __ in bounds]
+        rights = lefts[1:] + [end]
+        syllables += [''.join(tokens[a:b]) for a, b in zip(lefts, rights)]
+        shapes += parts
+
+    return syllables, shapes
+
+
+class SyllableStatistics():
+    '''
+    Syllable shape frequencies and per-slot phoneme distributions counted over
+    a corpus of IPA words, stored as arrays and served through a weighted
+    sampler.
+
+    Attributes
+    ----------
+        shapes (list) : Syllable shapes observed in the corpus (e.g., CVC)
+        shape_counts (np.array) : Frequency of each shape
+        symbols (list) : Phoneme characters observed in the corpus
+        slot_counts (np.array) : Frequency of each symbol per slot with shape
+            (3, symbols) ordered onset, nucleus, coda
+        skipped (int) : Number of words without a vowel nucleus
+    '''
+
+    SLOTS = ('onset', 'nucleus', 'coda')
+
+    def __init__(self, shapes, shape_counts, symbols, slot_counts, skipped=0):
+        self.shapes = list(shapes)
+        self.shape_counts = np.asarray(shape_counts, dtype=np.int64)
+        self.symbols = list(symbols)
+        self.slot_counts = np.asarray(slot_counts, dtype=np.int64)
+        self.skipped = int(skipped)
+
+        self._shape_cdf = self._cdf(self.shape_counts)
+        self._slot_cdf = [self._cdf(__) for __ in self.slot_counts]
+
+    def __repr__(self):
+        return f"SyllableStatistics( shapes={len(self.shapes)}, symbols={len(self.symbols)} )"
+
+    def _cdf(self, counts):
+        ''' Return the normalized cumulative distribution of counts '''
+        total = counts.sum()
+        if not total:
+            return np.zeros(counts.size)
+        return np.cumsum(counts) / total
+
+    def _draw(self, cdf, size, rng):
+        ''' Draw indices from a cumulative distribution '''
+        rng = rng if rng is not None else np.random.default_rng()
+        return np.searchsorted(cdf, rng.random(size), side='right').clip(max=cdf.size - 1)
+
+    @classmethod
+    @instrument()
+    def from_corpus(cls, lines):
+        '''
+        Count syllable shapes and slot phonemes over an iterable of IPA words
+
+        Parameters
+        ----------
+            lines (iterable) : IPA words, one per item (e.g., an open file)
+
+        Raises
+        ------
+            ValueError : No word in lines has a vowel nucleus
+
+        Notes
+        -----
+            Characters listed as vowels in sounds.yaml are nuclei; any other
+            letter is treated as a consonant. Diacritics, stress and length
+            marks are ignored. Each distinct word pattern (e.g., CVCCV) is
+            syllabified once and per-phoneme counts are gathered in a single
+            NumPy pass over the whole corpus.
+        '''
+        text = '\n'.join(__.strip() for __ in lines)
+
+        kinds, keep = {ord('\n'): '\n'}, {}
+        for char in set(text) - {'\n'}:
+            if char in VOWELS:
+                kinds[ord(char)] = 'V'
+            elif char.isalpha() and unicodedata.category(char) != 'Lm':
+                kinds[ord(char)] = 'C'
+            else:
+                kinds[ord(char)], keep[ord(char)] = None, None
+
+        patterns = text.translate(kinds).split('\n')
+        letters = text.translate(keep)
+
+        syllabified = {__: syllabify(__) for __ in set(patterns)}
+
+        shapes = Counter()
+        for pattern, count in Counter(patterns).items():
+            for shape in syllabified[pattern][0]:
+                shapes[shape] += count
+
+        if not shapes:
+            raise ValueError('No syllables were counted: the corpus has no words with a vowel nucleus.')
+
+        # Unsyllabifiable words keep their letters but are labelled as skipped
+        slots = '\n'.join(syllabified[__][1] or 'X' * len(__) for __ in patterns)
+
+        codes = np.frombuffer(letters.encode('utf-32-le'), dtype=np.uint32)
+        labels = np.frombuffer(slots.encode('ascii'), dtype=np.uint8)
+
+        symbols, ids = np.unique(codes, return_inverse=True)
+        lookup = np.full(256, -1)
+        lookup[[ord('O'), ord('N'), ord('C')]] = range(3)
+        slot = lookup[labels]
+        mask = slot >= 0
+
+        # Drop the newline separator from the symbol table if present
+        newline = np.searchsorted(symbols, ord('\n'))
+        has_newline = newline < symbols.size and symbols[newline] == ord('\n')
+        if has_newline:
+            symbols = np.delete(symbols, newline)
+            ids = ids - (ids > newline)
+
+        n = symbols.size
+        slot_counts = np.bincount(slot[mask] * n + ids[mask], minlength=3 * n).reshape(3, n)
+
+        ordered = sorted(shapes, key=lambda __: (-shapes[__], __))
+        skipped = sum(1 for __ in patterns if __ and not syllabified[__][0])
+
+        return cls(ordered,
+                   [shapes[__] for __ in ordered],
+                   [chr(__) for __ in symbols],
+                   slot_counts,
+                   skipped)
+
+    @classmethod
+    def from_file(cls, path):
+        ''' Count syllable statistics from a corpus file with one word per line '''
+        with open(path) as fin:
+            return cls.from_corpus(fin)
+
+    def save(self, path):
+        ''' Save these statistics as a compressed NumPy archive '''
+        np.savez_compressed(path,
+                            shapes=np.array(self.shapes),
+                            shape_counts=self.shape_counts,
+                            symbols=np.array(self.symbols),
+                            slot_counts=self.slot_counts,
+                            skipped=self.skipped)
+
+    @classmethod
+    def load(cls, path):
+        ''' Load statistics saved with `save` '''
+        with np.load(path) as data:
+            return cls(data['shapes'].tolist(),
+                       data['shape_counts'],
+                       data['symbols'].tolist(),
+                       data['slot_counts'],
+                       data['skipped'])
+
+    def probability(self, shape):
+        ''' Return the relative frequency of a syllable shape '''
+        if shape not in self.shapes:
+            return 0.0
+        return self.shape_counts[self.shapes.index(shape)] / self.shape_counts.sum()
+
+    def distribution(self, slot):
+        '''
+        Return the phoneme distribution of a slot as a symbol-to-probability dict
+
+        Parameters
+        ----------
+            slot (str, int) : onset, nucleus, coda or their index
+        '''
+        if isinstance(slot, str):
+            slot = self.SLOTS.index(slot)
+        counts = self.slot_counts[slot]
+        total = counts.sum() or 1
+        return {s: float(c / total) for s, c in zip(self.symbols, counts) if c}
+
+    @instrument()
+    def sample(self, size=None, rng=None):
+        '''
+        Draw syllable shapes weighted by their corpus frequency
+
+        Parameters
+        ----------
+            size (int) : Number of shapes to draw. If None, return one shape.
+            rng (np.random.Generator) : Random number generator to use
+
+        Raises
+        ------
+            ValueError : No syllable shapes were counted
+        '''
+        if not self.shape_counts.sum():
+            raise ValueError('No syllable shapes were counted, so none can be sampled.')
+
+        draws = self._draw(self._shape_cdf, size, rng)
+        if size is None:
+            return self.shapes[draws]
+        return [self.shapes[__] for __ in draws]
+
+    def sample_phonemes(self, shape=None, rng=None):
+        '''
+        Return an IPA syllable filling each slot of a shape with phonemes drawn
+        from that slot's corpus distribution.
+
+        Parameters
+        ----------
+            shape (str) : Syllable shape (e.g., CVC). If None, one is sampled.
+            rng (np.random.Generator) : Random number generator to use
+        '''
+        if shape is None:
+            shape = self.sample(rng=rng)
+
+        _, slots = syllabify(shape.upper())
+        order = ['ONC'.index(__) for __ in slots]
+
+        for __ in set(order):
+            if not self.slot_counts[__].sum():
+                raise ValueError(f'No {self.SLOTS[__]} phonemes were counted for {shape}.')
+        return ''.join(self.symbols[self._draw(self._slot_cdf[__], None, rng)] for __ in order)
+
+
 if __name__ == "__main__":
     syl = Syllable('cvc')
     print(syl)
\ No newline at end of file
@@ -0,0 +1,12 @@
+# -*- encoding: utf-8 -*-
+# filename: conftest.py
+# description: run tests against the flat package modules from the package directory
+import os
+import sys
+
+HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules import each other by name and read resources/ relative to the
+# working directory
+sys.path.insert(0, HOME)
+os.chdir(HOME)
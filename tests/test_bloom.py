@@ -0,0 +1,43 @@
+# -*- encoding: utf-8 -*-
+# filename: test_bloom.py
+# description: membership guarantees of bloom.BloomFilter and bloom.UniquenessGate
+from bloom import BloomFilter, ExactSet, UniquenessGate
+import numpy as np
+import pytest
+
+WORDS = [f'w{i}a' for i in range(20000)]
+OTHERS = [f'x{i}b' for i in range(20000)]
+
+
+@pytest.fixture(scope='module')
+def bloom():
+    bloom = BloomFilter(len(WORDS), error_rate=0.01)
+    bloom.add_many(iter(WORDS), chunk=4096)
+    return bloom
+
+
+def test_no_false_negatives(bloom):
+    assert bloom.contains_many(WORDS).all()
+    assert all(__ in bloom for __ in WORDS[:100])
+
+
+def test_false_positive_rate_near_target(bloom):
+    rate = bloom.contains_many(OTHERS).mean()
+    assert rate < 0.02
+    assert bloom.error_rate() == pytest.approx(0.01, rel=0.2)
+
+
+def test_save_and_load(bloom, tmp_path):
+    path = str(tmp_path / 'words.bloom')
+    bloom.save(path)
+    loaded = BloomFilter.load(path)
+    assert (loaded.size, loaded.hashes, len(loaded)) == (bloom.size, bloom.hashes, len(bloom))
+    assert np.array_equal(loaded.contains_many(OTHERS), bloom.contains_many(OTHERS))
+
+
+def test_gate_rejects_every_known_word(bloom):
+    gate = UniquenessGate(ExactSet(['pata']), [bloom])
+    accepted = gate.accept_many(['pata'] + WORDS[:1000] + OTHERS[:1000])
+    assert not accepted[:1001].any()
+    assert accepted[1001:].mean() > 0.97
+    assert not gate.accept('pata') and gate.accept('kinasu')
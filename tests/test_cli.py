@@ -0,0 +1,66 @@
+# -*- encoding: utf-8 -*-
+# filename: test_cli.py
+# description: subcommands of cli.main on files and standard input
+from counting import CountModel
+from scoring import PhonotacticScorer
+import cli
+import io
+import pytest
+
+
+def run(capsys, *argv):
+    ''' Return the lines cli.main writes to stdout '''
+    cli.main(list(argv))
+    return capsys.readouterr().out.splitlines()
+
+
+def write(path, words):
+    path.write_text(''.join(f'{__}\n' for __ in words), encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('options', [['--shapes', 'cv', 'cvc'], ['--lengths', '2', '6']])
+def test_generate_seed_is_stable_across_workers(capsys, options):
+    argv = ['generate', '-n', '60', '--seed', '7', '--chunk', '16', *options]
+    one = run(capsys, *argv, '--workers', '1')
+    two = run(capsys, *argv, '--workers', '2')
+
+    assert len(one) == 60 and all(one)
+    assert one == two
+    assert run(capsys, *argv[:4], '8', *argv[5:], '--workers', '1') != one
+
+
+def test_score_matches_scorer(capsys, tmp_path):
+    words = ['pata', 'kinas', 'ʃuŋ']
+    lines = run(capsys, 'score', write(tmp_path / 'words.txt', words), '--normalize')
+
+    scorer = PhonotacticScorer.from_pickle(smoothing='kneser-ney')
+    expected = scorer.score(words, normalize=True)
+    assert [__.split('\t')[0] for __ in lines] == words
+    assert [float(__.split('\t')[1]) for __ in lines] == pytest.approx(expected.tolist(), abs=1e-6)
+
+
+def test_syllabify_reads_stdin(monkeypatch, capsys):
+    monkeypatch.setattr('sys.stdin', io.StringIO('kinas\n\nsumatra\n'))
+    assert run(capsys, 'syllabify', '-') == ['kinas\tki.nas\tCV.CVC', 'sumatra\tsu.mat.ra\tCV.CVC.CV']
+
+
+def test_transliterate_round_trip(capsys, tmp_path):
+    words = ['pata', 'kinas', 'ʃima', 'ŋoro']
+    spelled = run(capsys, 'transliterate', write(tmp_path / 'ipa.txt', words))
+    assert spelled != words
+
+    restored = run(capsys, 'transliterate', '--reverse', write(tmp_path / 'spelled.txt', spelled))
+    assert restored == words
+
+
+def test_count_appends_to_existing_log(capsys, tmp_path):
+    path = str(tmp_path / 'counts.cldl')
+    run(capsys, 'count', write(tmp_path / 'a.txt', ['pata', 'kapa']), '--model', path)
+    size = (tmp_path / 'counts.cldl').stat().st_size
+    run(capsys, 'count', write(tmp_path / 'b.txt', ['tiki']), '--model', path)
+
+    assert (tmp_path / 'counts.cldl').stat().st_size > size
+    expected = CountModel()
+    expected.update(['pata', 'kapa', 'tiki'])
+    assert CountModel.load(path).to_nested() == expected.to_nested()
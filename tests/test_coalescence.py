@@ -0,0 +1,40 @@
+# -*- encoding: utf-8 -*-
+# filename: test_coalescence.py
+# description: table-driven coalescence against per-feature rules and Sound.__add__
+from coalescence import _combine, coalesce, default_coalescence
+from soundarray import SoundArray, default_encoder, sound_codes
+from sounds import PHON
+import numpy as np
+import pytest
+
+PAIRS = [('t', 's'), ('p', 'f'), ('d', 'ʒ'), ('p', 'b'), ('k', 'x'), ('m', 'n'), ('a', 'p')]
+
+
+def codes(symbol):
+    encoder = default_encoder()
+    return encoder.inventory[encoder.symbols.index(symbol)]
+
+
+@pytest.mark.parametrize('a, b', PAIRS)
+def test_table_matches_feature_rules(a, b):
+    expected = [_combine(label, x, y) for label, x, y in zip(PHON.labels, codes(a), codes(b))]
+    assert list(default_coalescence().codes(codes(a)[None], codes(b)[None])[0]) == expected
+
+
+def test_arrays_match_sound_addition():
+    left = SoundArray([codes(a) for a, __ in PAIRS])
+    right = SoundArray([codes(b) for __, b in PAIRS])
+    combined = default_coalescence().combine(left, right)
+    assert np.array_equal(coalesce(left, right), combined.codes)
+
+    for row, a, b in zip(combined.codes, left.to_sounds(), right.to_sounds()):
+        assert np.array_equal(row, sound_codes(a + b))
+
+
+def test_closest_consonants():
+    coalescence = default_coalescence()
+    assert coalescence.character('d', 'ʒ') == 'ʤ'
+    assert coalescence.character('p', 'b') == 'b'
+    a = [coalescence.index[__] for __ in ('d', 'p')]
+    b = [coalescence.index[__] for __ in ('ʒ', 'b')]
+    assert [coalescence.symbols[__] for __ in coalescence.ids(a, b)] == ['ʤ', 'b']
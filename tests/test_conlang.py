@@ -0,0 +1,31 @@
+# -*- encoding: utf-8 -*-
+# filename: test_conlang.py
+# description: live entries of Conlang.Lexicon after removals
+from Conlang import Lexicon
+import numpy as np
+
+
+def test_removed_entries_are_skipped():
+    lexicon = Lexicon()
+    for form in ('pata', 'kina', 'sumatra', 'olo'):
+        lexicon.add(form)
+    lexicon.remove('kina')
+    lexicon.remove('olo')
+
+    expected = Lexicon()
+    for form in ('pata', 'sumatra'):
+        expected.add(form)
+
+    assert list(lexicon.entries) == [0, 2]
+    assert np.array_equal(lexicon.ids, expected.ids)
+    assert np.array_equal(lexicon.offsets, expected.offsets)
+    assert lexicon.sounds == expected.sounds
+    assert np.array_equal(lexicon.word(2), lexicon.ids[lexicon.offsets[1]:lexicon.offsets[2]])
+
+
+def test_remove_everything():
+    lexicon = Lexicon()
+    lexicon.add('pata')
+    lexicon.remove('pata')
+    assert lexicon.ids.size == 0 and list(lexicon.offsets) == [0]
+    assert lexicon.sounds.words == 0
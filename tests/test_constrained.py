@@ -0,0 +1,74 @@
+# -*- encoding: utf-8 -*-
+# filename: test_constrained.py
+# description: constrained.ConstrainedGenerator against brute-force enumeration
+from constrained import ConstrainedGenerator
+import itertools
+import numpy as np
+import pytest
+import re
+
+SYMBOLS = ['^', '$', 'p', 'a', 'k', 'i']
+OUTCOMES = 'paki'
+BANNED = ['pk', '^a', 'i$']
+SHAPES = ['CV', 'CVC']
+LEXICON = ['pa', 'kipa', 'paka']
+LENGTHS = (2, 5)
+
+
+@pytest.fixture(scope='module')
+def matrix():
+    matrix = np.random.default_rng(4).random((len(SYMBOLS), len(SYMBOLS)))
+    matrix[:, SYMBOLS.index('^')] = 0
+    matrix[SYMBOLS.index('^'), SYMBOLS.index('$')] = 0
+    return matrix / matrix.sum(axis=1, keepdims=True)
+
+
+def likelihood(matrix, word):
+    sequence = [SYMBOLS.index(__) for __ in f'^{word}$']
+    return float(np.prod(matrix[sequence[:-1], sequence[1:]]))
+
+
+def valid(word, shapes=True, lexicon=True):
+    anchored = f'^{word}$'
+    return (LENGTHS[0] <= len(word) <= LENGTHS[1] and
+            not any(__ in anchored for __ in BANNED) and
+            (not shapes or re.fullmatch('(CVC|CV)+', ''.join('V' if __ in 'ai' else 'C' for __ in word))) and
+            (not lexicon or word not in LEXICON))
+
+
+def words():
+    for length in range(1, LENGTHS[1] + 1):
+        for letters in itertools.product(OUTCOMES, repeat=length):
+            yield ''.join(letters)
+
+
+@pytest.mark.parametrize('shapes, lexicon', [(None, ()), (SHAPES, ()), (SHAPES, LEXICON)])
+def test_total_and_probability_match_enumeration(matrix, shapes, lexicon):
+    generator = ConstrainedGenerator(SYMBOLS, matrix, LENGTHS, BANNED, shapes, lexicon)
+    allowed = {w: likelihood(matrix, w) for w in words()
+               if valid(w, shapes=bool(shapes), lexicon=bool(lexicon))}
+    total = sum(allowed.values())
+
+    assert generator.total() == pytest.approx(total)
+    for word in words():
+        expected = allowed[word] / total if word in allowed else 0.0
+        assert generator.probability(word) == pytest.approx(expected, abs=1e-12)
+
+
+def test_generated_words_satisfy_constraints(matrix):
+    generator = ConstrainedGenerator(SYMBOLS, matrix, LENGTHS, BANNED, SHAPES, LEXICON)
+    generated = generator.generate(20000, np.random.default_rng(1))
+
+    assert all(valid(__) for __ in generated)
+    assert not set(generated) & set(LEXICON)
+
+    # Frequencies follow probability()
+    counts = {w: generated.count(w) / len(generated) for w in set(generated)}
+    common = max(counts, key=counts.get)
+    assert counts[common] == pytest.approx(generator.probability(common), abs=0.02)
+
+
+def test_impossible_constraints():
+    matrix = np.full((len(SYMBOLS), len(SYMBOLS)), 1 / len(SYMBOLS))
+    with pytest.raises(ValueError):
+        ConstrainedGenerator(SYMBOLS, matrix, LENGTHS, banned=['p', 'a', 'k', 'i'])
@@ -0,0 +1,94 @@
+# -*- encoding: utf-8 -*-
+# filename: test_counting.py
+# description: delta log round trips of counting.CountModel
+from counting import CountModel
+import numpy as np
+
+
+def nested(model):
+    return {a: dict(row) for a, row in model.to_nested()[1].items()}
+
+
+def test_append_and_load(tmp_path):
+    path = str(tmp_path / 'counts.cldl')
+    model = CountModel()
+    model.update(['pata', 'kapa'])
+    model.save(path)
+    model.update(['tapa'])
+    model.remove(['kapa'])
+    model.save(path)
+
+    loaded = CountModel.load(path)
+    assert nested(loaded) == nested(model)
+    assert np.array_equal(loaded.unigram_probabilities(), model.unigram_probabilities())
+
+
+def test_append_from_another_model_keeps_symbols(tmp_path):
+    path = str(tmp_path / 'counts.cldl')
+    first = CountModel()
+    first.update(['papa'])
+    first.save(path)
+
+    second = CountModel()
+    second.update(['kiki'])
+    second.save(path)
+    second.update(['pik'])
+    second.save(path)
+
+    loaded = CountModel.load(path)
+    expected = CountModel()
+    expected.update(['papa', 'kiki', 'pik'])
+    assert nested(loaded) == nested(expected)
+
+
+def test_compact_rewrites_one_record(tmp_path):
+    path = str(tmp_path / 'counts.cldl')
+    model = CountModel()
+    model.update(['pata'])
+    model.save(path)
+    model.update(['kapa'])
+    model.save(path, compact=True)
+    assert nested(CountModel.load(path)) == nested(model)
+
+
+def test_appends_reuse_the_cached_symbol_table(tmp_path, monkeypatch):
+    path = str(tmp_path / 'counts.cldl')
+    model = CountModel()
+    model.update(['pata'])
+    model.save(path)
+
+    def fail(path):
+        raise AssertionError('the log was read again')
+
+    monkeypatch.setattr(CountModel, '_log_symbols', staticmethod(fail))
+    for word in ('kapa', 'sumi', 'tapa'):
+        model.update([word])
+        model.save(path)
+
+    monkeypatch.undo()
+    assert nested(CountModel.load(path)) == nested(model)
+
+
+def test_interleaved_writers_reread_the_log(tmp_path):
+    path = str(tmp_path / 'counts.cldl')
+    first, second = CountModel(), CountModel()
+    first.update(['papa'])
+    first.save(path)
+    second.update(['kiki'])
+    second.save(path)
+    first.update(['sisi'])
+    first.save(path)
+
+    expected = CountModel()
+    expected.update(['papa', 'kiki', 'sisi'])
+    assert nested(CountModel.load(path)) == nested(expected)
+
+
+def test_log_symbols_skip_count_data(tmp_path):
+    path = str(tmp_path / 'counts.cldl')
+    model = CountModel()
+    model.update(['pata'])
+    model.save(path)
+    model.update(['kisu'])
+    model.save(path)
+    assert CountModel._log_symbols(path) == model.symbols
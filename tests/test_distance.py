@@ -0,0 +1,53 @@
+# -*- encoding: utf-8 -*-
+# filename: test_distance.py
+# description: phonetic edit distances and nearest sounds of distance.py
+from distance import PhoneticDistance, feature_distance, nearest_sound
+from soundarray import default_encoder
+import numpy as np
+import pytest
+
+WORDS = ['pata', 'bada', 'pat', 'ʃip', '', 'sumatra', 'ŋa', 'atap']
+
+
+def brute_force(distance, a, b):
+    ''' Edit distance by the textbook dynamic program '''
+    a = distance.tokenizer.tokenize(a, ids=True)
+    b = distance.tokenizer.tokenize(b, ids=True)
+    table = np.zeros((len(a) + 1, len(b) + 1))
+    table[:, 0] = np.arange(len(a) + 1) * distance.indel
+    table[0, :] = np.arange(len(b) + 1) * distance.indel
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            table[i, j] = min(table[i - 1, j] + distance.indel,
+                              table[i, j - 1] + distance.indel,
+                              table[i - 1, j - 1] + distance.matrix[a[i - 1], b[j - 1]])
+    return table[-1, -1]
+
+
+@pytest.mark.parametrize('indel', [1.0, 0.3])
+def test_lexicon_matches_brute_force(indel):
+    distance = PhoneticDistance(indel=indel)
+    padded = distance.pad(WORDS)
+    for query in WORDS:
+        expected = [brute_force(distance, query, __) for __ in WORDS]
+        assert np.allclose(distance.lexicon(query, WORDS), expected, atol=1e-5)
+        assert np.allclose(distance.lexicon(query, padded), expected, atol=1e-5)
+        assert distance.word(query, WORDS[0]) == pytest.approx(expected[0], abs=1e-5)
+
+
+def test_sound_distances():
+    distance = PhoneticDistance()
+    assert distance.sound('p', 'p') == 0
+    assert 0 < distance.sound('p', 'b') < distance.sound('p', 'k') < distance.sound('p', 'a') <= 1
+    assert list(distance.collisions('pata', WORDS, 0.2)) == [0, 1]
+
+
+@pytest.mark.parametrize('kind', ['c', 'v'])
+def test_nearest_sound_finds_exact_entries(kind):
+    index = nearest_sound(kind)
+    encoder = default_encoder()
+    codes = encoder.inventory[[encoder.symbols.index(__) for __ in index.symbols]]
+    found = index.codes[index.batch(codes)]
+    # Entries may only differ in features outside the kind's weights
+    assert np.allclose(feature_distance(found, codes, index.weights), 0)
+    assert index.query(codes[0]) in index.symbols
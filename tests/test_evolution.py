@@ -0,0 +1,65 @@
+# -*- encoding: utf-8 -*-
+# filename: test_evolution.py
+# description: determinism, checkpoints and sound changes of evolution.Simulation
+from evolution import Simulation, decode, simulate
+from soundarray import vowel_mask
+import numpy as np
+import os
+
+WORDS = ['pataka', 'kinasu', 'sumatra', 'olobe', 'aŋa', 'nama']
+
+
+def simulation(**rates):
+    return Simulation(WORDS, rates={'lenition': 0.05, 'loss': 0.02, **rates})
+
+
+def test_workers_do_not_change_results():
+    one = simulate(simulation(), 40, replicates=3, seed=7, workers=1)
+    two = simulate(simulation(), 40, replicates=3, seed=7, workers=2)
+    assert one == two
+    assert one[0] != one[1]
+
+
+def test_resume_from_partial_checkpoint(tmp_path):
+    uninterrupted = simulation().run(30, 11)
+
+    directory = str(tmp_path / 'run')
+    simulation().run(17, 11, checkpoint=directory, every=5)
+    # A crash while writing generation 17 leaves only its codes behind
+    os.remove(os.path.join(directory, 'g000017.lengths.npy'))
+
+    resumed = simulation().run(30, 11, checkpoint=directory, every=5)
+    assert resumed == uninterrupted
+    assert os.path.exists(os.path.join(directory, 'g000030.codes.npy'))
+
+
+def test_loss_never_empties_a_word():
+    for array in simulate(simulation(loss=0.5), 20, replicates=2, seed=3, workers=1):
+        assert array.words == len(WORDS)
+        assert (array.lengths >= 1).all()
+
+
+def test_nasals_stay_consonants():
+    vowels = {'raising': 1.0, 'lowering': 1.0, 'fronting': 1.0, 'backing': 1.0}
+    nasals = Simulation(['aŋa', 'nama'], rates={'lenition': 0, 'fortition': 0, 'loss': 0, **vowels})
+    codes = nasals.lexicon.codes
+    assert list(vowel_mask(codes)) == [True, False, True, False, True, False, True]
+
+    after = nasals.run(5, 1)
+    consonants = ~vowel_mask(codes)
+    assert np.array_equal(after.codes[consonants], codes[consonants])
+    assert [word[1] for word in decode(after)] == ['ŋ', 'a']
+
+
+def test_lenition_is_faster_between_vowels():
+    rates = {'lenition': 0.001, 'fortition': 0, 'loss': 0}
+    lenition = Simulation(['apa', 'pa'], rates=rates, intervocalic=1000)
+    codes, lengths = lenition.lexicon.codes, np.array([3, 2], dtype=np.int32)
+    assert list(lenition._neighbours(vowel_mask(codes), lengths)) == [False, True, False, False, False]
+
+    rng = np.random.default_rng(0)
+    changed = np.zeros(len(codes))
+    for __ in range(200):
+        after, lengths = lenition.step(codes, lengths, rng)
+        changed += (after != codes).any(axis=1)
+    assert changed[1] > 100 and changed[3] < 10
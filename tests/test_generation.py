@@ -0,0 +1,30 @@
+# -*- encoding: utf-8 -*-
+# filename: test_generation.py
+# description: seeded, chunked generation of generation.generate across workers
+from generation import SyllableGenerator, chunks, generate
+from syllable import SyllableStatistics
+import pytest
+
+
+@pytest.fixture(scope='module')
+def generator():
+    statistics = SyllableStatistics.from_corpus(['pata', 'kinas', 'sumatra', 'olo'])
+    return SyllableGenerator(statistics)
+
+
+@pytest.mark.parametrize('chunk', [3, 7, 64])
+def test_seed_gives_the_same_words_on_any_workers(generator, chunk):
+    words = generate(generator, 20, seed=2020, workers=1, chunk=chunk)
+    assert len(words) == 20
+    assert generate(generator, 20, seed=2020, workers=2, chunk=chunk) == words
+    assert generate(generator, 20, seed=2020, workers=3, chunk=chunk) == words
+
+
+def test_chunks_stream_in_order(generator):
+    streamed = list(chunks(generator, 10, seed=1, workers=2, chunk=4))
+    assert [len(__) for __ in streamed] == [4, 4, 2]
+    assert sum(streamed, []) == generate(generator, 10, seed=1, workers=1, chunk=4)
+
+
+def test_seeds_differ(generator):
+    assert generate(generator, 20, seed=1, workers=1) != generate(generator, 20, seed=2, workers=1)
@@ -0,0 +1,25 @@
+# -*- encoding: utf-8 -*-
+# filename: test_inventory.py
+# description: candidate pools and scores of inventory.InventoryScorer
+from inventory import InventoryScorer, _random
+from sounds import SNDS
+import numpy as np
+
+
+def test_vowels_are_sounds_yaml_vowels():
+    scorer = InventoryScorer()
+    vowels = {__.character for __ in SNDS.vowel}
+    assert {s for s, v in zip(scorer.symbols, scorer.vowel) if v} == vowels
+
+    draws = _random(scorer, 5, 10, 500, np.random.default_rng(0))
+    assert scorer.vowel[draws[:, :5]].all() and not scorer.vowel[draws[:, 5:]].any()
+
+
+def test_scores_are_normalized():
+    scorer = InventoryScorer.from_pickle()
+    draws = _random(scorer, 5, 15, 2000, np.random.default_rng(1))
+    for name, values in scorer.components(draws).items():
+        assert ((values >= 0) & (values <= 1)).all(), name
+
+    # Standardized against random inventories, so random draws average near zero
+    assert abs(scorer.score(draws).mean()) < 0.5
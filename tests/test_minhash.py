@@ -0,0 +1,59 @@
+# -*- encoding: utf-8 -*-
+# filename: test_minhash.py
+# description: queries and persistence of minhash.MinHashIndex
+from minhash import MinHashIndex
+import numpy as np
+import pytest
+
+WORDS = ['pataka', 'kinasu', 'sumatra', 'olobe', 'ʃipo', 'badaga', 'lumina', 'tokoro']
+
+
+@pytest.fixture(scope='module')
+def index():
+    index = MinHashIndex(threshold=0.4)
+    index.add_many(WORDS)
+    return index
+
+
+def test_query_returns_the_word_itself(index):
+    for word in WORDS:
+        results = index.query(word)
+        assert results[0] == (word, 1.0)
+    assert index.contains_many(WORDS).all()
+
+
+def test_near_duplicates_and_strangers(index):
+    assert 'pataka' in [__ for __, score in index.query('patakas')]
+    assert index.query('ŋuŋuŋu') == []
+
+
+def test_many_words_are_merged_into_sorted_bands():
+    index = MinHashIndex()
+    words = [f'pa{"ta" * (i % 7)}ki{"su" * (i % 5)}{i}' for i in range(3000)]
+    index.add_many(words)
+    assert index._merged > 0
+    # Digits are unknown symbols, so several words share a signature
+    assert all((__, 1.0) in index.query(__) for __ in words[::97])
+
+    # Words added after the merge are scanned until the next one
+    index.add_many(['sumatra', 'olobe'])
+    assert index._merged == 3000
+    assert index.query('sumatra')[0] == ('sumatra', 1.0)
+
+
+def test_save_and_load(index, tmp_path):
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+    loaded = MinHashIndex.load(path)
+
+    assert loaded.words == index.words
+    assert np.array_equal(loaded.signatures, index.signatures)
+    assert (loaded.permutations, loaded.bands, loaded.n, loaded.threshold) == \
+           (index.permutations, index.bands, index.n, index.threshold)
+    assert loaded.query_many(['patakas', 'kinasu']) == index.query_many(['patakas', 'kinasu'])
+
+
+def test_feature_shingles_ignore_voicing():
+    index = MinHashIndex(features=True)
+    index.add('pataka')
+    assert index.query('badaga') == [('pataka', 1.0)]
@@ -0,0 +1,28 @@
+# -*- encoding: utf-8 -*-
+# filename: test_mixing.py
+# description: interpolation of mixing.LanguageMixer
+from mixing import LanguageMixer
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope='module')
+def mixer():
+    mixer = LanguageMixer()
+    mixer.add_corpus('a', ['pata', 'kapa', 'tapa'])
+    mixer.add_corpus('b', ['sini', 'nisi', 'iksi'])
+    return mixer
+
+
+@pytest.mark.parametrize('estimator', ['mle', 'add-k', 'kneser-ney'])
+def test_mixed_rows_are_distributions(mixer, estimator):
+    matrix = mixer.mix({'a': 0.6, 'b': 0.4}, estimator).matrix
+    sums = matrix.sum(axis=1)
+    seen = mixer.counts.sum(axis=(0, 2)) > 0
+    assert np.allclose(sums[seen], 1)
+
+
+def test_mle_row_seen_by_one_language(mixer):
+    model = mixer.mix({'a': 0.6, 'b': 0.4})
+    assert model.prob('p', 'a') == pytest.approx(1.0)
+    assert model.prob('^', 'p') == pytest.approx(0.6 / 3)
@@ -0,0 +1,31 @@
+# -*- encoding: utf-8 -*-
+# filename: test_parallel.py
+# description: pool helpers run function(state, task) in order for any worker count
+import os
+import parallel
+import pytest
+
+
+def offset(state, task):
+    return state + task, os.getpid()
+
+
+@pytest.mark.parametrize('workers', [1, 2, 8])
+def test_map_keeps_task_order(workers):
+    results = parallel.map(offset, range(6), 100, workers)
+    assert [__ for __, _ in results] == [100, 101, 102, 103, 104, 105]
+
+
+def test_one_worker_runs_in_this_process():
+    assert {pid for __, pid in parallel.map(offset, range(3), 0, workers=1)} == {os.getpid()}
+
+
+def test_executor_workers_hold_state():
+    with parallel.executor(10, 2) as pool:
+        results = list(pool.map(parallel.call, [offset] * 4, range(4)))
+    assert [__ for __, _ in results] == [10, 11, 12, 13]
+    assert os.getpid() not in {pid for __, pid in results}
+
+
+def test_imap_without_tasks():
+    assert list(parallel.imap(offset, [], 0)) == []
@@ -0,0 +1,43 @@
+# -*- encoding: utf-8 -*-
+# filename: test_probability.py
+# description: estimators of probability.ESTIMATORS against fixed expected values
+from probability import ESTIMATORS, add_k, lidstone
+import numpy as np
+import pytest
+
+# Rows: seen twice with one unseen outcome, never seen, and uniform
+COUNTS = np.array([[3, 1, 0],
+                   [0, 0, 0],
+                   [2, 2, 2]], dtype=np.float64)
+
+# Values of nltk's MLEProbDist, ELEProbDist, LaplaceProbDist and
+# LidstoneProbDist, where bins defaults to the outcomes seen in the row, so
+# (c + gamma) / (N + B * gamma). Rows never seen are all zero.
+EXPECTED = {
+    'mle': [[3 / 4, 1 / 4, 0], [0, 0, 0], [1 / 3, 1 / 3, 1 / 3]],
+    'ele': [[3.5 / 5, 1.5 / 5, 0.5 / 5], [0, 0, 0], [1 / 3, 1 / 3, 1 / 3]],
+    'laplace': [[4 / 6, 2 / 6, 1 / 6], [0, 0, 0], [1 / 3, 1 / 3, 1 / 3]],
+    'lidstone': [[3.5 / 5, 1.5 / 5, 0.5 / 5], [0, 0, 0], [1 / 3, 1 / 3, 1 / 3]],
+    'add-k': [[4 / 7, 2 / 7, 1 / 7], [1 / 3, 1 / 3, 1 / 3], [1 / 3, 1 / 3, 1 / 3]],
+    # Discount 0.75 and continuation counts [2, 2, 1] + 1 over 8
+    'kneser-ney': [[2.25 / 4 + 0.375 * 3 / 8, 0.25 / 4 + 0.375 * 3 / 8, 0.375 * 2 / 8],
+                   [3 / 8, 3 / 8, 2 / 8],
+                   [1.25 / 6 + 0.375 * 3 / 8, 1.25 / 6 + 0.375 * 3 / 8, 1.25 / 6 + 0.375 * 2 / 8]],
+}
+
+
+@pytest.mark.parametrize('name', sorted(EXPECTED))
+def test_estimators(name):
+    assert np.allclose(ESTIMATORS[name](COUNTS), EXPECTED[name])
+
+
+def test_seen_bins_rows_sum_past_one():
+    sums = lidstone(COUNTS, 0.5).sum(axis=1)
+    assert sums[0] == pytest.approx(1.1)
+    assert sums[2] == pytest.approx(1.0)
+
+
+def test_all_bins_rows_are_distributions():
+    assert np.allclose(lidstone(COUNTS, 0.5, 'all').sum(axis=1), 1)
+    assert np.allclose(add_k(COUNTS, 0.1).sum(axis=1), 1)
+    assert np.allclose(ESTIMATORS['kneser-ney'](COUNTS).sum(axis=1), 1)
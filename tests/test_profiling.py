@@ -0,0 +1,33 @@
+# -*- encoding: utf-8 -*-
+# filename: test_profiling.py
+# description: timing of instrumented functions and coroutines
+from profiling import instrument
+import asyncio
+import profiling
+import time
+
+
+@instrument()
+def wait(seconds):
+    time.sleep(seconds)
+
+
+@instrument()
+async def pause(seconds):
+    await asyncio.sleep(seconds)
+    return seconds
+
+
+def test_functions_are_timed():
+    with profiling.profile() as stats:
+        wait(0.02)
+    assert stats.calls[f'{__name__}.wait'] == 1
+    assert stats.seconds[f'{__name__}.wait'] >= 0.02
+
+
+def test_coroutines_are_timed_until_awaited():
+    with profiling.profile() as stats:
+        assert asyncio.run(pause(0.05)) == 0.05
+    assert stats.calls[f'{__name__}.pause'] == 1
+    assert stats.seconds[f'{__name__}.pause'] >= 0.05
+    assert asyncio.iscoroutinefunction(pause)
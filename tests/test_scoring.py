@@ -0,0 +1,50 @@
+# -*- encoding: utf-8 -*-
+# filename: test_scoring.py
+# description: batched PhonotacticScorer.score against a per-word loop over logp
+from scoring import END, START, PhonotacticScorer
+from tokenizer import Tokenizer
+import numpy as np
+import pytest
+
+MODEL = {START: {'p': 4, 'a': 2, 'tʃ': 1},
+         'p': {'a': 5, 'i': 1},
+         'a': {'p': 2, 'tʃ': 3, END: 4},
+         'tʃ': {'i': 2, 'a': 1},
+         'i': {END: 3, 'p': 1}}
+
+WORDS = ['pa', 'atʃi', 'papi', 'i', 'ptʃk', '']
+
+
+def loop(scorer, tokens, normalize=False):
+    ''' Sum logp[previous, next] over ^ tokens $ one word at a time '''
+    scores = []
+    for word in tokens:
+        ids = [scorer.start] + [scorer.index.get(t, scorer.unknown) for t in word] + [scorer.end]
+        score = sum(scorer.logp[a, b] for a, b in zip(ids, ids[1:]))
+        scores.append(score / (len(word) + 1) if normalize else score)
+    return np.array(scores)
+
+
+@pytest.mark.parametrize('smoothing', ['add-k', 'kneser-ney'])
+@pytest.mark.parametrize('normalize', [False, True])
+def test_score_matches_loop_over_characters(smoothing, normalize):
+    scorer = PhonotacticScorer(MODEL, smoothing=smoothing)
+    expected = loop(scorer, [list(__) for __ in WORDS], normalize)
+    assert np.allclose(scorer.score(WORDS, normalize=normalize), expected)
+
+
+@pytest.mark.parametrize('normalize', [False, True])
+def test_score_matches_loop_over_tokens(normalize):
+    tokenizer = Tokenizer(symbols=['p', 'a', 'i', 'tʃ'], aliases={}, lengthen=False)
+    scorer = PhonotacticScorer(MODEL, tokenizer=tokenizer)
+    tokens = [[tokenizer.symbols[i] if i < tokenizer.unknown else '<?>'
+               for i in tokenizer.tokenize(__, ids=True)] for __ in WORDS]
+
+    assert tokens[1] == ['a', 'tʃ', 'i']
+    expected = loop(scorer, tokens, normalize)
+    assert np.allclose(scorer.score(WORDS, normalize=normalize), expected)
+
+
+def test_unseen_transitions_are_impossible_without_smoothing():
+    scorer = PhonotacticScorer(MODEL, k=0)
+    assert np.isneginf(scorer.score(['pi', 'pp'])).tolist() == [False, True]
@@ -0,0 +1,93 @@
+# -*- encoding: utf-8 -*-
+# filename: test_server.py
+# description: request validation and batching of server.Server
+from server import Batcher, Models, Server
+import asyncio
+import profiling
+import json
+import pytest
+
+
+@pytest.fixture(scope='module')
+def models():
+    return Models()
+
+
+def run(models, *batches):
+    ''' Dispatch each batch of requests concurrently on one server and event loop '''
+    async def main():
+        server = Server(models, workers=0)
+        try:
+            return [await asyncio.gather(*[server.dispatch('POST', path, json.dumps(body).encode())
+                                           for path, body in requests])
+                    for requests in batches]
+        finally:
+            server.close()
+    return asyncio.run(main())
+
+
+def test_bad_payloads_fail_alone(models):
+    results, = run(models, [('/score', {'words': ['pata']}),
+                            ('/score', {'words': [1]}),
+                            ('/generate', {'count': 'x'}),
+                            ('/generate', {'count': 3, 'seed': 1}),
+                            ('/syllabify', ['pata']),
+                            ('/syllabify', {'words': ['pata']})])
+    assert [status for status, __ in results] == [200, 400, 400, 200, 400, 200]
+    assert len(results[0][1]['scores']) == 1
+    assert len(results[3][1]['words']) == 3
+
+
+def test_seeded_generation_ignores_batching(models):
+    (alone,), batched = run(models, [('/generate', {'count': 4, 'seed': 7})],
+                            [('/generate', {'count': 2}),
+                             ('/generate', {'count': 4, 'seed': 7}),
+                             ('/generate', {'count': 5})])
+    assert batched[1][1] == alone[1]
+    assert [len(__[1]['words']) for __ in batched] == [2, 4, 5]
+
+
+def test_batcher_isolates_failures():
+    async def function(payloads):
+        if 'bad' in payloads:
+            raise ValueError('bad payload')
+        return [__.upper() for __ in payloads]
+
+    async def main():
+        batcher = Batcher(function, delay=0.01)
+        try:
+            return await asyncio.gather(*[batcher.submit(__) for __ in ('a', 'bad', 'b')],
+                                        return_exceptions=True)
+        finally:
+            batcher.close()
+
+    a, bad, b = asyncio.run(main())
+    assert (a, b) == ('A', 'B') and isinstance(bad, ValueError)
+
+
+def test_syllabify_long_vowels_and_stress(models):
+    words = ['pataa', 'ˈd͡ʒaːm', 'biˈlo', '']
+    (status, body), = run(models, [('/syllabify', {'words': words})])[0]
+    assert status == 200
+    assert body['syllables'] == [['CV', 'CV'], ['CVC'], ['CV', 'CV'], []]
+
+
+def test_dispatch_is_timed_until_it_responds(models):
+    with profiling.profile() as stats:
+        (status, __), = run(models, [('/score', {'words': ['pata']})])[0]
+    assert status == 200
+    assert stats.seconds['server.Server.dispatch'] >= 0.002
+
+
+def test_pool_matches_this_process(models):
+    async def main():
+        server = Server(models, workers=1, threshold=0)
+        try:
+            body = json.dumps({'words': ['pata', 'ktkt']}).encode()
+            return await server.dispatch('POST', '/score', body)
+        finally:
+            server.close()
+
+    status, body = asyncio.run(main())
+    assert status == 200
+    assert body['scores'] == pytest.approx(models.score(['pata', 'ktkt'], False))
@@ -0,0 +1,32 @@
+# -*- encoding: utf-8 -*-
+# filename: test_shared.py
+# description: attaching to tables published by shared.publish
+from conftest import HOME
+import shared
+import subprocess
+import sys
+
+WORKER = '''
+import shared, sys
+with shared.attach(sys.argv[1]) as tables:
+    array = tables.encoder().encode(['pata', 'ʃip'])
+    distance = tables.distance().word('pata', 'bata')
+    pairs = tables.coalescence().ids([0], [1])
+    print(array.codes.shape, array.words, round(distance, 4), pairs.shape)
+print(sorted({'sounds', 'resource', 'yaml'} & set(sys.modules)))
+'''
+
+
+def test_attach_without_loading_resources():
+    from distance import PhoneticDistance
+    path = shared.publish()
+    try:
+        result = subprocess.run([sys.executable, '-c', WORKER, path], cwd=HOME,
+                                capture_output=True, text=True, check=True)
+    finally:
+        shared.unlink(path)
+
+    tables, modules = result.stdout.splitlines()
+    expected = round(PhoneticDistance().word('pata', 'bata'), 4)
+    assert tables == f'(7, 12) 2 {expected} (1,)'
+    assert modules == '[]'
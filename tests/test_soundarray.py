@@ -0,0 +1,22 @@
+# -*- encoding: utf-8 -*-
+# filename: test_soundarray.py
+# description: consonant and vowel decoding of soundarray.SoundArray
+from soundarray import default_encoder, phonology, vowel_mask
+from sounds import PHON, SNDS
+
+
+def test_vowel_mask_matches_sounds_yaml():
+    encoder = default_encoder()
+    vowels = {__.character for __ in SNDS.vowel}
+    mask = vowel_mask(encoder.inventory[:-1])
+    assert [s for s, v in zip(encoder.symbols, mask) if v] == [s for s in encoder.symbols if s in vowels]
+
+
+def test_nasals_decode_as_consonants():
+    sounds = default_encoder().encode(['ŋaɱɲ']).to_sounds()
+    assert [__.type for __ in sounds] == ['C', 'V', 'C', 'C']
+
+
+def test_phonology_is_loaded_once():
+    assert phonology() is phonology() is PHON
+    assert default_encoder().inventory.shape[1] == len(phonology().labels)
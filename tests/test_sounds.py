@@ -0,0 +1,46 @@
+# -*- encoding: utf-8 -*-
+# filename: test_sounds.py
+# description: pickling and byte serialization of sounds.Sound and subclasses
+from sounds import Consonant, Sound, Vowel, from_bytes, to_bytes
+from soundarray import sound_codes
+from syllable import Syllable
+import numpy as np
+import pickle
+import pytest
+
+
+def sounds():
+    consonant = Consonant('voiced bilabial stop')
+    consonant.ipa, consonant.character = 'b', 'b'
+    return [consonant, Vowel(), Sound()]
+
+
+def test_pickle_round_trip():
+    for sound in sounds():
+        restored = pickle.loads(pickle.dumps(sound))
+        assert type(restored) is type(sound)
+        assert np.array_equal(sound_codes(restored), sound_codes(sound))
+        assert (restored.ipa, restored.character) == (sound.ipa, sound.character)
+
+
+def test_pickle_keeps_subclass_state():
+    syllable = Syllable('ccvc')
+    restored = pickle.loads(pickle.dumps(syllable))
+    assert repr(restored) == repr(syllable)
+    assert [type(__) for __ in restored.onset] == [Consonant, Consonant]
+    assert [type(__) for __ in restored.nucleus] == [Vowel]
+    assert restored.syllable[0] is restored.onset[0]
+
+
+def test_bytes_round_trip():
+    original = sounds()
+    restored = from_bytes(to_bytes(original))
+    assert [type(__) for __ in restored] == [type(__) for __ in original]
+    for a, b in zip(original, restored):
+        assert np.array_equal(sound_codes(a), sound_codes(b))
+        assert (a.ipa, a.character) == (b.ipa, b.character)
+
+
+def test_bytes_reject_other_classes():
+    with pytest.raises(TypeError):
+        to_bytes([Consonant(), Syllable('cv')])
@@ -0,0 +1,56 @@
+# -*- encoding: utf-8 -*-
+# filename: test_storage.py
+# description: round trips of the memory-mapped binary lexicon format
+from Conlang import Lexicon
+from soundarray import default_encoder
+from storage import load, save_lexicon, write
+import numpy as np
+import pytest
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'words.lex')
+    forms, glosses = ['pata', 'kina', 'ʃip'], ['water', None, 'ship']
+    write(path, forms, glosses)
+
+    with load(path) as lexicon:
+        assert len(lexicon) == 3 and list(lexicon.forms()) == forms
+        assert [lexicon.gloss(__) for __ in range(3)] == glosses
+        assert [lexicon.index(__) for __ in forms + ['sumatra']] == [0, 1, 2, None]
+        assert lexicon.sound_array() == default_encoder().encode(forms)
+
+
+@pytest.mark.parametrize('glosses', [None, []])
+def test_empty_round_trip(tmp_path, glosses):
+    path = str(tmp_path / 'empty.lex')
+    write(path, [], glosses)
+
+    with load(path) as lexicon:
+        assert len(lexicon) == 0 and list(lexicon.forms()) == []
+        assert lexicon.index('pata') is None
+        assert lexicon.sound_array().words == 0
+
+
+def test_save_lexicon_skips_removed(tmp_path):
+    path = str(tmp_path / 'lexicon.lex')
+    lexicon = Lexicon()
+    for form, gloss in (('pata', 'water'), ('kina', 'fire'), ('olo', None)):
+        lexicon.add(form, gloss)
+    lexicon.remove('kina')
+    save_lexicon(path, lexicon)
+
+    with load(path) as saved:
+        assert list(saved.forms()) == ['pata', 'olo']
+        assert [saved.gloss(__) for __ in range(2)] == ['water', None]
+        assert np.array_equal(saved.codes, lexicon.sounds.codes)
+
+    lexicon.remove('pata')
+    lexicon.remove('olo')
+    save_lexicon(path, lexicon)
+    with load(path) as saved:
+        assert len(saved) == 0
+
+
+def test_mismatched_sounds():
+    with pytest.raises(ValueError):
+        write('/dev/null', ['pata'], sounds=default_encoder().encode(['pata', 'kina']))
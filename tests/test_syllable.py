@@ -0,0 +1,47 @@
+# -*- encoding: utf-8 -*-
+# filename: test_syllable.py
+# description: syllabification of tokenized words, syllable statistics and the syllabify command
+from syllable import SyllableStatistics, syllabify_tokens
+from tokenizer import default_tokenizer
+import cli
+import io
+import pytest
+
+
+def split(word):
+    tokenizer = default_tokenizer()
+    tokens, ids = zip(*tokenizer.scan(word))
+    return syllabify_tokens(tokens, ids, tokenizer.symbols)
+
+
+@pytest.mark.parametrize('word, syllables, shapes', [
+    ('pataa', ['pa', 'taa'], ['CV', 'CV']),
+    ('ˈd͡ʒaːm', ['ˈd͡ʒaːm'], ['CVC']),
+    ('biˈlo', ['bi', 'ˈlo'], ['CV', 'CV']),
+    ('ˌkaˈstra', ['ˌka', 'ˈstra'], ['CV', 'CCCV']),
+    ('ostra', ['os', 'tra'], ['VC', 'CCV']),
+    ('pst', [], []),
+])
+def test_syllabify_tokens(word, syllables, shapes):
+    assert split(word) == (syllables, shapes)
+
+
+def test_syllabify_command(monkeypatch, capsys):
+    monkeypatch.setattr('sys.stdin', io.StringIO('pataa\nˈd͡ʒaːm\nbiˈlo\n'))
+    cli.main(['syllabify'])
+    assert capsys.readouterr().out.splitlines() == [
+        'pataa\tpa.taa\tCV.CV', 'ˈd͡ʒaːm\tˈd͡ʒaːm\tCVC', 'biˈlo\tbi.ˈlo\tCV.CV']
+
+
+@pytest.mark.parametrize('corpus', [[], ['123'], ['', 'ptk']])
+def test_statistics_without_syllables(corpus):
+    with pytest.raises(ValueError, match='No syllables were counted'):
+        SyllableStatistics.from_corpus(corpus)
+
+
+def test_sampling_empty_statistics():
+    statistics = SyllableStatistics([], [], [], [[], [], []])
+    with pytest.raises(ValueError, match='No syllable shapes'):
+        statistics.sample(3)
+    with pytest.raises(ValueError, match='No coda phonemes'):
+        SyllableStatistics.from_corpus(['pa']).sample_phonemes('CVC')
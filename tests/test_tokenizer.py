@@ -0,0 +1,37 @@
+# -*- encoding: utf-8 -*-
+# filename: test_tokenizer.py
+# description: longest-match tokenization of tokenizer.Tokenizer
+from tokenizer import Tokenizer, default_tokenizer
+import numpy as np
+
+
+def test_longest_match_with_diacritics():
+    assert default_tokenizer().tokenize('ˈd͡ʒaːmʲtʰaaɡ') == ['ˈ', 'd͡ʒ', 'aː', 'mʲ', 'tʰ', 'aa', 'ɡ']
+
+
+def test_aliases_share_the_canonical_id():
+    tokenizer = default_tokenizer()
+    ids = tokenizer.tokenize('d͡ʒʤt͡ʃʧɡg', ids=True)
+    assert list(ids) == [tokenizer.index[__] for __ in 'ʤʤʧʧgg']
+    assert tokenizer.detokenize(tokenizer.tokenize('ˈd͡ʒaːm', ids=True)) == '?ʤam'
+
+
+def test_unknown_characters():
+    tokenizer = default_tokenizer()
+    assert list(tokenizer.tokenize('q1', ids=True)) == [tokenizer.index['q'], tokenizer.unknown]
+
+
+def test_tokenize_many_offsets():
+    tokenizer = default_tokenizer()
+    words = ['ʃip', 'd͡ʒaːm', '', 'ˈa']
+    ids, offsets = tokenizer.tokenize_many(words, ids=True)
+    assert list(offsets) == [0, 3, 6, 6, 8]
+    for word, a, b in zip(words, offsets, offsets[1:]):
+        assert np.array_equal(ids[a:b], tokenizer.tokenize(word, ids=True))
+    assert tokenizer.tokenize_many(words) == [tokenizer.tokenize(__) for __ in words]
+
+
+def test_custom_symbols_without_lengthening():
+    tokenizer = Tokenizer(['t', 'ts', 'a'], aliases={}, lengthen=False)
+    assert tokenizer.tokenize('tsata') == ['ts', 'a', 't', 'a']
+    assert tokenizer.tokenize('aa') == ['a', 'a']
@@ -0,0 +1,32 @@
+# -*- encoding: utf-8 -*-
+# filename: test_transliteration.py
+# description: round trips of transliteration.Transliterator
+from transliteration import Transliterator, default_transliterator
+import pytest
+
+
+def test_romanize_and_back():
+    romanize = default_transliterator()
+    words = ['ʃiŋka', 'ʔaŋa', 'd͡ʒaʔa', 'θeɾapi', 'ŋuj']
+    spelled = romanize.transliterate_many(words)
+    assert spelled == ['shinka', 'anga', "ja'a", 'therapi', 'nguy']
+    assert romanize.reverse().transliterate_many(spelled) == ['ʃiŋka', 'aŋa', "ʤaʔa", 'θerapi', 'ŋuj']
+
+
+def test_reverse_keeps_plain_letters():
+    back = default_transliterator().reverse()
+    assert back.transliterate_many(['fil', 'hava', 'ngüy']) == ['fil', 'hava', 'ŋyj']
+
+
+def test_context_rules():
+    spell = Transliterator({'k': 'c', 'a': 'a'}, [{'source': 'k', 'target': 'qu', 'after': ['i']},
+                                                  {'source': 'a', 'target': 'ah', 'after': ['$']}])
+    assert spell.transliterate_many(['kika', 'kaka']) == ['quicah', 'cacah']
+    assert list(spell.stream(['kika\n', 'kaka\n'], chunk=1)) == ['quicah', 'cacah']
+
+
+def test_one_output_per_word():
+    romanize = default_transliterator()
+    assert romanize.transliterate_many(['', 'ʃa', '']) == ['', 'sha', '']
+    with pytest.raises(ValueError):
+        romanize.transliterate_many(['a\nb'])
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: tokenizer.py
+# author: glenn abastillas
+# created: 2020-06-20
+# description: greedy longest-match tokenizer for IPA strings over sounds.yaml
+from functools import lru_cache
+from profiling import instrument
+import numpy as np
+import unicodedata
+
+# Alternative spellings found in raw IPA data mapped to sounds.yaml characters
+ALIASES = {
+    'd͡ʒ': 'ʤ', 'd͜ʒ': 'ʤ',
+    't͡ʃ': 'ʧ', 't͜ʃ': 'ʧ',
+    'ɡ': 'g',
+}
+
+LENGTH = ('ː', 'ˑ')
+STRESS = ('ˈ', 'ˌ')
+TIES = ('͡', '͜')
+
+
+class Tokenizer():
+    '''
+    Split IPA strings into sound tokens with a trie compiled once from the
+    characters in sounds.yaml. Matching is greedy and longest-first, so
+    multi-codepoint symbols (e.g., d͡ʒ, doubled length marks) are single tokens.
+    Diacritics and modifier letters attach to the preceding token.
+
+    Attributes
+    ----------
+        symbols (list) : Canonical symbols indexed by their integer id
+        index (dict) : Mapping of canonical symbols to integer ids
+        unknown (int) : Id given to characters not found in the trie
+    '''
+
+    @instrument()
+    def __init__(self, symbols=None, aliases=None, lengthen=True):
+        '''
+        Parameters
+        ----------
+            symbols (list) : Canonical symbols. Defaults to every sounds.yaml character.
+            aliases (dict) : Alternative spellings mapped to canonical symbols
+            lengthen (bool) : Match doubled and length-marked symbols as one token
+        '''
+        if symbols is None:
+            from sounds import SNDS
+            symbols = [__.character for __ in SNDS.vowel + SNDS.consonant]
+
+        self.symbols = list(dict.fromkeys(symbols))
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.unknown = len(self.symbols)
+
+        self._trie = {}
+
+        for symbol, i in self.index.items():
+            self._insert(symbol, i)
+
+            if lengthen:
+                self._insert(symbol * 2, i)
+                for mark in LENGTH:
+                    self._insert(symbol + mark, i)
+
+        for alias, symbol in (ALIASES if aliases is None else aliases).items():
+            if symbol in self.index:
+                self._insert(alias, self.index[symbol])
+
+    def __repr__(self):
+        return f"Tokenizer( symbols={len(self.symbols)} )"
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def _insert(self, sequence, value):
+        ''' Add a character sequence to the trie '''
+        node = self._trie
+        for char in sequence:
+            node = node.setdefault(char, {})
+        node[None] = value
+
+    def _absorb(self, text, end):
+        ''' Return the end of a token after attaching trailing diacritics '''
+        n = len(text)
+        while end < n:
+            char = text[end]
+            if char in TIES:
+                end += 2
+            elif char not in STRESS and unicodedata.category(char) in ('Mn', 'Lm', 'Sk'):
+                end += 1
+            else:
+                break
+        return min(end, n)
+
+    def scan(self, text):
+        '''
+        Yield (token, id) pairs for an IPA string in a single left-to-right pass
+
+        Parameters
+        ----------
+            text (str) : IPA string to tokenize
+        '''
+        trie, absorb, unknown = self._trie, self._absorb, self.unknown
+        i, n = 0, len(text)
+
+        while i < n:
+            node, j, end, value = trie, i, i + 1, unknown
+
+            while j < n and text[j] in node:
+                node = node[text[j]]
+                j += 1
+                if None in node:
+                    end, value = j, node[None]
+
+            end = absorb(text, end)
+            yield text[i:end], value
+            i = end
+
+    @instrument()
+    def tokenize(self, text, ids=False):
+        '''
+        Return the tokens of an IPA string
+
+        Parameters
+        ----------
+            text (str) : IPA string to tokenize
+            ids (bool) : Return an array of integer ids instead of strings
+        '''
+        if ids:
+            return np.fromiter((v for _, v in self.scan(text)), dtype=np.int32)
+        return [t for t, _ in self.scan(text)]
+
+    @instrument()
+    def tokenize_many(self, lines, ids=False):
+        '''
+        Tokenize many IPA strings
+
+        Parameters
+        ----------
+            lines (iterable) : IPA strings to tokenize (e.g., an open file)
+            ids (bool) : Return flat integer ids and word offsets
+
+        Returns
+        -------
+            List of token lists, or if ids is True, a tuple with a flat array
+            of ids and an offsets array where word k spans
+            ids[offsets[k]:offsets[k + 1]].
+        '''
+        if not ids:
+            return [self.tokenize(__.strip()) for __ in lines]
+
+        values, offsets = [], [0]
+        for line in lines:
+            values.extend(v for _, v in self.scan(line.strip()))
+            offsets.append(len(values))
+
+        return np.array(values, dtype=np.int32), np.array(offsets, dtype=np.int64)
+
+    def detokenize(self, ids):
+        ''' Return the canonical IPA string for a sequence of ids '''
+        return ''.join(self.symbols[__] if __ < self.unknown else '?' for __ in ids)
+
+
+@lru_cache(maxsize=None)
+def default_tokenizer():
+    ''' Return the shared tokenizer compiled from sounds.yaml '''
+    return Tokenizer()
+
+
+def tokenize(text, ids=False):
+    ''' Tokenize an IPA string with the default tokenizer '''
+    return default_tokenizer().tokenize(text, ids)
+
+
+def tokenize_many(lines, ids=False):
+    ''' Tokenize many IPA strings with the default tokenizer '''
+    return default_tokenizer().tokenize_many(lines, ids)
+
+
+if __name__ == '__main__':
+    print(tokenize('ˈd͡ʒaːmʲtʰaaɡ'))
+    print(tokenize_many(['ʃip', 'ʤam'], ids=True))
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# filename: transliteration.py
+# author: glenn abastillas
+# created: 2020-07-10
+# description: IPA to orthography transliteration compiled to a regex and a translation table
+'''
+A spec of spellings (see resources/orthography.yaml) is compiled in two passes.
+
+    1. Multi-codepoint sequences and context rules become one regular
+       expression, longest and most specific alternatives first. Each match
+       is replaced by a private-use placeholder codepoint for its rule.
+    2. One str.translate table maps every single codepoint and every
+       placeholder to its spelling.
+
+Both passes run in C over a whole block of words, so a lexicon is streamed
+through in chunks rather than word by word. Spellings are never rewritten
+again, because pass 2 only sees placeholders and untouched source characters.
+'''
+from functools import lru_cache
+from profiling import instrument
+import re
+
+# Placeholders start at the Supplementary Private Use Area-A
+PRIVATE = 0xF0000
+
+START, END = '^', '$'
+
+
+class Rule():
+    '''
+    A spelling that applies only in context
+
+    Attributes
+    ----------
+        source (str) : Sequence to rewrite
+        target (str) : Spelling of the sequence
+        before (list) : Sequences of which one must precede the source, or ^
+        after (list) : Sequences of which one must follow the source, or $
+    '''
+
+    def __init__(self, source, target, before=(), after=()):
+        self.source, self.target = source, target
+        self.before, self.after = list(before), list(after)
+
+    def __repr__(self):
+        return f"Rule( {self.source}={self.target}, before={self.before}, after={self.after} )"
+
+    def pattern(self):
+        ''' Return the regular expression matching the source in context '''
+        before = '|'.join('^' if __ == START else f'(?<={re.escape(__)})' for __ in self.before)
+        after = '|'.join('$' if __ == END else f'(?={re.escape(__)})' for __ in self.after)
+        return (f'(?:{before})' if before else '') + re.escape(self.source) + \
+               (f'(?:{after})' if after else '')
+
+
+class Transliterator():
+    '''
+    Rewrite IPA words into an orthography (or back) in two C-level passes
+
+    Attributes
+    ----------
+        mapping (dict) : Context-free spellings of IPA sequences
+        rules (list) : Context-dependent spellings
+    '''
+
+    def __init__(self, mapping, rules=()):
+        '''
+        Parameters
+        ----------
+            mapping (dict) : IPA sequences and their spellings (e.g., {'ʃ': 'sh'})
+            rules (list) : Rule objects or dicts with source, target and
+                optional before and after lists
+        '''
+        self.mapping = dict(mapping)
+        self.rules = [__ if isinstance(__, Rule) else Rule(**__) for __ in rules]
+
+        # Context rules are tried before context-free sequences of the same
+        # length, and longer sequences before shorter ones
+        patterns = [(__.pattern(), __.target, __.source, 0) for __ in self.rules]
+        patterns += [(re.escape(s), t, s, 1) for s, t in self.mapping.items() if len(s) > 1]
+        patterns.sort(key=lambda __: (-len(__[2]), __[3]))
+
+        self.table = {ord(s): t for s, t in self.mapping.items() if len(s) == 1}
+        self._pattern = None
+        self._placeholders = [None]
+
+        # Rule patterns only use non-capturing groups, so alternative i is group i + 1
+        if patterns:
+            alternatives = []
+            for i, (pattern, target, *__) in enumerate(patterns):
+                alternatives.append(f'({pattern})')
+                self._placeholders.append(chr(PRIVATE + i))
+                self.table[PRIVATE + i] = target
+            self._pattern = re.compile('|'.join(alternatives), re.MULTILINE)
+
+    def __repr__(self):
+        return f"Transliterator( mapping={len(self.mapping)}, rules={len(self.rules)} )"
+
+    def __call__(self, text):
+        return self.transliterate(text)
+
+    @classmethod
+    def from_yaml(cls, path='resources/orthography.yaml'):
+        ''' Build a transliterator from a YAML spec with mapping and rules keys '''
+        import yaml
+        with open(path, encoding='utf-8') as fin:
+            spec = yaml.load(fin, yaml.Loader)
+        return cls({str(k): str(v) for k, v in (spec.get('mapping') or {}).items()},
+                   spec.get('rules') or ())
+
+    def _placeholder(self, match):
+        return self._placeholders[match.lastindex]
+
+    def transliterate(self, text):
+        '''
+        Return the spelling of text. Newlines separate words, so ^ and $
+        rules apply to every line of a block.
+
+        Parameters
+        ----------
+            text (str) : IPA word or newline-separated words
+        '''
+        if self._pattern is not None:
+            text = self._pattern.sub(self._placeholder, text)
+        return text.translate(self.table)
+
+    @instrument()
+    def transliterate_many(self, words):
+        '''
+        Return the spelling of each word in one pass over the joined words
+
+        Raises
+        ------
+            ValueError : If a word contains a newline, which would split it
+                into several outputs
+        '''
+        words = list(words)
+        if not words:
+            return []
+
+        text = '\n'.join(words)
+        if text.count('\n') != len(words) - 1:
+            raise ValueError('Words may not contain newlines.')
+        return self.transliterate(text).split('\n')
+
+    def stream(self, lines, chunk=65536):
+        '''
+        Yield the spelling of each line, transliterating chunk lines at a time
+
+        Parameters
+        ----------
+            lines (iterable) : IPA words, one per item (e.g., an open file)
+            chunk (int) : Lines per block
+        '''
+        block = []
+        for line in lines:
+            block.append(line.rstrip('\n'))
+            if len(block) == chunk:
+                yield from self.transliterate_many(block)
+                block = []
+        if block:
+            yield from self.transliterate_many(block)
+
+    def reverse(self):
+        '''
+        Return the transliterator from this orthography back to IPA
+
+        Notes
+        -----
+            A one-letter ASCII spelling that this transliterator copies through
+            unchanged (e.g., f, which is not a key of the mapping) maps back to
+            itself, so ɸ: f does not turn every f into ɸ. Any other
+            spelling shared by several sequences maps back to the first one
+            in the mapping. Rules and mappings with empty spellings cannot be
+            reversed and are left out. Rule contexts are spelled with this
+            transliterator so they match the orthography.
+        '''
+        mapping = {}
+        for source, target in self.mapping.items():
+            if not target:
+                continue
+            if len(target) == 1 and target.isascii() and target.isalpha() and \
+               self.mapping.get(target, target) == target:
+                source = target
+            mapping.setdefault(target, source)
+
+        def spell(context):
+            return [__ if __ in (START, END) else self.transliterate(__) for __ in context]
+
+        rules = [Rule(__.target, __.source, spell(__.before), spell(__.after))
+                 for __ in self.rules if __.target]
+        return Transliterator(mapping, rules)
+
+
+@lru_cache(maxsize=None)
+def default_transliterator():
+    ''' Return the shared romanization built from orthography.yaml '''
+    return Transliterator.from_yaml()
+
+
+def transliterate(text):
+    ''' Romanize IPA text with the default transliterator '''
+    return default_transliterator().transliterate(text)
+
+
+if __name__ == '__main__':
+    romanize = default_transliterator()
+    words = ['ˈʃiŋkəl', 'ʔaŋa', 'd͡ʒaʔa', 'θɛɹæpi']
+    spelled = romanize.transliterate_many(words)
+    print(romanize, spelled, romanize.reverse().transliterate_many(spelled))